@@ -1 +1,10 @@
-from . import agent
\ No newline at end of file
+import os
+import sys
+
+# The agent imports the pattern catalog and retrieval cache modules of the MCP server
+# from ../devops-mcp-server; the agent image copies them to the same relative location.
+_SERVER_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "devops-mcp-server"))
+if _SERVER_DIR not in sys.path:
+    sys.path.append(_SERVER_DIR)
+
+from . import agent
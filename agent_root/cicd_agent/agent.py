@@ -1,6 +1,9 @@
 import datetime
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import os
 import logging
+import time
 from google.adk.agents import Agent, LlmAgent
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StreamableHTTPConnectionParams, StdioConnectionParams, StdioServerParameters
 from google.adk.planners import PlanReActPlanner
@@ -10,6 +13,8 @@ from google.adk.memory import InMemoryMemoryService
 from google.adk import Runner
 from google.adk.sessions import InMemorySessionService
 from cicd_agent.prompts import *
+import pattern_catalog
+import rag_cache
 from vertexai import rag
 import vertexai
 
@@ -19,6 +24,14 @@ MODEL = "gemini-2.5-pro"
 RAG_PATTERNS_CORPUS_ID = "projects/haroonc-exp/locations/us-east4/ragCorpora/5476377146882523136"
 RAG_KNOWLEDGE_CORPUS_ID = "projects/haroonc-exp/locations/us-east4/ragCorpora/2017612633061982208"
 TARGET_FOLDER_PATH = os.environ.get('WORKING_DIR', '/data')
+# How often the file list of a corpus is checked for changes that invalidate cached retrievals.
+CORPUS_VERSION_CHECK_SECONDS = float(os.environ.get("RAG_CORPUS_VERSION_CHECK", "300"))
+# Concurrent retrievals made by query_knowledge_batch.
+RAG_BATCH_CONCURRENCY = int(os.environ.get("RAG_BATCH_CONCURRENCY", "8"))
+_corpus_versions = {}
+# The pattern files are parsed once at startup and searched in-process.
+PATTERNS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns")
+catalog = pattern_catalog.PatternCatalog.load([PATTERNS_DIR])
 vertexai.init(project="haroonc-exp", location="us-east4")
 # git_mcp = MCPToolset(
 #                     connection_params=StdioConnectionParams(
@@ -71,64 +84,120 @@ def transfer_to_implementation_agent(plan: str, tool_context: ToolContext) -> st
     tool_context.state[user_plan_key] = plan
     return "Transferring to the implementation_agent..."
 
-def query_knowledge(query: str):
-    """Queries the knowledge base for information on how to build and manage CI/CD pipelines.
-
-    Args:
-        query: The query to search for in the knowledge base.
+def _corpus_version(corpus_id: str) -> str:
+    """Returns a fingerprint of a corpus's files, re-checked every CORPUS_VERSION_CHECK_SECONDS."""
+    checked = _corpus_versions.get(corpus_id)
+    if checked is not None and time.monotonic() - checked[0] < CORPUS_VERSION_CHECK_SECONDS:
+        return checked[1]
+    try:
+        names = sorted(rag_file.name for rag_file in rag.list_files(corpus_name=corpus_id))
+        version = hashlib.sha1("\n".join(names).encode()).hexdigest()[:12]
+    except Exception as e:
+        logging.warning("Could not check the version of RAG corpus %s: %s", corpus_id, e)
+        version = checked[1] if checked is not None else "unknown"
+    _corpus_versions[corpus_id] = (time.monotonic(), version)
+    return version
 
-    Returns:
-        The response from the retrieval query.
-    """
+def _retrieve(corpus_id: str, text: str, top_k: int):
+    """Retrieves the texts of the chunks of a corpus most relevant to a query, serving repeats from the cache."""
+    version = _corpus_version(corpus_id)
+    cache_key = f"{corpus_id}?top_k={top_k}"
+    hit, contexts = rag_cache.cache.get(cache_key, version, text)
+    if hit:
+        return contexts
     rag_retrieval_config = rag.RagRetrievalConfig(
-        top_k=3,  # Optional
-        filter=rag.Filter(vector_distance_threshold=0.5),  # Optional
+        top_k=top_k,
+        filter=rag.Filter(vector_distance_threshold=0.5),
     )
     response = rag.retrieval_query(
         rag_resources=[
             rag.RagResource(
-                rag_corpus=RAG_KNOWLEDGE_CORPUS_ID,
+                rag_corpus=corpus_id,
             )
         ],
-        text=query,
+        text=text,
         rag_retrieval_config=rag_retrieval_config,
     )
+    contexts = [context.text for context in response.contexts.contexts]
+    rag_cache.cache.put(cache_key, version, text, contexts)
+    return contexts
+
+def query_knowledge(query: str):
+    """Queries the knowledge base for information on how to build and manage CI/CD pipelines.
+
+    Args:
+        query: The query to search for in the knowledge base.
+
+    Returns:
+        The response from the retrieval query.
+    """
     knowledge = ""
 
-    for i, context in enumerate(response.contexts.contexts):
-        knowledge += f'knowledge {i}: {context.text} \n\n'
+    for i, text in enumerate(_retrieve(RAG_KNOWLEDGE_CORPUS_ID, query, top_k=3)):
+        knowledge += f'knowledge {i}: {text} \n\n'
 
     return knowledge
 
-def search_common_cicd_patterns(keywords: str):
+def _search_patterns(text: str, top_k: int, triggers=None, deployment_style=None, targets=None):
+    """Returns the texts of the catalog patterns best matching a query, or retrieves them if the catalog matches none."""
+    matches = catalog.search(text, triggers, deployment_style, targets, limit=top_k)
+    if matches:
+        return [pattern.text for _, pattern in matches]
+    return _retrieve(RAG_PATTERNS_CORPUS_ID, text, top_k)
+
+def search_common_cicd_patterns(keywords: str, triggers: list[str] = None, deployment_style: str = None, targets: list[str] = None):
     """Searches for common CI/CD patterns and best practices.
 
+    Patterns are selected by the triggers, deployment styles, targets and use case
+    keywords they declare. Keywords naming none of them are searched for in the
+    patterns corpus instead.
+
     Args:
         keywords: The keywords to search for in the CI/CD patterns.
+        triggers: Triggers the pattern must support, e.g. ['git_tag'] or ['schedule'].
+        deployment_style: The deployment style the pattern must have, e.g. 'progressive_delivery'.
+        targets: Runtimes the pattern must deploy to: 'cloud_run' and/or 'gke'.
 
     Returns:
         The response from the retrieval query.
     """
-    rag_retrieval_config = rag.RagRetrievalConfig(
-        top_k=2,  # Optional
-        filter=rag.Filter(vector_distance_threshold=0.5),  # Optional
-    )
-    response = rag.retrieval_query(
-        rag_resources=[
-            rag.RagResource(
-                rag_corpus=RAG_PATTERNS_CORPUS_ID,
-            )
-        ],
-        text=keywords,
-        rag_retrieval_config=rag_retrieval_config,
-    )
     patterns = ""
 
-    for i, context in enumerate(response.contexts.contexts):
-        patterns += f'Pattern {i}: {context.text} \n\n'
+    for i, text in enumerate(_search_patterns(keywords, 2, triggers, deployment_style, targets)):
+        patterns += f'Pattern {i}: {text} \n\n'
 
     return patterns
 
+def query_knowledge_batch(queries: list[str]):
+    """Queries the knowledge base and the CI/CD patterns for several queries at once.
+
+    Use this instead of calling query_knowledge once per component of a plan.
+
+    Args:
+        queries: The queries, e.g. one per component of the plan.
+
+    Returns:
+        A dictionary mapping each query to its results: {"knowledge": [...], "patterns": [...]}.
+    """
+    distinct = {}
+    for query in queries:
+        distinct.setdefault(rag_cache.normalize(query), query)
+    with ThreadPoolExecutor(max_workers=RAG_BATCH_CONCURRENCY) as executor:
+        futures = {}
+        for key, query in distinct.items():
+            futures[(key, "knowledge")] = executor.submit(_retrieve, RAG_KNOWLEDGE_CORPUS_ID, query, 3)
+            futures[(key, "patterns")] = executor.submit(_search_patterns, query, 2)
+    results = {}
+    for (key, corpus), future in futures.items():
+        entry = results.setdefault(key, {})
+        if "error" in entry:
+            continue
+        try:
+            entry[corpus] = future.result()
+        except Exception as e:
+            results[key] = {"error": str(e)}
+    return {query: results[rag_cache.normalize(query)] for query in queries}
+
 
 implementation_agent = LlmAgent(
     name="implementation_agent",
@@ -142,7 +211,7 @@ implementation_agent = LlmAgent(
     ),
     instruction=PROMPTS[IMPLEMNETATION_PROMPT],
     planner=PlanReActPlanner(),
-    tools=[filesystem_mcp, gcp_devops_mcp, transfer_to_root_agent, query_knowledge]
+    tools=[filesystem_mcp, gcp_devops_mcp, transfer_to_root_agent, query_knowledge, query_knowledge_batch]
 )
 
 design_agent = LlmAgent(
@@ -1,4 +1,5 @@
 from fastmcp import FastMCP
+import metrics
 
 # Create a server instance
 mcp = FastMCP(name="test-mcp-server")
@@ -12,6 +13,15 @@ def get_config() -> dict:
     """
     return {"version": "1.0", "author": "MyTeam"}
 
+@mcp.resource("resource://metrics")
+def get_metrics() -> dict:
+    """Provides the server's runtime counters (e.g. client pool hits and misses).
+
+    Returns:
+        A dictionary mapping counter names to their current values.
+    """
+    return metrics.snapshot()
+
 
 
 # def create_gcp_project(project_id: str):
@@ -1,15 +1,22 @@
 from app import mcp
-import google.auth
-from google.cloud import artifactregistry_v1
-from typing import Dict, Any
+import clients
+import concurrency
+import operations
+import projection
+from fastmcp import Context
+from typing import Dict, Any, Optional
+
+# Fields returned for a created repository unless the caller asks for others.
+REPOSITORY_SUMMARY_FIELDS = ["name", "format", "mode", "create_time"]
 
 def _get_artifact_registry_service():
     """Gets the Artifact Registry service client."""
-    credentials, _ = google.auth.default()
-    return artifactregistry_v1.ArtifactRegistryClient(credentials=credentials)
+    from google.cloud import artifactregistry_v1
+
+    return clients.get_grpc_client(artifactregistry_v1.ArtifactRegistryAsyncClient, 'artifactregistry', 'v1')
 
 @mcp.tool
-def create_artifact_registry_repository(project_id: str, location: str, repository_id: str, format: str) -> Dict[str, Any]:
+async def create_artifact_registry_repository(project_id: str, location: str, repository_id: str, format: str, wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Artifact Registry repository.
 
     Args:
@@ -17,6 +24,8 @@ def create_artifact_registry_repository(project_id: str, location: str, reposito
         location: The location of the repository.
         repository_id: The ID of the repository to create.
         format: The format of the repository. One of DOCKER, MAVEN, NPM, PYPI
+        wait_for_completion: Whether to wait for the repository to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated repository fields to return, e.g. 'name,cleanup_policies'. Defaults to a compact summary; pass '*' for the full repository.
     
     Returns:
         A dictionary containing a success message or an error message.
@@ -29,12 +38,17 @@ def create_artifact_registry_repository(project_id: str, location: str, reposito
             "format": format,
         }
 
-        response = client.create_repository(
-            parent=parent, repository=repository, repository_id=repository_id
+        response = await concurrency.call(
+            'artifactregistry', client.create_repository, parent=parent, repository=repository, repository_id=repository_id
         )
-        result = response.result()
-
-        return {"message": f"Successfully created Artifact Registry repository: {result}"}
+        tracked = operations.track_api_core_operation(
+            response, f"Create Artifact Registry repository {repository_id}",
+            on_done=lambda result: {
+                "message": f"Successfully created Artifact Registry repository: {result.name}",
+                "repository": projection.summarize(result, fields, REPOSITORY_SUMMARY_FIELDS),
+            },
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
\ No newline at end of file
@@ -0,0 +1,63 @@
+import collections
+import math
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Identifiers such as 'cloudbuild.yaml', 'substitution_option' or 'gcr.io/kaniko-project' stay whole.
+_TOKEN = re.compile(r"[a-z0-9_]+(?:[./-][a-z0-9_]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into lowercase terms.
+
+    Compound identifiers are kept whole and also split into their parts, so
+    'cloudbuild.yaml' matches both itself and 'cloudbuild'.
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        parts = re.split(r"[./-]", token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+    return terms
+
+class BM25:
+    """An in-memory inverted index ranking documents by Okapi BM25."""
+
+    def __init__(self, documents: List[str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        lengths = []
+        postings: Dict[str, List[Tuple[int, int]]] = collections.defaultdict(list)
+        for doc_id, document in enumerate(documents):
+            counts = collections.Counter(tokenize(document))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings[term].append((doc_id, count))
+        self.size = len(documents)
+        self._lengths = np.asarray(lengths, dtype=np.float32)
+        average = float(self._lengths.mean()) if self.size else 0.0
+        self._norms = k1 * (1 - b + b * self._lengths / (average or 1.0))
+        # term -> (document ids, term frequencies, inverse document frequency)
+        self._postings = {
+            term: (
+                np.asarray([doc_id for doc_id, _ in entries], dtype=np.int32),
+                np.asarray([count for _, count in entries], dtype=np.float32),
+                math.log(1 + (self.size - len(entries) + 0.5) / (len(entries) + 0.5)),
+            )
+            for term, entries in postings.items()
+        }
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, int]]:
+        """Returns up to top_k (score, document id) pairs for documents matching any query term, best first."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, frequencies, idf = posting
+            scores[doc_ids] += idf * frequencies * (self.k1 + 1) / (frequencies + self._norms[doc_ids])
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched], kind="stable")[:top_k]]
+        return [(float(scores[i]), int(i)) for i in top]
@@ -0,0 +1,107 @@
+import collections
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Default lifetime of cached results. Override for a single tool with
+# DEVOPS_MCP_CACHE_TTL_<TOOL>, e.g. DEVOPS_MCP_CACHE_TTL_LIST_BUILD_TRIGGERS=60.
+DEFAULT_TTL_SECONDS = float(os.environ.get("DEVOPS_MCP_CACHE_TTL", "300"))
+# Maximum number of cached results across all tools; the least recently used are evicted first.
+MAX_ENTRIES = int(os.environ.get("DEVOPS_MCP_CACHE_MAX_ENTRIES", "512"))
+
+def ttl_for(tool: str) -> float:
+    """Returns the configured time-to-live in seconds for a tool's cached results."""
+    return float(os.environ.get(f"DEVOPS_MCP_CACHE_TTL_{tool.upper()}", DEFAULT_TTL_SECONDS))
+
+def is_error(result: Any) -> bool:
+    """Returns whether a tool result is an error response, which must never be cached."""
+    return isinstance(result, dict) and "error" in result
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries expire after a per-entry time-to-live."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[Tuple, Tuple[float, Any]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """Returns (True, value) for a live entry, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: Tuple, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Tuple], bool]) -> int:
+        """Removes every entry whose key matches the predicate and returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_cache = TTLCache(MAX_ENTRIES)
+
+async def read_through(tool: str, project_id: str, location: Optional[str], loader: Callable[[], Awaitable[Any]], *, key_extra: Tuple = (), bypass_cache: bool = False) -> Any:
+    """Returns a tool's cached result, loading and caching it on a miss.
+
+    Args:
+        tool: The name of the tool whose result is cached.
+        project_id: The ID of the Google Cloud project the result belongs to.
+        location: The location the result belongs to, if any.
+        loader: A coroutine function producing the result.
+        key_extra: Any further hashable arguments that distinguish results.
+        bypass_cache: Whether to skip the cached value and reload it from the API.
+
+    Returns:
+        The (possibly cached) tool result.
+    """
+    key = (tool, project_id, location) + tuple(key_extra)
+    if not bypass_cache:
+        hit, value = _cache.get(key)
+        if hit:
+            metrics.increment(f"cache.{tool}.hit")
+            return value
+    metrics.increment(f"cache.{tool}.{'bypass' if bypass_cache else 'miss'}")
+    value = await loader()
+    if not is_error(value):
+        _cache.set(key, value, ttl_for(tool))
+    return value
+
+def invalidate(tool: str, project_id: str, location: Optional[str] = None):
+    """Drops a tool's cached results for a project after a write makes them stale.
+
+    Args:
+        tool: The name of the tool whose results are invalidated.
+        project_id: The ID of the Google Cloud project.
+        location: The location to invalidate, or None for every location in the project.
+    """
+    removed = _cache.invalidate(
+        lambda key: key[0] == tool and key[1] == project_id and (location is None or key[2] == location)
+    )
+    if removed:
+        metrics.increment(f"cache.{tool}.invalidated", removed)
+        logger.debug(f"Invalidated {removed} cached results of {tool} for {project_id}/{location}.")
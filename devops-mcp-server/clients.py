@@ -0,0 +1,154 @@
+import datetime
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import google.auth
+
+import discovery_cache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOUD_PLATFORM_SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+
+# Tokens are refreshed this long before they expire so that a pooled client
+# never starts a request with a token that lapses mid-flight.
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+_lock = threading.Lock()
+_credentials: Dict[Tuple, Any] = {}
+_credential_locks: Dict[Tuple, threading.Lock] = {}
+_grpc_clients: Dict[Tuple, Any] = {}
+# Discovery clients wrap an httplib2.Http, which is not thread-safe, so they
+# are pooled per thread instead of being shared across the process.
+_thread_local = threading.local()
+
+def _utcnow() -> datetime.datetime:
+    # google-auth stores credential expiry as a naive UTC datetime.
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def _needs_refresh(credentials) -> bool:
+    if not credentials.token or credentials.expiry is None:
+        return not credentials.valid
+    return credentials.expiry - TOKEN_REFRESH_MARGIN <= _utcnow()
+
+def get_credentials(scopes: Tuple[str, ...] = CLOUD_PLATFORM_SCOPES, project: Optional[str] = None):
+    """Gets the pooled Application Default Credentials for the given scopes.
+
+    Credentials are resolved once per (scopes, project) and refreshed ahead of
+    expiry, so callers always receive a usable token.
+
+    Args:
+        scopes: The OAuth scopes the credentials are requested for.
+        project: The quota project to bill requests to, if any.
+
+    Returns:
+        A google.auth credentials object.
+    """
+    key = (tuple(scopes), project)
+    with _lock:
+        credentials = _credentials.get(key)
+        if credentials is None:
+            credentials, _ = google.auth.default(scopes=list(scopes), quota_project_id=project)
+            _credentials[key] = credentials
+            _credential_locks[key] = threading.Lock()
+            metrics.increment("credentials.miss")
+        else:
+            metrics.increment("credentials.hit")
+        refresh_lock = _credential_locks[key]
+
+    if _needs_refresh(credentials):
+        with refresh_lock:
+            # Another thread may have refreshed while we waited for the lock.
+            if _needs_refresh(credentials):
+                from google.auth.transport.requests import Request
+
+                logger.debug(f"Refreshing credentials for scopes {scopes}.")
+                credentials.refresh(Request())
+    return credentials
+
+def get_discovery_service(api: str, version: str, scopes: Tuple[str, ...] = CLOUD_PLATFORM_SCOPES, project: Optional[str] = None):
+    """Gets a pooled discovery-based API client.
+
+    Args:
+        api: The name of the API (e.g. 'cloudbuild').
+        version: The version of the API (e.g. 'v1').
+        scopes: The OAuth scopes the client is authorized for.
+        project: The quota project to bill requests to, if any.
+
+    Returns:
+        A googleapiclient Resource owned by the calling thread.
+    """
+    key = (api, version, tuple(scopes), project)
+    credentials = get_credentials(scopes, project)
+    pool = getattr(_thread_local, "services", None)
+    if pool is None:
+        pool = _thread_local.services = {}
+    service = pool.get(key)
+    if service is None:
+        from googleapiclient import discovery
+
+        metrics.increment(f"client_pool.{api}.miss")
+        service = discovery.build_from_document(
+            discovery_cache.load_document(api, version), credentials=credentials
+        )
+        pool[key] = service
+    else:
+        metrics.increment(f"client_pool.{api}.hit")
+    return service
+
+def get_grpc_client(client_class: Callable[..., Any], api: str, version: str, scopes: Tuple[str, ...] = CLOUD_PLATFORM_SCOPES, project: Optional[str] = None):
+    """Gets a pooled gRPC-based API client.
+
+    gRPC clients are thread-safe, so a single instance is shared by the whole
+    process for each (API, version, scopes, project). Native async clients
+    must only be used from the server's event loop.
+
+    Args:
+        client_class: The client class to instantiate (e.g. run_v2.ServicesAsyncClient).
+        api: The name of the API (e.g. 'run').
+        version: The version of the API (e.g. 'v2').
+        scopes: The OAuth scopes the client is authorized for.
+        project: The quota project to bill requests to, if any.
+
+    Returns:
+        An instance of client_class.
+    """
+    key = (api, version, tuple(scopes), project, client_class)
+    credentials = get_credentials(scopes, project)
+    with _lock:
+        client = _grpc_clients.get(key)
+        if client is None:
+            metrics.increment(f"client_pool.{api}.miss")
+            client = client_class(credentials=credentials)
+            _grpc_clients[key] = client
+        else:
+            metrics.increment(f"client_pool.{api}.hit")
+    return client
+
+def get_authorized_http(scopes: Tuple[str, ...] = CLOUD_PLATFORM_SCOPES, project: Optional[str] = None):
+    """Gets an authorized httplib2 connection owned by the calling thread.
+
+    Args:
+        scopes: The OAuth scopes the connection is authorized for.
+        project: The quota project to bill requests to, if any.
+
+    Returns:
+        A google_auth_httplib2.AuthorizedHttp.
+    """
+    key = (tuple(scopes), project)
+    credentials = get_credentials(scopes, project)
+    pool = getattr(_thread_local, "http", None)
+    if pool is None:
+        pool = _thread_local.http = {}
+    http = pool.get(key)
+    if http is None:
+        import google_auth_httplib2
+        from googleapiclient.http import build_http
+
+        metrics.increment("client_pool.http.miss")
+        http = pool[key] = google_auth_httplib2.AuthorizedHttp(credentials, http=build_http())
+    else:
+        metrics.increment("client_pool.http.hit")
+    return http
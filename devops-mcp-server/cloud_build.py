@@ -1,21 +1,33 @@
-import google.auth
-from googleapiclient import discovery
 from app import mcp
-import time
-from typing import Optional, Dict, Any, List
+import cache
+import clients
+import concurrency
+import pagination
+import projection
+from fastmcp import Context
+from typing import Optional, Dict, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fields returned for each trigger unless the caller asks for others.
+TRIGGER_SUMMARY_FIELDS = [
+    "id",
+    "name",
+    "description",
+    "disabled",
+    "createTime",
+    "serviceAccount",
+    "developerConnectEventConfig.gitRepositoryLink",
+    "developerConnectEventConfig.push",
+]
+
 def _get_cloud_build_service():
     """Gets the Cloud Build service client."""
-    credentials, _ = google.auth.default(
-        scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    return discovery.build('cloudbuild', 'v1', credentials=credentials)
+    return clients.get_discovery_service('cloudbuild', 'v1')
 
 @mcp.tool
-def create_cloud_build_trigger(
+async def create_cloud_build_trigger(
     project_id: str,
     location_id: str,
     trigger_id: str,
@@ -79,8 +91,9 @@ def create_cloud_build_trigger(
         logger.debug(f"Trigger object: {trigger}")
 
         request = service.projects().locations().triggers().create(parent=parent, body=trigger)
-        response = request.execute() # CreateBuildTrigger is not an LRO
+        response = await concurrency.execute('cloudbuild', request) # CreateBuildTrigger is not an LRO
         logger.info(f"Successfully created Cloud Build trigger: {response['name']}")
+        cache.invalidate("list_build_triggers", project_id, location_id)
         return {"message": f"Successfully created Cloud Build trigger: {response['name']}"}
 
     except Exception as e:
@@ -90,7 +103,7 @@ def create_cloud_build_trigger(
 
 
 @mcp.tool
-def run_build_trigger(project_id: str, location: str, trigger_id: str) -> Dict[str, Any]:
+async def run_build_trigger(project_id: str, location: str, trigger_id: str) -> Dict[str, Any]:
     """Runs a Cloud Build trigger.
 
     Args:
@@ -108,7 +121,7 @@ def run_build_trigger(project_id: str, location: str, trigger_id: str) -> Dict[s
         name = f"projects/{project_id}/locations/{location}/triggers/{trigger_id}"
         request = service.projects().locations().triggers().run(name=name, body={})
         try:
-            response = request.execute()
+            response = await concurrency.execute('cloudbuild', request)
         except Exception as e:
             logger.error(f"Error running Cloud Build trigger: {e}", exc_info=True)
             return {"error": str(e)}
@@ -122,32 +135,61 @@ def run_build_trigger(project_id: str, location: str, trigger_id: str) -> Dict[s
         return {"error": str(e)}
 
 @mcp.tool
-def list_build_triggers(project_id: str, location: str) -> List[Dict[str, Any]]:
-    """Lists all Cloud Build triggers in a given location.
+async def list_build_triggers(
+    project_id: str,
+    location: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    fields: Optional[str] = None,
+    bypass_cache: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Lists Cloud Build triggers in a given location, one or more pages at a time.
+
+    The Cloud Build API does not support server-side filtering or ordering of triggers.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the triggers.
+        page_size: The maximum number of triggers to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        fields: Comma-separated trigger fields to return, e.g. 'name,filename,substitutions'. Defaults to a compact summary; pass '*' for the full triggers.
+        bypass_cache: Whether to ignore recently cached results and fetch the triggers again.
 
     Returns:
-        A list of triggers or a dictionary with an error message.
+        A dictionary containing the triggers and the next_page_token (None when there are no more), or an error message.
     """
+    return await cache.read_through(
+        "list_build_triggers", project_id, location,
+        lambda: _list_build_triggers(project_id, location, page_size, page_token, max_pages, fields, ctx),
+        key_extra=(page_size, page_token, max_pages, fields),
+        bypass_cache=bypass_cache,
+    )
+
+async def _list_build_triggers(project_id: str, location: str, page_size: int, page_token: Optional[str], max_pages: int, fields: Optional[str], ctx: Optional[Context]) -> Dict[str, Any]:
     try:
         logger.info(f"Listing Cloud Build triggers in project '{project_id}' and location '{location}'.")
         service = _get_cloud_build_service()
 
         parent = f"projects/{project_id}/locations/{location}"
-        request = service.projects().locations().triggers().list(parent=parent)
+        mask = projection.api_fields(projection.parse_fields(fields, TRIGGER_SUMMARY_FIELDS), "triggers")
+
+        async def fetch_page(token):
+            request = service.projects().locations().triggers().list(parent=parent, pageSize=page_size, pageToken=token, fields=mask)
+            response = await concurrency.execute('cloudbuild', request)
+            return response.get("triggers", []), response.get("nextPageToken")
+
         try:
-            response = request.execute()
+            triggers, next_page_token = await pagination.collect_pages(fetch_page, page_token, max_pages, ctx)
         except Exception as e:
             logger.error(f"Error listing Cloud Build triggers: {e}", exc_info=True)
             return {"error": str(e)}
 
-        triggers = response.get("triggers", [])
         logger.info(f"Found {len(triggers)} Cloud Build triggers.")
         logger.debug(f"Triggers: {triggers}")
-        return triggers
+        return {"triggers": triggers, "next_page_token": next_page_token}
 
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
@@ -1,15 +1,27 @@
 from app import mcp
-import google.auth
-from google.cloud import deploy_v1
-from typing import Dict, Any, List
+import cache
+import clients
+import concurrency
+import operations
+import pagination
+import projection
+from fastmcp import Context
+from typing import Dict, Any, List, Optional, Tuple
+import contextlib
+
+# Fields returned for created resources unless the caller asks for others.
+DELIVERY_PIPELINE_SUMMARY_FIELDS = ["name", "uid", "description", "create_time", "serial_pipeline.stages.target_id"]
+TARGET_SUMMARY_FIELDS = ["name", "target_id", "uid", "description", "require_approval", "gke.cluster", "run.location"]
+ROLLOUT_SUMMARY_FIELDS = ["name", "target_id", "state", "approval_state", "create_time"]
 
 def _get_cloud_deploy_service():
     """Gets the Cloud Deploy service client."""
-    credentials, _ = google.auth.default()
-    return deploy_v1.CloudDeployClient(credentials=credentials)
+    from google.cloud import deploy_v1
+
+    return clients.get_grpc_client(deploy_v1.CloudDeployAsyncClient, 'clouddeploy', 'v1')
 
 @mcp.tool
-def create_delivery_pipeline(project_id: str, location: str, delivery_pipeline_id: str, description: str = "") -> Dict[str, Any]:
+async def create_delivery_pipeline(project_id: str, location: str, delivery_pipeline_id: str, description: str = "", wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Cloud Deploy delivery pipeline.
 
     Args:
@@ -17,6 +29,8 @@ def create_delivery_pipeline(project_id: str, location: str, delivery_pipeline_i
         location: The location of the delivery pipeline.
         delivery_pipeline_id: The ID of the delivery pipeline to create.
         description: A description of the delivery pipeline.
+        wait_for_completion: Whether to wait for the delivery pipeline to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated delivery pipeline fields to return, e.g. 'name,serial_pipeline.stages'. Defaults to a compact summary; pass '*' for the full delivery pipeline.
 
     Returns:
         A dictionary containing a success message or an error message.
@@ -32,18 +46,27 @@ def create_delivery_pipeline(project_id: str, location: str, delivery_pipeline_i
             }
         }
 
-        response = client.create_delivery_pipeline(
-            parent=parent, delivery_pipeline=delivery_pipeline, delivery_pipeline_id=delivery_pipeline_id
+        response = await concurrency.call(
+            'clouddeploy', client.create_delivery_pipeline, parent=parent, delivery_pipeline=delivery_pipeline, delivery_pipeline_id=delivery_pipeline_id
         )
-        result = response.result()
 
-        return {"message": f"Successfully created Cloud Deploy delivery pipeline: {result}"}
+        def on_done(result):
+            cache.invalidate("list_delivery_pipelines", project_id, location)
+            return {
+                "message": f"Successfully created Cloud Deploy delivery pipeline: {result.name}",
+                "delivery_pipeline": projection.summarize(result, fields, DELIVERY_PIPELINE_SUMMARY_FIELDS),
+            }
+
+        tracked = operations.track_api_core_operation(
+            response, f"Create Cloud Deploy delivery pipeline {delivery_pipeline_id}", on_done=on_done
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def create_gke_target(project_id: str, location: str, target_id: str, gke_cluster: str, description: str = "") -> Dict[str, Any]:
+async def create_gke_target(project_id: str, location: str, target_id: str, gke_cluster: str, description: str = "", wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Cloud Deploy GKE target.
 
     Args:
@@ -52,6 +75,8 @@ def create_gke_target(project_id: str, location: str, target_id: str, gke_cluste
         target_id: The ID of the target to create.
         gke_cluster: The GKE cluster to deploy to.
         description: A description of the target.
+        wait_for_completion: Whether to wait for the target to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated target fields to return, e.g. 'name,execution_configs'. Defaults to a compact summary; pass '*' for the full target.
 
     Returns:
         A dictionary containing a success message or an error message.
@@ -67,18 +92,27 @@ def create_gke_target(project_id: str, location: str, target_id: str, gke_cluste
             }
         }
 
-        response = client.create_target(
-            parent=parent, target=target, target_id=target_id
+        response = await concurrency.call(
+            'clouddeploy', client.create_target, parent=parent, target=target, target_id=target_id
         )
-        result = response.result()
 
-        return {"message": f"Successfully created Cloud Deploy GKE target: {result}"}
+        def on_done(result):
+            cache.invalidate("list_targets", project_id, location)
+            return {
+                "message": f"Successfully created Cloud Deploy GKE target: {result.name}",
+                "target": projection.summarize(result, fields, TARGET_SUMMARY_FIELDS),
+            }
+
+        tracked = operations.track_api_core_operation(
+            response, f"Create Cloud Deploy GKE target {target_id}", on_done=on_done
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def create_cloud_run_target(project_id: str, location: str, target_id: str, description: str = "") -> Dict[str, Any]:
+async def create_cloud_run_target(project_id: str, location: str, target_id: str, description: str = "", wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Cloud Deploy Cloud Run target.
 
     Args:
@@ -86,6 +120,8 @@ def create_cloud_run_target(project_id: str, location: str, target_id: str, desc
         location: The location of the target.
         target_id: The ID of the target to create.
         description: A description of the target.
+        wait_for_completion: Whether to wait for the target to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated target fields to return, e.g. 'name,execution_configs'. Defaults to a compact summary; pass '*' for the full target.
 
     Returns:
         A dictionary containing a success message or an error message.
@@ -101,18 +137,27 @@ def create_cloud_run_target(project_id: str, location: str, target_id: str, desc
             }
         }
 
-        response = client.create_target(
-            parent=parent, target=target, target_id=target_id
+        response = await concurrency.call(
+            'clouddeploy', client.create_target, parent=parent, target=target, target_id=target_id
         )
-        result = response.result()
 
-        return {"message": f"Successfully created Cloud Deploy Cloud Run target: {result}"}
+        def on_done(result):
+            cache.invalidate("list_targets", project_id, location)
+            return {
+                "message": f"Successfully created Cloud Deploy Cloud Run target: {result.name}",
+                "target": projection.summarize(result, fields, TARGET_SUMMARY_FIELDS),
+            }
+
+        tracked = operations.track_api_core_operation(
+            response, f"Create Cloud Deploy Cloud Run target {target_id}", on_done=on_done
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def create_rollout(project_id: str, location: str, delivery_pipeline_id: str, release_id: str, rollout_id: str, target_id: str) -> Dict[str, Any]:
+async def create_rollout(project_id: str, location: str, delivery_pipeline_id: str, release_id: str, rollout_id: str, target_id: str, wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Cloud Deploy rollout.
 
     Args:
@@ -122,6 +167,8 @@ def create_rollout(project_id: str, location: str, delivery_pipeline_id: str, re
         release_id: The ID of the release.
         rollout_id: The ID of the rollout to create.
         target_id: The ID of the target to deploy to.
+        wait_for_completion: Whether to wait for the rollout to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated rollout fields to return, e.g. 'name,phases'. Defaults to a compact summary; pass '*' for the full rollout.
 
     Returns:
         A dictionary containing a success message or an error message.
@@ -134,129 +181,216 @@ def create_rollout(project_id: str, location: str, delivery_pipeline_id: str, re
             "target_id": target_id
         }
 
-        response = client.create_rollout(
-            parent=parent, rollout=rollout, rollout_id=rollout_id
+        response = await concurrency.call(
+            'clouddeploy', client.create_rollout, parent=parent, rollout=rollout, rollout_id=rollout_id
         )
-        result = response.result()
-
-        return {"message": f"Successfully created Cloud Deploy rollout: {result}"}
+        tracked = operations.track_api_core_operation(
+            response, f"Create Cloud Deploy rollout {rollout_id}",
+            on_done=lambda result: {
+                "message": f"Successfully created Cloud Deploy rollout: {result.name}",
+                "rollout": projection.summarize(result, fields, ROLLOUT_SUMMARY_FIELDS),
+            },
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
+async def _first_page(method, request: Dict[str, Any], collection: str) -> Tuple[List[str], Optional[str]]:
+    """Calls a Cloud Deploy list method and returns the resource names and next page token of the first page.
+
+    Only these plain values leave the call, so identical concurrent calls can share them; the pager cannot be copied.
+    """
+    pager = await method(request=request)
+    # The first page comes with the pager; further pages are fetched by the next call.
+    async with contextlib.aclosing(pager.pages) as pages:
+        async for page in pages:
+            return [resource.name for resource in getattr(page, collection)], page.next_page_token
+    return [], None
+
+async def _list_names(method, parent: str, collection: str, result_key: str, page_size: int, page_token: Optional[str], max_pages: int, filter: Optional[str], order_by: Optional[str], ctx: Optional[Context]) -> Dict[str, Any]:
+    """Lists the resource names of one or more pages of a Cloud Deploy collection.
+
+    Args:
+        method: The bound list method of the Cloud Deploy client, e.g. client.list_targets.
+        parent: The parent resource name.
+        collection: The repeated field of the list response holding the resources, e.g. 'delivery_pipelines'.
+        result_key: The key to return the resource names under, e.g. 'pipelines'.
+
+    Returns:
+        A dictionary with the resource names under result_key and the next_page_token.
+    """
+    async def fetch_page(token):
+        request = {"parent": parent, "page_size": page_size, "page_token": token or "", "filter": filter or "", "order_by": order_by or ""}
+        return await concurrency.call('clouddeploy', _first_page, method, request, collection, idempotent=True)
+
+    names, next_page_token = await pagination.collect_pages(fetch_page, page_token, max_pages, ctx)
+    return {result_key: names, "next_page_token": next_page_token}
+
 @mcp.tool
-def list_delivery_pipelines(project_id: str, location: str) -> Dict[str, Any]:
-    """Lists all Cloud Deploy delivery pipelines.
+async def list_delivery_pipelines(
+    project_id: str,
+    location: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    filter: Optional[str] = None,
+    order_by: Optional[str] = None,
+    bypass_cache: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Lists Cloud Deploy delivery pipelines, one or more pages at a time.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the delivery pipelines.
+        page_size: The maximum number of delivery pipelines to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        filter: An optional server-side filter expression (AIP-160), e.g. 'suspended=false'.
+        order_by: An optional server-side ordering, e.g. 'create_time desc'.
+        bypass_cache: Whether to ignore recently cached results and fetch the delivery pipelines again.
 
     Returns:
-        A dictionary containing a list of delivery pipelines or an error message.
+        A dictionary containing a list of delivery pipelines and the next_page_token (None when there are no more), or an error message.
     """
+    return await cache.read_through(
+        "list_delivery_pipelines", project_id, location,
+        lambda: _list_delivery_pipelines(project_id, location, page_size, page_token, max_pages, filter, order_by, ctx),
+        key_extra=(page_size, page_token, max_pages, filter, order_by),
+        bypass_cache=bypass_cache,
+    )
+
+async def _list_delivery_pipelines(project_id: str, location: str, page_size: int, page_token: Optional[str], max_pages: int, filter: Optional[str], order_by: Optional[str], ctx: Optional[Context]) -> Dict[str, Any]:
     try:
         client = _get_cloud_deploy_service()
 
         parent = f"projects/{project_id}/locations/{location}"
-
-        response = client.list_delivery_pipelines(parent=parent)
-        
-        pipelines = []
-        for pipeline in response:
-            pipelines.append(pipeline.name)
-
-        return {"pipelines": pipelines}
+        return await _list_names(client.list_delivery_pipelines, parent, "delivery_pipelines", "pipelines", page_size, page_token, max_pages, filter, order_by, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def list_targets(project_id: str, location: str) -> Dict[str, Any]:
-    """Lists all Cloud Deploy targets.
+async def list_targets(
+    project_id: str,
+    location: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    filter: Optional[str] = None,
+    order_by: Optional[str] = None,
+    bypass_cache: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Lists Cloud Deploy targets, one or more pages at a time.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the targets.
+        page_size: The maximum number of targets to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        filter: An optional server-side filter expression (AIP-160), e.g. 'require_approval=true'.
+        order_by: An optional server-side ordering, e.g. 'create_time desc'.
+        bypass_cache: Whether to ignore recently cached results and fetch the targets again.
 
     Returns:
-        A dictionary containing a list of targets or an error message.
+        A dictionary containing a list of targets and the next_page_token (None when there are no more), or an error message.
     """
+    return await cache.read_through(
+        "list_targets", project_id, location,
+        lambda: _list_targets(project_id, location, page_size, page_token, max_pages, filter, order_by, ctx),
+        key_extra=(page_size, page_token, max_pages, filter, order_by),
+        bypass_cache=bypass_cache,
+    )
+
+async def _list_targets(project_id: str, location: str, page_size: int, page_token: Optional[str], max_pages: int, filter: Optional[str], order_by: Optional[str], ctx: Optional[Context]) -> Dict[str, Any]:
     try:
         client = _get_cloud_deploy_service()
 
         parent = f"projects/{project_id}/locations/{location}"
-
-        response = client.list_targets(parent=parent)
-
-        targets = []
-        for target in response:
-            targets.append(target.name)
-
-        return {"targets": targets}
+        return await _list_names(client.list_targets, parent, "targets", "targets", page_size, page_token, max_pages, filter, order_by, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def list_releases(project_id: str, location: str, delivery_pipeline_id: str) -> Dict[str, Any]:
-    """Lists all Cloud Deploy releases for a given delivery pipeline.
+async def list_releases(
+    project_id: str,
+    location: str,
+    delivery_pipeline_id: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    filter: Optional[str] = None,
+    order_by: Optional[str] = None,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Lists Cloud Deploy releases for a given delivery pipeline, one or more pages at a time.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the releases.
         delivery_pipeline_id: The ID of the delivery pipeline.
+        page_size: The maximum number of releases to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        filter: An optional server-side filter expression (AIP-160), e.g. 'render_state="SUCCEEDED"'.
+        order_by: An optional server-side ordering, e.g. 'create_time desc'.
 
     Returns:
-        A dictionary containing a list of releases or an error message.
+        A dictionary containing a list of releases and the next_page_token (None when there are no more), or an error message.
     """
     try:
         client = _get_cloud_deploy_service()
 
         parent = f"projects/{project_id}/locations/{location}/deliveryPipelines/{delivery_pipeline_id}"
-
-        response = client.list_releases(parent=parent)
-
-        releases = []
-        for release in response:
-            releases.append(release.name)
-
-        return {"releases": releases}
+        return await _list_names(client.list_releases, parent, "releases", "releases", page_size, page_token, max_pages, filter, order_by, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def list_rollouts(project_id: str, location: str, delivery_pipeline_id: str, release_id: str) -> Dict[str, Any]:
-    """Lists all Cloud Deploy rollouts for a given release.
+async def list_rollouts(
+    project_id: str,
+    location: str,
+    delivery_pipeline_id: str,
+    release_id: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    filter: Optional[str] = None,
+    order_by: Optional[str] = None,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Lists Cloud Deploy rollouts for a given release, one or more pages at a time.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the rollouts.
         delivery_pipeline_id: The ID of the delivery pipeline.
         release_id: The ID of the release.
+        page_size: The maximum number of rollouts to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        filter: An optional server-side filter expression (AIP-160), e.g. 'state="SUCCEEDED"'.
+        order_by: An optional server-side ordering, e.g. 'create_time desc'.
 
     Returns:
-        A dictionary containing a list of rollouts or an error message.
+        A dictionary containing a list of rollouts and the next_page_token (None when there are no more), or an error message.
     """
     try:
         client = _get_cloud_deploy_service()
 
         parent = f"projects/{project_id}/locations/{location}/deliveryPipelines/{delivery_pipeline_id}/releases/{release_id}"
-
-        response = client.list_rollouts(parent=parent)
-
-        rollouts = []
-        for rollout in response:
-            rollouts.append(rollout.name)
-
-        return {"rollouts": rollouts}
+        return await _list_names(client.list_rollouts, parent, "rollouts", "rollouts", page_size, page_token, max_pages, filter, order_by, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def promote_release(project_id: str, location: str, delivery_pipeline_id: str, release_id: str, to_target: str) -> Dict[str, Any]:
+async def promote_release(project_id: str, location: str, delivery_pipeline_id: str, release_id: str, to_target: str, wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Promotes a Cloud Deploy release to a specified target.
 
     Args:
@@ -265,6 +399,8 @@ def promote_release(project_id: str, location: str, delivery_pipeline_id: str, r
         delivery_pipeline_id: The ID of the delivery pipeline.
         release_id: The ID of the release to promote.
         to_target: The ID of the target to promote to.
+        wait_for_completion: Whether to wait for the rollout to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated rollout fields to return, e.g. 'name,phases'. Defaults to a compact summary; pass '*' for the full rollout.
 
     Returns:
         A dictionary containing a success message or an error message.
@@ -278,12 +414,17 @@ def promote_release(project_id: str, location: str, delivery_pipeline_id: str, r
         }
         rollout_id = f"rollout-{release_id}-{to_target}"
 
-        response = client.create_rollout(
-            parent=parent, rollout=rollout, rollout_id=rollout_id
+        response = await concurrency.call(
+            'clouddeploy', client.create_rollout, parent=parent, rollout=rollout, rollout_id=rollout_id
         )
-        result = response.result()
-
-        return {"message": f"Successfully created rollout to promote release: {result}"}
+        tracked = operations.track_api_core_operation(
+            response, f"Promote release {release_id} to {to_target}",
+            on_done=lambda result: {
+                "message": f"Successfully created rollout to promote release: {result.name}",
+                "rollout": projection.summarize(result, fields, ROLLOUT_SUMMARY_FIELDS),
+            },
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
\ No newline at end of file
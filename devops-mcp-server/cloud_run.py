@@ -1,17 +1,30 @@
 from app import mcp
-import google.auth
-from google.cloud import run_v2
-from typing import Dict, Any
+import clients
+import concurrency
+import operations
+import projection
+from fastmcp import Context
+from typing import Dict, Any, Optional
+
+# Fields returned for a created or updated service unless the caller asks for others.
+SERVICE_SUMMARY_FIELDS = [
+    "name",
+    "uri",
+    "latest_ready_revision",
+    "latest_created_revision",
+    "reconciling",
+    "terminal_condition.state",
+    "terminal_condition.message",
+]
 
 def _get_cloud_run_service():
     """Gets the Cloud Run service client."""
-    credentials, _ = google.auth.default(
-        scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    return run_v2.ServicesClient(credentials=credentials)
+    from google.cloud import run_v2
+
+    return clients.get_grpc_client(run_v2.ServicesAsyncClient, 'run', 'v2')
 
 @mcp.tool
-def create_cloud_run_service(project_id: str, location: str, service_name: str, image_url: str, port: int) -> Dict[str, Any]:
+async def create_cloud_run_service(project_id: str, location: str, service_name: str, image_url: str, port: int, wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Cloud Run service.
 
     Args:
@@ -20,6 +33,8 @@ def create_cloud_run_service(project_id: str, location: str, service_name: str,
         service_name: The name of the service to create.
         image_url: The URL of the container image to deploy.
         port: The port that the container listens on.
+        wait_for_completion: Whether to wait for the service to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated service fields to return, e.g. 'name,uri,conditions'. Defaults to a compact summary; pass '*' for the full service.
 
     Returns:
         A dictionary containing the created service or an error message.
@@ -43,19 +58,24 @@ def create_cloud_run_service(project_id: str, location: str, service_name: str,
             }
         }
 
-        operation = client.create_service(
-            parent=parent, service=service, service_id=service_name
+        operation = await concurrency.call(
+            'run', client.create_service, parent=parent, service=service, service_id=service_name
         )
-        response = operation.result()
-
-        return {"message": f"Successfully created Cloud Run service: {response}"}
+        tracked = operations.track_api_core_operation(
+            operation, f"Create Cloud Run service {service_name}",
+            on_done=lambda response: {
+                "message": f"Successfully created Cloud Run service: {response.name}",
+                "service": projection.summarize(response, fields, SERVICE_SUMMARY_FIELDS),
+            },
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 
 @mcp.tool
-def create_cloud_run_revision(project_id: str, location: str, service_name: str, image_url: str, revision_name: str = None) -> Dict[str, Any]:
+async def create_cloud_run_revision(project_id: str, location: str, service_name: str, image_url: str, revision_name: str = None, wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Cloud Run revision for a service with a new Docker image.
 
     Args:
@@ -64,17 +84,23 @@ def create_cloud_run_revision(project_id: str, location: str, service_name: str,
         service_name: The name of the service to update.
         image_url: The URL of the new container image to deploy.
         revision_name: The name of the new revision. If not specified, a name will be generated automatically.
+        wait_for_completion: Whether to wait for the revision to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated fields of the updated service to return, e.g. 'name,traffic_statuses'. Defaults to a compact summary; pass '*' for the full service.
 
     Returns:
         A dictionary containing the created revision or an error message.
     """
+    from google.cloud import run_v2
+
     try:
         client = _get_cloud_run_service()
 
         service_path = client.service_path(project_id, location, service_name)
 
         # Get the current service to get its template
-        service = client.get_service(name=service_path)
+        service = await concurrency.call(
+            'run', client.get_service, name=service_path, idempotent=True
+        )
 
         # Create a new revision template based on the current service's template
         new_template = service.template
@@ -88,10 +114,15 @@ def create_cloud_run_revision(project_id: str, location: str, service_name: str,
             template=new_template
         )
 
-        operation = client.update_service(service=updated_service)
-        response = operation.result()
-
-        return {"message": f"Successfully created Cloud Run revision: {response.latest_ready_revision}"}
+        operation = await concurrency.call('run', client.update_service, service=updated_service)
+        tracked = operations.track_api_core_operation(
+            operation, f"Create Cloud Run revision for service {service_name}",
+            on_done=lambda response: {
+                "message": f"Successfully created Cloud Run revision: {response.latest_ready_revision}",
+                "service": projection.summarize(response, fields, SERVICE_SUMMARY_FIELDS),
+            },
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
\ No newline at end of file
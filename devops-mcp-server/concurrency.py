@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict
+
+import clients
+import scheduler
+import singleflight
+
+# Blocking work (discovery-based clients, gcloud subprocesses, Vertex AI SDK
+# calls) runs on this pool so it never stalls the event loop.
+THREAD_POOL_SIZE = int(os.environ.get("DEVOPS_MCP_THREAD_POOL_SIZE", "32"))
+# Maximum number of in-flight calls per API. Override for a single API with
+# DEVOPS_MCP_CONCURRENCY_<API>, e.g. DEVOPS_MCP_CONCURRENCY_CLOUDBUILD=4.
+DEFAULT_CONCURRENCY = int(os.environ.get("DEVOPS_MCP_CONCURRENCY", "10"))
+
+_executor = ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="gcp-io")
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+# Identical reads in flight at the same time share one upstream call.
+_reads = singleflight.Group("reads")
+
+def concurrency_limit(api: str) -> int:
+    """Returns the configured maximum number of in-flight calls for an API."""
+    return int(os.environ.get(f"DEVOPS_MCP_CONCURRENCY_{api.upper()}", DEFAULT_CONCURRENCY))
+
+def limit(api: str) -> asyncio.Semaphore:
+    """Gets the semaphore bounding concurrent calls to an API.
+
+    Prefer call(), which also rate limits and retries the call. Use the semaphore directly
+    as an async context manager around other work that must count against the limit:
+
+        async with concurrency.limit("run"):
+            ...
+
+    Args:
+        api: The name of the API (e.g. 'run').
+
+    Returns:
+        The semaphore for the API.
+    """
+    semaphore = _semaphores.get(api)
+    if semaphore is None:
+        semaphore = _semaphores[api] = asyncio.Semaphore(concurrency_limit(api))
+    return semaphore
+
+async def run_blocking(api: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs a blocking call on the shared thread pool, bounded by the API's concurrency limit.
+
+    The call is not retried; use call_blocking() for API calls and execute() for
+    googleapiclient requests.
+
+    Args:
+        api: The name of the API the call is made against (e.g. 'cloudbuild').
+        fn: The blocking callable.
+        *args: Positional arguments for fn.
+        **kwargs: Keyword arguments for fn.
+
+    Returns:
+        The return value of fn.
+    """
+    async with limit(api):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+async def call(api: str, fn: Callable[..., Awaitable[Any]], *args, idempotent: bool = False, **kwargs) -> Any:
+    """Calls a native async client method under the API's concurrency and rate limits, retrying retryable errors.
+
+    Concurrent idempotent calls with the same method and arguments share a single upstream call,
+    and each caller gets a deep copy of its result: idempotent calls must return data such as
+    messages, not pagers or other objects holding clients.
+
+        service = await concurrency.call("run", client.get_service, name=name, idempotent=True)
+
+    Args:
+        api: The name of the API (e.g. 'run').
+        fn: The coroutine function to call, e.g. a bound client method.
+        *args: Positional arguments for fn.
+        idempotent: Whether repeating the call is safe if an attempt failed part-way, as for reads.
+        **kwargs: Keyword arguments for fn.
+
+    Returns:
+        The return value of fn.
+    """
+    async def attempt():
+        async with limit(api):
+            return await fn(*args, **kwargs)
+
+    if not idempotent:
+        return await scheduler.submit(api, attempt)
+    key = (api, getattr(fn, "__qualname__", repr(fn)), repr(args), repr(sorted(kwargs.items())))
+    return await _reads.do(key, lambda: scheduler.submit(api, attempt, idempotent=True))
+
+async def call_blocking(api: str, fn: Callable[..., Any], *args, idempotent: bool = False, **kwargs) -> Any:
+    """Like run_blocking(), but also rate limits the call and retries retryable errors.
+
+    Args:
+        api: The name of the API the call is made against (e.g. 'vertexai').
+        fn: The blocking callable.
+        *args: Positional arguments for fn.
+        idempotent: Whether repeating the call is safe if an attempt failed part-way, as for reads.
+        **kwargs: Keyword arguments for fn.
+
+    Returns:
+        The return value of fn.
+    """
+    return await scheduler.submit(api, lambda: run_blocking(api, fn, *args, **kwargs), idempotent)
+
+# IAM policy reads are POST requests.
+_READ_METHOD_SUFFIXES = (":getIamPolicy", ":testIamPermissions")
+
+def _is_read(request) -> bool:
+    return request.method in ("GET", "HEAD") or request.uri.split("?", 1)[0].endswith(_READ_METHOD_SUFFIXES)
+
+async def execute(api: str, request) -> Any:
+    """Executes a googleapiclient HttpRequest on the shared thread pool.
+
+    httplib2 is not thread-safe, so the request is sent over the worker
+    thread's own authorized connection rather than the one it was built with.
+    Requests are rate limited per API. Rate limit errors are retried for every
+    request, and server errors and dropped connections for reads. Identical reads
+    in flight at the same time share a single upstream request.
+
+    Args:
+        api: The name of the API the request is made against (e.g. 'cloudbuild').
+        request: The googleapiclient.http.HttpRequest to execute.
+
+    Returns:
+        The deserialized response.
+    """
+    def send():
+        return request.execute(http=clients.get_authorized_http())
+
+    if not _is_read(request):
+        return await call_blocking(api, send)
+    key = (api, request.method, request.uri, request.body)
+    return await _reads.do(key, lambda: call_blocking(api, send, idempotent=True))
@@ -1,60 +1,232 @@
-from fastapi import APIRouter, HTTPException
-import google.auth
-from google.cloud.devtools import containeranalysis_v1
-from mcp import mcp_capability
-
-router = APIRouter()
-
-@router.post("/containerAnalysis/listVulnerabilities/")
-@mcp_capability(
-    name="containerAnalysis/listVulnerabilities/",
-    description="Lists vulnerabilities for a given image resource URL using Container Analysis.",
-    parameters=[
-        {
-            "name": "project_id",
-            "type": "string",
-            "description": "The ID of the GCP project where the image resides.",
-        },
-        {
-            "name": "resource_url",
-            "type": "string",
-            "description": "The full resource URL of the image (e.g., 'https://gcr.io/project-id/image-name@sha256:digest').",
-        },
-    ],
-)
-def list_vulnerabilities(project_id: str, resource_url: str):
-    """Lists vulnerabilities for a given image resource URL using Container Analysis.
+from app import mcp
+import cache
+import deployment_store
+import occurrences
+import projection
+from fastmcp import Context
+from typing import Optional, Dict, Any, List
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Severities from most to least severe.
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW", "MINIMAL", "SEVERITY_UNSPECIFIED"]
+
+# Occurrence fields fetched for each vulnerability; long descriptions are never requested.
+VULNERABILITY_OCCURRENCE_FIELDS = [
+    "noteName",
+    "vulnerability.severity",
+    "vulnerability.effectiveSeverity",
+    "vulnerability.cvssScore",
+    "vulnerability.fixAvailable",
+    "vulnerability.shortDescription",
+    "vulnerability.packageIssue.affectedPackage",
+    "vulnerability.packageIssue.affectedVersion.fullName",
+    "vulnerability.packageIssue.fixedVersion.fullName",
+]
+
+# Fields returned for each vulnerability when details are requested, unless the caller asks for others.
+VULNERABILITY_SUMMARY_FIELDS = [
+    "cve",
+    "severity",
+    "cvss_score",
+    "fix_available",
+    "packages",
+]
+
+def _vulnerability(occurrence: Dict[str, Any]) -> Dict[str, Any]:
+    """Flattens a vulnerability occurrence into a compact record."""
+    vulnerability = occurrence.get("vulnerability", {})
+    severity = vulnerability.get("effectiveSeverity") or vulnerability.get("severity")
+    return {
+        "cve": occurrence.get("noteName", "").rsplit("/", 1)[-1],
+        "severity": severity if severity in SEVERITIES else "SEVERITY_UNSPECIFIED",
+        "cvss_score": vulnerability.get("cvssScore"),
+        "fix_available": bool(vulnerability.get("fixAvailable")),
+        "description": vulnerability.get("shortDescription"),
+        "packages": [
+            {
+                "name": issue.get("affectedPackage"),
+                "version": issue.get("affectedVersion", {}).get("fullName"),
+                "fixed_version": issue.get("fixedVersion", {}).get("fullName"),
+            }
+            for issue in vulnerability.get("packageIssue", [])
+        ],
+    }
+
+async def _image_vulnerabilities(project_id: str, resource_url: str, bypass_cache: bool = False, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """Returns the vulnerabilities of a digest-pinned image, cached per digest.
 
     Args:
-        project_id: The ID of the GCP project where the image resides.
-        resource_url: The full resource URL of the image (e.g., 'https://gcr.io/project-id/image-name@sha256:digest').
+        project_id: The ID of the Google Cloud project, used when the image's project cannot be derived from its URL.
+        resource_url: The image URL, pinned by digest.
+        bypass_cache: Whether to ignore the cached vulnerabilities and list them again.
+        ctx: The MCP context of the calling tool, used to send progress notifications.
+
+    Returns:
+        A dictionary with the image reference and its vulnerability records, or an error message.
     """
+    image = occurrences.image_reference(resource_url)
+    digest = deployment_store.artifact_digest(image)
+    if digest is None:
+        return {"error": f"{resource_url} is not pinned by digest; use an image URL ending in '@sha256:...'."}
+    image_project = occurrences.image_project(image, project_id)
+
+    async def load():
+        try:
+            found = await occurrences.list_occurrences(image_project, image, "VULNERABILITY", VULNERABILITY_OCCURRENCE_FIELDS, ctx)
+        except Exception as e:
+            logger.error(f"Error listing vulnerabilities of {image}: {e}", exc_info=True)
+            return {"error": str(e)}
+        return {"image": image, "vulnerabilities": [_vulnerability(occurrence) for occurrence in found]}
+
+    # An image digest is immutable, so it identifies the result whichever tag or URL the image was named by.
+    return await cache.read_through("list_vulnerabilities", image_project, None, load, key_extra=(digest,), bypass_cache=bypass_cache)
+
+def _matches(vulnerability: Dict[str, Any], min_severity: Optional[str], fix_available: Optional[bool]) -> bool:
+    if min_severity is not None and SEVERITIES.index(vulnerability["severity"]) > SEVERITIES.index(min_severity):
+        return False
+    return fix_available is None or vulnerability["fix_available"] == fix_available
+
+def _severity_counts(vulnerabilities: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Counts vulnerabilities by severity, most severe first."""
+    counts = {severity: 0 for severity in SEVERITIES}
+    for vulnerability in vulnerabilities:
+        counts[vulnerability["severity"]] += 1
+    return counts
+
+@mcp.tool
+async def list_vulnerabilities(
+    project_id: str,
+    resource_url: str,
+    min_severity: Optional[str] = None,
+    fix_available: Optional[bool] = None,
+    details: bool = False,
+    fields: Optional[str] = None,
+    bypass_cache: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Summarizes the vulnerabilities Container Analysis found in an image.
+
+    Every page of occurrences is read, and the result is cached per image digest,
+    so repeated calls with different filters do not call the API again.
+
+    Args:
+        project_id: The ID of the Google Cloud project. Artifact Registry and Container Registry images are looked up in the project hosting them.
+        resource_url: The image URL pinned by digest, e.g. 'https://us-docker.pkg.dev/my-project/my-repo/my-image@sha256:...'.
+        min_severity: Only count vulnerabilities at least this severe: CRITICAL, HIGH, MEDIUM, LOW or MINIMAL.
+        fix_available: Only count vulnerabilities that do (true) or do not (false) have a fix available.
+        details: Whether to also return the matching vulnerabilities, most severe first.
+        fields: Comma-separated vulnerability fields to return with details, e.g. 'cve,severity,description'. Defaults to a compact summary; pass '*' for every field.
+        bypass_cache: Whether to ignore cached vulnerabilities and list them again.
+
+    Returns:
+        A dictionary with the number of matching vulnerabilities, their counts by severity, how many have a fix, and optionally the vulnerabilities themselves, or an error message.
+    """
+    if min_severity is not None:
+        min_severity = min_severity.upper()
+        if min_severity not in SEVERITIES:
+            return {"error": f"Invalid min_severity: {min_severity}. Use one of {', '.join(SEVERITIES[:-1])}."}
     try:
-        credentials, project = google.auth.default(
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        client = containeranalysis_v1.ContainerAnalysisClient(credentials=credentials)
+        result = await _image_vulnerabilities(project_id, resource_url, bypass_cache, ctx)
+        if cache.is_error(result):
+            return result
+        matching = [v for v in result["vulnerabilities"] if _matches(v, min_severity, fix_available)]
+        summary = {
+            "image": result["image"],
+            "total": len(matching),
+            "severity_counts": _severity_counts(matching),
+            "fix_available": sum(1 for v in matching if v["fix_available"]),
+        }
+        if details:
+            matching.sort(key=lambda v: (SEVERITIES.index(v["severity"]), -(v["cvss_score"] or 0), v["cve"]))
+            summary["vulnerabilities"] = [projection.summarize(v, fields, VULNERABILITY_SUMMARY_FIELDS) for v in matching]
+        return summary
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
+
+def _by_cve(vulnerabilities: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Indexes vulnerabilities by CVE, keeping the most severe record when a CVE occurs more than once."""
+    indexed: Dict[str, Dict[str, Any]] = {}
+    for vulnerability in sorted(vulnerabilities, key=lambda v: SEVERITIES.index(v["severity"]), reverse=True):
+        indexed[vulnerability["cve"]] = vulnerability
+    return indexed
+
+def _compare(base: List[Dict[str, Any]], target: List[Dict[str, Any]], min_severity: Optional[str] = None) -> Dict[str, Any]:
+    """Diffs two images' vulnerabilities by CVE.
+
+    A CVE is reported if it is at least min_severity in either image, so a CVE whose
+    severity rose past the threshold shows up as a severity change rather than as added.
+    """
+    base_cves, target_cves = _by_cve(base), _by_cve(target)
 
-        # Construct the parent path for the project
-        parent = f"projects/{project_id}"
+    def relevant(*records):
+        return any(record is not None and _matches(record, min_severity, None) for record in records)
 
-        # List occurrences (vulnerabilities are a type of occurrence)
-        response = client.list_occurrences(
-            parent=parent, filter=f'resourceUrl="{resource_url}" AND kind="VULNERABILITY"'
+    def listed(cves, source):
+        return sorted(
+            ({"cve": cve, "severity": source[cve]["severity"], "fix_available": source[cve]["fix_available"]} for cve in cves if relevant(source[cve])),
+            key=lambda v: (SEVERITIES.index(v["severity"]), v["cve"]),
         )
 
-        vulnerabilities = []
-        for occurrence in response.occurrences:
-            vulnerabilities.append({
-                "note_name": occurrence.note_name,
-                "severity": occurrence.vulnerability.severity.name,
-                "short_description": occurrence.vulnerability.short_description,
-                "long_description": occurrence.vulnerability.long_description,
-                "effective_severity": occurrence.vulnerability.effective_severity.name,
-                "fix_available": occurrence.vulnerability.fix_available,
-            })
+    unchanged = sorted(cve for cve in base_cves.keys() & target_cves.keys() if relevant(base_cves[cve], target_cves[cve]))
+    base_counts = _severity_counts([v for v in base_cves.values() if relevant(v)])
+    target_counts = _severity_counts([v for v in target_cves.values() if relevant(v)])
+    return {
+        "added": listed(target_cves.keys() - base_cves.keys(), target_cves),
+        "removed": listed(base_cves.keys() - target_cves.keys(), base_cves),
+        "unchanged": unchanged,
+        "severity_changed": [
+            {"cve": cve, "from": base_cves[cve]["severity"], "to": target_cves[cve]["severity"]}
+            for cve in unchanged
+            if base_cves[cve]["severity"] != target_cves[cve]["severity"]
+        ],
+        "severity_delta": {severity: target_counts[severity] - base_counts[severity] for severity in SEVERITIES},
+    }
 
-        return {"vulnerabilities": vulnerabilities}
+@mcp.tool
+async def compare_image_vulnerabilities(
+    project_id: str,
+    base_resource_url: str,
+    target_resource_url: str,
+    min_severity: Optional[str] = None,
+    bypass_cache: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Compares the vulnerabilities of two images, e.g. the one currently deployed and a release candidate.
+
+    Both images are scanned concurrently, and each scan is cached per digest, so comparing
+    one candidate against several deployed images only lists its occurrences once.
+
+    Args:
+        project_id: The ID of the Google Cloud project. Artifact Registry and Container Registry images are looked up in the project hosting them.
+        base_resource_url: The URL of the image to compare against (e.g. the deployed one), pinned by digest.
+        target_resource_url: The URL of the new image, pinned by digest.
+        min_severity: Only report CVEs at least this severe in either image: CRITICAL, HIGH, MEDIUM, LOW or MINIMAL.
+        bypass_cache: Whether to ignore cached vulnerabilities and list them again.
+
+    Returns:
+        A dictionary with the CVEs the target image adds, removes and keeps, the CVEs whose
+        severity changed, and the change in the number of CVEs per severity, or an error message.
+    """
+    if min_severity is not None:
+        min_severity = min_severity.upper()
+        if min_severity not in SEVERITIES:
+            return {"error": f"Invalid min_severity: {min_severity}. Use one of {', '.join(SEVERITIES[:-1])}."}
+    try:
+        base, target = await asyncio.gather(
+            _image_vulnerabilities(project_id, base_resource_url, bypass_cache, ctx),
+            _image_vulnerabilities(project_id, target_resource_url, bypass_cache, ctx),
+        )
+        for result in (base, target):
+            if cache.is_error(result):
+                return result
+        comparison = _compare(base["vulnerabilities"], target["vulnerabilities"], min_severity)
+        return {"base_image": base["image"], "target_image": target["image"], **comparison}
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
@@ -1,16 +1,113 @@
-import google.auth
-from googleapiclient import discovery
 from app import mcp
-import time
-from typing import Optional, Dict, Any, List
+import cache
+import clients
+import concurrency
+import deployment_diff
+import deployment_store
+import metrics
+import occurrences
+import pagination
+import projection
+from fastmcp import Context
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+import asyncio
+import datetime
 import logging
+import math
 import subprocess
 import json
 import os
+import time
 
 logger = logging.getLogger(__name__)
 
 GCLOUD_EXECUTABLE = "gcloud_dci/google-cloud-sdk/bin/gcloud"
+# query_deployment_events syncs first when the last sync of an insights config is older than this.
+SYNC_INTERVAL_SECONDS = float(os.environ.get("DEVOPS_MCP_DEPLOYMENT_SYNC_INTERVAL", "60"))
+# Page size used when syncing deployment events; 1000 is the API maximum.
+SYNC_PAGE_SIZE = 1000
+# Maximum number of consecutive deployments compare_deployments composes diffs over.
+MAX_COMPARED_DEPLOYMENTS = 100
+# Page size used when syncing Cloud Build history for get_dora_metrics.
+BUILD_SYNC_PAGE_SIZE = 500
+# get_dora_metrics covers this many days up to now when no start_time is given.
+DEFAULT_DORA_WINDOW_DAYS = 30
+# index_deployed_images rescans an image once its index entry is older than this, as new vulnerabilities get published.
+IMAGE_INDEX_TTL_SECONDS = float(os.environ.get("DEVOPS_MCP_IMAGE_INDEX_TTL", str(24 * 3600)))
+# Occurrence fields the image index is built from.
+INDEXED_VULNERABILITY_FIELDS = [
+    "noteName",
+    "vulnerability.severity",
+    "vulnerability.effectiveSeverity",
+    "vulnerability.fixAvailable",
+    "vulnerability.packageIssue.affectedPackage",
+    "vulnerability.packageIssue.fixAvailable",
+]
+INDEXED_PACKAGE_FIELDS = ["package.name", "package.version"]
+
+def _get_developer_connect_service():
+    """Gets the Developer Connect service client."""
+    return clients.get_discovery_service('developerconnect', 'v1')
+
+def _get_cloud_build_service():
+    """Gets the Cloud Build service client."""
+    return clients.get_discovery_service('cloudbuild', 'v1')
+
+def _insights_config_name(project_id: str, location: str, insights_config_id: str) -> str:
+    return f"projects/{project_id}/locations/{location}/insightsConfigs/{insights_config_id}"
+
+async def _with_gcloud_fallback(description: str, native: Callable[[], Awaitable[Any]], command_args: Optional[List[str]], adapt: Optional[Callable[[Any], Any]] = None) -> Any:
+    """Runs a Developer Connect API call, falling back to the gcloud CLI if it fails.
+
+    Args:
+        description: What the call does, for logging.
+        native: A coroutine function making the call through the Developer Connect API.
+        command_args: The equivalent gcloud arguments (excluding the executable name), or None if there is no equivalent.
+        adapt: An optional function turning the gcloud output into the shape the native call returns.
+
+    Returns:
+        The result of the native call, or of the gcloud fallback.
+    """
+    try:
+        return await native()
+    except Exception as e:
+        if command_args is None:
+            logger.error(f"{description} through the Developer Connect API failed: {e}", exc_info=True)
+            return {"error": str(e)}
+        logger.warning(f"{description} through the Developer Connect API failed, falling back to gcloud: {e}")
+        metrics.increment("dci.gcloud_fallback")
+        result = await concurrency.run_blocking('gcloud', _run_gcloud_command, command_args)
+        if cache.is_error(result):
+            return {"error": f"{e} (gcloud fallback: {result['error']})"}
+        return adapt(result) if adapt is not None else result
+
+def _is_final(event: Dict[str, Any]) -> bool:
+    """Returns whether a deployment event has ended, after which it no longer changes."""
+    return bool(event.get("undeployTime")) or event.get("state") == "STATE_INACTIVE"
+
+async def _cached_detail(kind: str, name: str, load: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool], bypass_cache: bool = False) -> Any:
+    """Serves a deployment event detail from the local store, loading and storing it on a miss.
+
+    Args:
+        kind: What is cached for the event, e.g. 'event' or 'diff'.
+        name: The full resource name of the deployment event.
+        load: A coroutine function fetching the detail.
+        cacheable: Whether a loaded detail is final and may be stored permanently.
+        bypass_cache: Whether to skip the stored detail and fetch it again.
+
+    Returns:
+        The (possibly stored) detail.
+    """
+    if not bypass_cache:
+        stored = await concurrency.run_blocking('deployment_store', deployment_store.store.get_detail, name, kind)
+        if stored is not None:
+            metrics.increment(f"deployment_store.{kind}.hit")
+            return stored
+    metrics.increment(f"deployment_store.{kind}.{'bypass' if bypass_cache else 'miss'}")
+    result = await load()
+    if not cache.is_error(result) and cacheable(result):
+        await concurrency.run_blocking('deployment_store', deployment_store.store.put_detail, name, kind, result)
+    return result
 
 def _run_gcloud_command(command_args: List[str]) -> Dict[str, Any] | List[Dict[str, Any]] | Dict[str, Any]:
     """
@@ -72,20 +169,32 @@ def _run_gcloud_command(command_args: List[str]) -> Dict[str, Any] | List[Dict[s
         return {"error": error_msg}
 
 @mcp.tool
-def list_deployment_events(insights_config_id: str,
+async def list_deployment_events(insights_config_id: str,
     location: str,
-    project_id: str
-    ) -> List[Dict[str, Any]] | Dict[str, Any]:
-    """Lists Deployment Events of an Insights Config
+    project_id: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    filter: Optional[str] = None,
+    order_by: Optional[str] = None,
+    ctx: Context = None,
+    ) -> Dict[str, Any]:
+    """Lists Deployment Events of an Insights Config, newest first.
 
     Args:
-        insights_config: The name of the Insights Config.
+        insights_config_id: The ID of the Insights Config.
         project_id: The ID of the Google Cloud project.
         location: The location of the insghts config.
+        page_size: The maximum number of deployment events to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        filter: An optional server-side filter expression (AIP-160), e.g. 'state="STATE_ACTIVE"'.
+        order_by: An optional server-side ordering. Defaults to 'deploy_time desc'.
     
     Returns:
-        A dictionary containing a list of deployment events.
+        A dictionary containing a list of deployment events and the next_page_token (None when there are no more).
 
+    Falls back to:
     gcloud_dci alpha developer-connect insights-configs deployment-events list \
     --insights-config=view-test-ic \
     --location=us-central1 \
@@ -94,22 +203,46 @@ def list_deployment_events(insights_config_id: str,
     --format=json
     """
     logger.info(f"Listing deployment events for config '{insights_config_id}' in project '{project_id}'.")
-    
+    parent = _insights_config_name(project_id, location, insights_config_id)
+
+    async def native():
+        service = _get_developer_connect_service()
+
+        async def fetch_page(token):
+            request = service.projects().locations().insightsConfigs().deploymentEvents().list(
+                parent=parent, pageSize=page_size, pageToken=token, filter=filter or None, orderBy=order_by or "deploy_time desc"
+            )
+            response = await concurrency.execute('developerconnect', request)
+            return response.get("deploymentEvents", []), response.get("nextPageToken")
+
+        events, next_page_token = await pagination.collect_pages(fetch_page, page_token, max_pages, ctx)
+        return {"deploymentEvents": events, "next_page_token": next_page_token}
+
     command_args = [
         'alpha', 'developer-connect', 'insights-configs', 'deployment-events', 'list',
         f'--insights-config={insights_config_id}',
         f'--location={location}',
         f'--project={project_id}',
         '--sort-by=~deployTime',
+        f'--limit={page_size * max_pages}',
         '--format=json'
     ]
-    return _run_gcloud_command(command_args)
+    if filter:
+        command_args.append(f'--filter={filter}')
+    if page_token:
+        # gcloud cannot resume from an API page token.
+        command_args = None
+    return await _with_gcloud_fallback(
+        "Listing deployment events", native, command_args,
+        adapt=lambda events: {"deploymentEvents": events, "next_page_token": None},
+    )
 
 @mcp.tool
-def describe_deployment_event(deployment_id: str,
+async def describe_deployment_event(deployment_id: str,
     insights_config_id: str,
     location: str,
-    project_id: str
+    project_id: str,
+    bypass_cache: bool = False
     ) -> Dict[str, Any]:
     """Describe a single Deployment Event of an Insights Config
 
@@ -125,10 +258,13 @@ def describe_deployment_event(deployment_id: str,
         insights_config: The name of the Insights Config.
         project_id: The ID of the Google Cloud project.
         location: The location of the insghts config.
+        bypass_cache: Whether to ignore the locally stored event and fetch it again. Events that
+            have ended never change and are stored permanently.
     
     Returns:
         A dictionary containing a single deployment event.
 
+    Falls back to:
     gcloud_dci alpha developer-connect insights-configs deployment-events describe <DEPLOYMENT_ID>  \
     --insights-config=view-test-ic \
     --location=us-central1 \
@@ -136,7 +272,13 @@ def describe_deployment_event(deployment_id: str,
     --format=json
     """
     logger.info(f"Describing SDLC context for deployment ID '{deployment_id}' in project '{project_id}'.")
-    
+    name = f"{_insights_config_name(project_id, location, insights_config_id)}/deploymentEvents/{deployment_id}"
+
+    async def native():
+        service = _get_developer_connect_service()
+        request = service.projects().locations().insightsConfigs().deploymentEvents().get(name=name)
+        return await concurrency.execute('developerconnect', request)
+
     command_args = [
         'alpha', 'developer-connect', 'insights-configs', 'deployment-events', 'describe',
         deployment_id,
@@ -146,17 +288,24 @@ def describe_deployment_event(deployment_id: str,
         '--format=json'
     ]
     
-    return _run_gcloud_command(command_args)
+    return await _cached_detail(
+        "event", name,
+        lambda: _with_gcloud_fallback("Describing a deployment event", native, command_args),
+        cacheable=_is_final,
+        bypass_cache=bypass_cache,
+    )
 
 @mcp.tool
-def describe_deployment_diff_content(deployment_id: str,
+async def describe_deployment_diff_content(deployment_id: str,
     insights_config_id: str,
     location: str,
-    project_id: str
+    project_id: str,
+    bypass_cache: bool = False
     ) -> Dict[str, Any]:
     """Show the diff content of a single Deployment Event and the previously running one of an Insights Config
 
     Use to find vulnerability changes, package changes that are present in the newer deployment.
+    The Developer Connect API does not compute these diffs, so this tool still runs gcloud.
 
     You can obtain the <DEPLOYMENT_ID> by the list_deployment_events function and extrapolating from the name field the DEPLOYMENT_ID.
     For example, from this name:
@@ -167,6 +316,8 @@ def describe_deployment_diff_content(deployment_id: str,
         insights_config: The name of the Insights Config.
         project_id: The ID of the Google Cloud project.
         location: The location of the insghts config.
+        bypass_cache: Whether to ignore the locally stored diff and compute it again. A deployment's
+            diff against its predecessor never changes and is stored permanently.
     
     Returns:
         A dictionary containing diff information of the deployment event.
@@ -195,6 +346,11 @@ def describe_deployment_diff_content(deployment_id: str,
     }
     """
     logger.info(f"Describing diff context for deployment ID '{deployment_id}' in project '{project_id}'.")
+    return await _describe_diff(project_id, location, insights_config_id, deployment_id, bypass_cache)
+
+async def _describe_diff(project_id: str, location: str, insights_config_id: str, deployment_id: str, bypass_cache: bool = False) -> Dict[str, Any]:
+    """Gets the diff of a deployment against the one it replaced, from the local store or gcloud."""
+    name = f"{_insights_config_name(project_id, location, insights_config_id)}/deploymentEvents/{deployment_id}"
     
     command_args = [
         'alpha', 'developer-connect', 'insights-configs', 'deployment-events', 'describe',
@@ -206,4 +362,527 @@ def describe_deployment_diff_content(deployment_id: str,
         '--format=json'
     ]
     
-    return _run_gcloud_command(command_args)
+    return await _cached_detail(
+        "diff", name,
+        lambda: concurrency.run_blocking('gcloud', _run_gcloud_command, command_args),
+        cacheable=lambda diff: True,
+        bypass_cache=bypass_cache,
+    )
+
+
+def _format_timestamp(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+async def _fetch_event(service, name: str) -> Optional[Dict[str, Any]]:
+    request = service.projects().locations().insightsConfigs().deploymentEvents().get(name=name)
+    try:
+        return await concurrency.execute('developerconnect', request)
+    except Exception as e:
+        logger.warning(f"Could not refresh deployment event {name}: {e}")
+        return None
+
+async def _sync_deployment_events(parent: str, full: bool = False, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """Pulls the deployment events of an insights config that are newer than the last sync into the local store.
+
+    Events are listed newest first and paging stops at the first event older
+    than the newest one already stored. Stored events that were still active are
+    re-fetched, since an event ends when the next deployment replaces it.
+
+    Args:
+        parent: The full resource name of the insights config.
+        full: Whether to re-list the whole history instead of only new events.
+        ctx: The MCP context of the calling tool, used to send progress notifications.
+
+    Returns:
+        A summary of the sync.
+    """
+    store = deployment_store.store
+    state = await concurrency.run_blocking('deployment_store', store.sync_state, parent)
+    since = None if full or state is None else state["last_deploy_time"]
+    active = await concurrency.run_blocking('deployment_store', store.active_event_names, parent)
+    service = _get_developer_connect_service()
+
+    async def fetch_page(token):
+        request = service.projects().locations().insightsConfigs().deploymentEvents().list(
+            parent=parent, pageSize=SYNC_PAGE_SIZE, pageToken=token, orderBy="deploy_time desc"
+        )
+        response = await concurrency.execute('developerconnect', request)
+        page = response.get("deploymentEvents", [])
+        # Events deployed at exactly the last seen time are re-read, as they may not all have been stored.
+        fresh = [event for event in page if since is None or (deployment_store.parse_timestamp(event.get("deployTime")) or 0) >= since]
+        return fresh, response.get("nextPageToken") if len(fresh) == len(page) else None
+
+    pulled, _ = await pagination.collect_pages(fetch_page, max_pages=None, ctx=ctx)
+    pulled_names = {event["name"] for event in pulled}
+    refreshed = await asyncio.gather(*(_fetch_event(service, name) for name in active if name not in pulled_names))
+    events = pulled + [event for event in refreshed if event is not None]
+
+    new = await concurrency.run_blocking('deployment_store', store.upsert_events, parent, events)
+    deploy_times = [t for t in (deployment_store.parse_timestamp(event.get("deployTime")) for event in pulled) if t is not None]
+    last_deploy_time = max(deploy_times + ([since] if since is not None else []), default=None)
+    await concurrency.run_blocking('deployment_store', store.mark_synced, parent, last_deploy_time)
+    metrics.increment("deployment_store.sync")
+    logger.info(f"Synced {parent}: {new} new and {len(events) - new} updated deployment events.")
+    return {"new_events": new, "updated_events": len(events) - new, "last_deploy_time": _format_timestamp(last_deploy_time)}
+
+async def _ensure_synced(parent: str, ctx: Optional[Context] = None):
+    """Syncs an insights config unless it was synced within the last SYNC_INTERVAL_SECONDS."""
+    state = await concurrency.run_blocking('deployment_store', deployment_store.store.sync_state, parent)
+    if state is None or time.time() - state["synced_at"] > SYNC_INTERVAL_SECONDS:
+        await _sync_deployment_events(parent, ctx=ctx)
+
+@mcp.tool
+async def sync_deployment_events(insights_config_id: str,
+    location: str,
+    project_id: str,
+    full: bool = False,
+    ctx: Context = None
+    ) -> Dict[str, Any]:
+    """Syncs the Deployment Events of an Insights Config into the local store queried by query_deployment_events.
+
+    Only events newer than the last sync are fetched, plus any previously active events whose state may have changed.
+
+    Args:
+        insights_config_id: The ID of the Insights Config.
+        location: The location of the insights config.
+        project_id: The ID of the Google Cloud project.
+        full: Whether to re-fetch the whole deployment history.
+
+    Returns:
+        A dictionary with the number of new and updated events and the newest deploy time, or an error message.
+    """
+    try:
+        return await _sync_deployment_events(_insights_config_name(project_id, location, insights_config_id), full, ctx)
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
+
+@mcp.tool
+async def query_deployment_events(insights_config_id: str,
+    location: str,
+    project_id: str,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    runtime_target: Optional[str] = None,
+    artifact_digest: Optional[str] = None,
+    state: Optional[str] = None,
+    limit: int = 50,
+    ctx: Context = None
+    ) -> Dict[str, Any]:
+    """Queries the Deployment Events of an Insights Config from the local store, newest first.
+
+    The store is synced first if it was last synced more than a minute ago, so
+    only new events are fetched from the API and the query itself runs locally.
+
+    Args:
+        insights_config_id: The ID of the Insights Config.
+        location: The location of the insights config.
+        project_id: The ID of the Google Cloud project.
+        start_time: Only events deployed at or after this RFC 3339 time, e.g. '2025-06-01T00:00:00Z'.
+        end_time: Only events deployed before this RFC 3339 time.
+        runtime_target: Only events deployed to this runtime, given as its full runtime URI or its name (e.g. the Cloud Run service or GKE workload name).
+        artifact_digest: Only events deploying an image with this digest, e.g. 'sha256:0a5a81d5...'.
+        state: Only events in this state: 'STATE_ACTIVE' or 'STATE_INACTIVE'.
+        limit: The maximum number of events to return.
+
+    Returns:
+        A dictionary containing the matching deployment events and when the store was last synced, or an error message.
+    """
+    try:
+        parent = _insights_config_name(project_id, location, insights_config_id)
+        store = deployment_store.store
+        await _ensure_synced(parent, ctx)
+
+        bounds = {}
+        for argument, value in (("start_time", start_time), ("end_time", end_time)):
+            if value:
+                bounds[argument] = deployment_store.parse_timestamp(value)
+                if bounds[argument] is None:
+                    return {"error": f"Invalid {argument}: {value}. Use an RFC 3339 time such as '2025-06-01T00:00:00Z'."}
+        if artifact_digest and not artifact_digest.startswith("sha256:"):
+            artifact_digest = f"sha256:{artifact_digest}"
+
+        events = await concurrency.run_blocking(
+            'deployment_store', store.query_events, parent,
+            start_time=bounds.get("start_time"), end_time=bounds.get("end_time"),
+            runtime_target=runtime_target, digest=artifact_digest, state=state, limit=limit,
+        )
+        synced = await concurrency.run_blocking('deployment_store', store.sync_state, parent)
+        return {"deploymentEvents": events, "synced_at": _format_timestamp(synced["synced_at"])}
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
+
+def _deployment_id(event: Dict[str, Any]) -> str:
+    return event["name"].rsplit("/", 1)[-1]
+
+@mcp.tool
+async def compare_deployments(insights_config_id: str,
+    location: str,
+    project_id: str,
+    to_deployment_id: Optional[str] = None,
+    from_deployment_id: Optional[str] = None,
+    runtime_target: Optional[str] = None,
+    last_n: Optional[int] = None,
+    ctx: Context = None
+    ) -> Dict[str, Any]:
+    """Computes what changed between two deployments to the same runtime, across any number of deployments in between.
+
+    Either give from_deployment_id and to_deployment_id, or give runtime_target and last_n to
+    see what the last N deployments to a runtime changed. The per-deployment diffs are fetched
+    in parallel (and stored locally for good), then composed into net changes: a package added
+    by one deployment and removed by a later one does not show up.
+
+    Args:
+        insights_config_id: The ID of the Insights Config.
+        location: The location of the insights config.
+        project_id: The ID of the Google Cloud project.
+        to_deployment_id: The ID of the later deployment event.
+        from_deployment_id: The ID of the earlier deployment event, deployed to the same runtime.
+        runtime_target: With last_n, the runtime to look at, given as its full runtime URI or its name.
+        last_n: With runtime_target, the number of most recent deployments to compare across.
+
+    Returns:
+        A dictionary with the compared deployments, the net package, vulnerability, artifact and
+        commit changes, and the git compare links of each step, or an error message.
+    """
+    try:
+        parent = _insights_config_name(project_id, location, insights_config_id)
+        store = deployment_store.store
+        await _ensure_synced(parent, ctx)
+
+        if last_n is not None:
+            if not runtime_target or last_n < 1:
+                return {"error": "last_n must be at least 1 and requires runtime_target."}
+            last_n = min(last_n, MAX_COMPARED_DEPLOYMENTS)
+            latest = await concurrency.run_blocking(
+                'deployment_store', store.query_events, parent, runtime_target=runtime_target, limit=last_n + 1,
+            )
+            if not latest:
+                return {"error": f"No deployments to {runtime_target} found in {parent}."}
+            steps = latest[:last_n]
+            before = latest[last_n] if len(latest) > last_n else None
+        elif to_deployment_id and from_deployment_id:
+            before, after = await asyncio.gather(*(
+                concurrency.run_blocking('deployment_store', store.get_event, f"{parent}/deploymentEvents/{deployment_id}")
+                for deployment_id in (from_deployment_id, to_deployment_id)
+            ))
+            if before is None or after is None:
+                missing = from_deployment_id if before is None else to_deployment_id
+                return {"error": f"Deployment event {missing} not found in {parent}."}
+            if deployment_store.runtime_uri(before) != deployment_store.runtime_uri(after):
+                return {"error": "The two deployments were deployed to different runtimes."}
+            start = deployment_store.parse_timestamp(before.get("deployTime"))
+            end = deployment_store.parse_timestamp(after.get("deployTime"))
+            if start is None or end is None or start >= end:
+                return {"error": "from_deployment_id must have been deployed before to_deployment_id."}
+            # end_time is exclusive, so bound the query just past the later deployment.
+            between = await concurrency.run_blocking(
+                'deployment_store', store.query_events, parent, start_time=start, end_time=math.nextafter(end, math.inf),
+                runtime_target=deployment_store.runtime_uri(after), limit=MAX_COMPARED_DEPLOYMENTS + 2,
+            )
+            steps = [event for event in between if start < (deployment_store.parse_timestamp(event.get("deployTime")) or 0) <= end]
+        else:
+            return {"error": "Give either from_deployment_id and to_deployment_id, or runtime_target and last_n."}
+
+        if len(steps) > MAX_COMPARED_DEPLOYMENTS:
+            return {"error": f"More than {MAX_COMPARED_DEPLOYMENTS} deployments lie between the two; compare a narrower range."}
+
+        steps.reverse()  # oldest first
+        diffs = await asyncio.gather(*(
+            _describe_diff(project_id, location, insights_config_id, _deployment_id(event)) for event in steps
+        ))
+        for event, diff in zip(steps, diffs):
+            if cache.is_error(diff):
+                return {"error": f"Could not get the diff of deployment {_deployment_id(event)}: {diff['error']}"}
+
+        result = deployment_diff.compose(diffs)
+        result.update(deployment_diff.artifact_changes(before, steps[-1]))
+        result["from"] = before["name"] if before is not None else None
+        result["to"] = steps[-1]["name"]
+        result["deployments"] = [{"name": event["name"], "deployTime": event.get("deployTime")} for event in steps]
+        return result
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
+
+def _package_version(version: Dict[str, Any]) -> str:
+    if version.get("fullName"):
+        return version["fullName"]
+    full = version.get("name", "")
+    if version.get("revision"):
+        full += f"-{version['revision']}"
+    if version.get("epoch"):
+        full = f"{version['epoch']}:{full}"
+    return full
+
+def _index_entries(vulnerability_occurrences: List[Dict[str, Any]], package_occurrences: List[Dict[str, Any]]):
+    """Turns an image's occurrences into (name, version) package pairs and (cve, severity, package, fix_available) tuples."""
+    packages = set()
+    for occurrence in package_occurrences:
+        package = occurrence.get("package", {})
+        if package.get("name"):
+            packages.add((package["name"].lower(), _package_version(package.get("version", {}))))
+    vulnerabilities = set()
+    for occurrence in vulnerability_occurrences:
+        vulnerability = occurrence.get("vulnerability", {})
+        cve = occurrence.get("noteName", "").rsplit("/", 1)[-1]
+        if not cve:
+            continue
+        severity = vulnerability.get("effectiveSeverity") or vulnerability.get("severity")
+        issues = vulnerability.get("packageIssue") or [{}]
+        for issue in issues:
+            fix_available = issue.get("fixAvailable", vulnerability.get("fixAvailable", False))
+            vulnerabilities.add((cve, severity, issue.get("affectedPackage"), bool(fix_available)))
+    return packages, vulnerabilities
+
+async def _index_image(project_id: str, digest: str, image: str) -> Dict[str, Any]:
+    """Fetches an image's packages and vulnerabilities from Container Analysis into the local index."""
+    image_project = occurrences.image_project(image, project_id)
+    vulnerability_occurrences, package_occurrences = await asyncio.gather(
+        occurrences.list_occurrences(image_project, image, "VULNERABILITY", INDEXED_VULNERABILITY_FIELDS),
+        occurrences.list_occurrences(image_project, image, "PACKAGE", INDEXED_PACKAGE_FIELDS),
+    )
+    packages, vulnerabilities = _index_entries(vulnerability_occurrences, package_occurrences)
+    await concurrency.run_blocking('deployment_store', deployment_store.store.replace_image_index, digest, image, packages, vulnerabilities)
+    return {"image": image, "packages": len(packages), "vulnerabilities": len({entry[0] for entry in vulnerabilities})}
+
+@mcp.tool
+async def index_deployed_images(insights_config_id: str,
+    location: str,
+    project_id: str,
+    active_only: bool = True,
+    refresh: bool = False,
+    ctx: Context = None
+    ) -> Dict[str, Any]:
+    """Indexes the packages and vulnerabilities of the images deployed by an Insights Config's Deployment Events.
+
+    Deployment events are synced first. Each digest-pinned image is then looked up in
+    Container Analysis once and re-scanned only when its index entry is older than a day,
+    so repeated calls are cheap. The index backs find_deployments_by_vulnerability and
+    find_deployments_by_package.
+
+    Args:
+        insights_config_id: The ID of the Insights Config.
+        location: The location of the insights config.
+        project_id: The ID of the Google Cloud project.
+        active_only: Whether to only index images of deployments that are still running.
+        refresh: Whether to re-scan every image regardless of when it was last indexed.
+
+    Returns:
+        A dictionary with the images that were (re-)indexed and the number skipped as up to date, or an error message.
+    """
+    try:
+        parent = _insights_config_name(project_id, location, insights_config_id)
+        store = deployment_store.store
+        await _ensure_synced(parent, ctx)
+        artifacts = await concurrency.run_blocking('deployment_store', store.deployed_artifacts, parent, active_only)
+
+        stale = {}
+        for digest, image in artifacts.items():
+            indexed_at = await concurrency.run_blocking('deployment_store', store.image_indexed_at, digest)
+            if refresh or indexed_at is None or time.time() - indexed_at > IMAGE_INDEX_TTL_SECONDS:
+                stale[digest] = image
+
+        done = 0
+        async def index(digest: str, image: str):
+            nonlocal done
+            try:
+                result = await _index_image(project_id, digest, image)
+            except Exception as e:
+                logger.warning(f"Could not index image {image}: {e}")
+                result = {"image": image, "error": str(e)}
+            done += 1
+            if ctx is not None:
+                await ctx.report_progress(progress=done, total=len(stale), message=f"Indexed {done} of {len(stale)} images")
+            return result
+
+        indexed = await asyncio.gather(*(index(digest, image) for digest, image in stale.items()))
+        metrics.increment("deployment_store.images_indexed", len(stale))
+        return {"indexed": list(indexed), "up_to_date": len(artifacts) - len(stale)}
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
+
+def _deployments_of(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "deployment_id": _deployment_id(event),
+            "deployTime": _format_timestamp(event["deploy_time"]),
+            "state": event["state"],
+            "runtime": event["runtime_uri"],
+            "digest": event["digest"],
+        }
+        for event in events
+    ]
+
+@mcp.tool
+async def find_deployments_by_vulnerability(insights_config_id: str,
+    location: str,
+    project_id: str,
+    cve: str,
+    active_only: bool = True
+    ) -> Dict[str, Any]:
+    """Finds the indexed images affected by a vulnerability and the deployments running them.
+
+    Answered from the local index built by index_deployed_images, without calling any API.
+
+    Args:
+        insights_config_id: The ID of the Insights Config.
+        location: The location of the insights config.
+        project_id: The ID of the Google Cloud project.
+        cve: The vulnerability ID, e.g. 'CVE-2023-30861'.
+        active_only: Whether to only return deployments that are still running.
+
+    Returns:
+        A dictionary with the affected images (with severity, package and fix availability) and deployments, or an error message.
+    """
+    try:
+        parent = _insights_config_name(project_id, location, insights_config_id)
+        store = deployment_store.store
+        images = await concurrency.run_blocking('deployment_store', store.images_with_vulnerability, cve.strip())
+        events = await concurrency.run_blocking(
+            'deployment_store', store.events_for_digests, parent, [image["digest"] for image in images], active_only
+        )
+        deployed = {event["digest"] for event in events}
+        return {"images": [image for image in images if image["digest"] in deployed], "deployments": _deployments_of(events)}
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
+
+@mcp.tool
+async def find_deployments_by_package(insights_config_id: str,
+    location: str,
+    project_id: str,
+    package: str,
+    active_only: bool = True
+    ) -> Dict[str, Any]:
+    """Finds the indexed images containing a package version and the deployments running them.
+
+    Answered from the local index built by index_deployed_images, without calling any API.
+
+    Args:
+        insights_config_id: The ID of the Insights Config.
+        location: The location of the insights config.
+        project_id: The ID of the Google Cloud project.
+        package: The package name, optionally with a version constraint, e.g. 'flask', 'flask==2.0.1' or 'flask<2.2'.
+        active_only: Whether to only return deployments that are still running.
+
+    Returns:
+        A dictionary with the matching images (with the installed version) and deployments, or an error message.
+    """
+    try:
+        name, operator, bound = deployment_diff.parse_requirement(package)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        parent = _insights_config_name(project_id, location, insights_config_id)
+        store = deployment_store.store
+        images = await concurrency.run_blocking('deployment_store', store.images_with_package, name)
+        images = [image for image in images if deployment_diff.version_matches(image["version"], operator, bound)]
+        events = await concurrency.run_blocking(
+            'deployment_store', store.events_for_digests, parent, [image["digest"] for image in images], active_only
+        )
+        deployed = {event["digest"] for event in events}
+        return {"images": [image for image in images if image["digest"] in deployed], "deployments": _deployments_of(events)}
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
+
+async def _sync_builds(project_id: str, build_location: str, ctx: Optional[Context] = None) -> int:
+    """Pulls the Cloud Build builds created since the last sync, plus unfinished ones, into the local store.
+
+    Does nothing if the builds were synced within the last SYNC_INTERVAL_SECONDS.
+
+    Returns:
+        The number of new builds.
+    """
+    store = deployment_store.store
+    parent = f"projects/{project_id}/locations/{build_location}"
+    state = await concurrency.run_blocking('deployment_store', store.sync_state, parent)
+    if state is not None and time.time() - state["synced_at"] <= SYNC_INTERVAL_SECONDS:
+        return 0
+    since = state["last_deploy_time"] if state is not None else None
+    pending = await concurrency.run_blocking('deployment_store', store.pending_build_time, parent)
+    if pending is not None and since is not None:
+        since = min(since, pending)
+    service = _get_cloud_build_service()
+    mask = projection.api_fields(["id", "createTime", "status", "results.images"], "builds")
+
+    async def fetch_page(token):
+        request = service.projects().locations().builds().list(
+            parent=parent,
+            pageSize=BUILD_SYNC_PAGE_SIZE,
+            pageToken=token,
+            filter=f'create_time>="{_format_timestamp(since)}"' if since is not None else None,
+            fields=mask,
+        )
+        response = await concurrency.execute('cloudbuild', request)
+        return response.get("builds", []), response.get("nextPageToken")
+
+    builds, _ = await pagination.collect_pages(fetch_page, max_pages=None, ctx=ctx)
+    new = await concurrency.run_blocking('deployment_store', store.upsert_builds, parent, builds)
+    create_times = [t for t in (deployment_store.parse_timestamp(build.get("createTime")) for build in builds) if t is not None]
+    await concurrency.run_blocking('deployment_store', store.mark_synced, parent, max(create_times + ([since] if since is not None else []), default=None))
+    return new
+
+@mcp.tool
+async def get_dora_metrics(insights_config_ids: List[str],
+    location: str,
+    project_id: str,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    runtime_target: Optional[str] = None,
+    build_location: str = "global",
+    ctx: Context = None
+    ) -> Dict[str, Any]:
+    """Computes the DORA metrics of each runtime from the synced deployment history of one or more Insights Configs.
+
+    Deployment events and Cloud Build history are synced into the local store first, then aggregated locally.
+    - Deployment frequency: deployments per day in the window.
+    - Lead time for changes: from the creation of the build that produced a deployment's image to the deployment.
+    - Change failure rate: the share of deployments that were followed by a rollback to an image the runtime ran before.
+    - Time to restore: from a failed deployment to its rollback.
+
+    Args:
+        insights_config_ids: The IDs of the Insights Configs.
+        location: The location of the insights configs.
+        project_id: The ID of the Google Cloud project.
+        start_time: The start of the window as an RFC 3339 time. Defaults to 30 days before end_time.
+        end_time: The end of the window as an RFC 3339 time. Defaults to now.
+        runtime_target: Only include this runtime, given as its full URI or its last path segment.
+        build_location: The Cloud Build region whose builds produce the deployed images.
+
+    Returns:
+        A dictionary with the window, the metrics of each runtime and the metrics across all runtimes, or an error message.
+    """
+    bounds = {}
+    for argument, value in (("start_time", start_time), ("end_time", end_time)):
+        if value:
+            bounds[argument] = deployment_store.parse_timestamp(value)
+            if bounds[argument] is None:
+                return {"error": f"Invalid {argument}: {value}. Use an RFC 3339 time such as '2025-06-01T00:00:00Z'."}
+    end = bounds.get("end_time", time.time())
+    start = bounds.get("start_time", end - DEFAULT_DORA_WINDOW_DAYS * 86400)
+    if start >= end:
+        return {"error": "start_time must be before end_time."}
+    try:
+        import dora
+
+        parents = [_insights_config_name(project_id, location, insights_config_id) for insights_config_id in insights_config_ids]
+        await asyncio.gather(*(_ensure_synced(parent, ctx) for parent in parents), _sync_builds(project_id, build_location))
+        history = await concurrency.run_blocking('deployment_store', deployment_store.store.deployment_history, parents, end, runtime_target)
+        metrics_by_runtime = dora.compute(history["deploy_time"], history["runtime"], history["artifacts"], history["build_time"], start, end)
+        return {"start_time": _format_timestamp(start), "end_time": _format_timestamp(end), **metrics_by_runtime}
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        return {"error": str(e)}
@@ -0,0 +1,158 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+Package = Tuple[str, str]
+
+def parse_items(value: Any) -> Set[str]:
+    """Parses a diff field that is either a comma-joined string or a list of strings."""
+    if not value:
+        return set()
+    if isinstance(value, str):
+        value = value.split(",")
+    return {item.strip() for item in value if item and item.strip()}
+
+def parse_packages(value: Any) -> Set[Package]:
+    """Parses package entries such as 'flask==2.0.0, click==8.1.8' into (name, version) pairs.
+
+    Entries without a version are kept with an empty version.
+    """
+    packages = set()
+    for item in parse_items(value):
+        name, _, version = item.partition("==")
+        packages.add((name.strip().lower(), version.strip()))
+    return packages
+
+_REQUIREMENT = re.compile(r"^\s*([^<>=!\s]+)\s*(?:(==|!=|<=|>=|<|>)\s*(\S+))?\s*$")
+
+def version_key(version: str) -> Tuple:
+    """Returns a sort key ordering versions such as '2.10.0' after '2.9.1'.
+
+    Numeric components compare as numbers and other components as text, which
+    covers the usual semantic, Debian and PEP 440 version spellings.
+    """
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"[^0-9A-Za-z]+", version) if part)
+
+def parse_requirement(spec: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Parses a package requirement such as 'flask<2.2' or 'openssl' into (name, operator, version).
+
+    Raises:
+        ValueError: If the requirement is malformed.
+    """
+    match = _REQUIREMENT.match(spec)
+    if match is None:
+        raise ValueError(f"Invalid package requirement: {spec!r}. Use e.g. 'flask', 'flask==2.0.1' or 'flask<2.2'.")
+    name, operator, version = match.groups()
+    return name.lower(), operator, version
+
+def version_matches(version: str, operator: Optional[str], bound: Optional[str]) -> bool:
+    """Returns whether an installed version satisfies a requirement parsed by parse_requirement."""
+    if operator is None:
+        return True
+    left, right = version_key(version), version_key(bound)
+    return {
+        "==": left == right,
+        "!=": left != right,
+        "<": left < right,
+        "<=": left <= right,
+        ">": left > right,
+        ">=": left >= right,
+    }[operator]
+
+class StepDiff:
+    """The changes one deployment introduced over the deployment it replaced."""
+
+    def __init__(self, diff: Dict[str, Any]):
+        artifact_diffs = diff.get("artifactDiffs", {})
+        package_diff = artifact_diffs.get("packageDiff", {})
+        vulnerability_diff = artifact_diffs.get("vulnerabilityDiff", {})
+        self.added_packages = parse_packages(package_diff.get("addedPackages"))
+        self.removed_packages = parse_packages(package_diff.get("removedPackages"))
+        self.added_vulnerabilities = parse_items(vulnerability_diff.get("addedVulnerabilities"))
+        self.removed_vulnerabilities = parse_items(vulnerability_diff.get("removedVulnerabilities"))
+        self.git_diff_uri = diff.get("gitDiffUri")
+
+class _NetChange:
+    """Accumulates added and removed items across consecutive diffs, cancelling out reverted changes."""
+
+    def __init__(self):
+        self.added: Set = set()
+        self.removed: Set = set()
+
+    def apply(self, added: Set, removed: Set):
+        # An item removed by a later diff cancels an earlier addition, and vice versa.
+        self.added, self.removed = (
+            (self.added - removed) | (added - self.removed),
+            (self.removed - added) | (removed - self.added),
+        )
+
+def _package_changes(added: Set[Package], removed: Set[Package]) -> Dict[str, List[Dict[str, str]]]:
+    added_by_name: Dict[str, Set[str]] = {}
+    removed_by_name: Dict[str, Set[str]] = {}
+    for name, version in added:
+        added_by_name.setdefault(name, set()).add(version)
+    for name, version in removed:
+        removed_by_name.setdefault(name, set()).add(version)
+    changed = added_by_name.keys() & removed_by_name.keys()
+    return {
+        "added": [{"name": name, "version": version} for name, version in sorted(added) if name not in changed],
+        "removed": [{"name": name, "version": version} for name, version in sorted(removed) if name not in changed],
+        "changed": [
+            {"name": name, "from": ", ".join(sorted(removed_by_name[name])), "to": ", ".join(sorted(added_by_name[name]))}
+            for name in sorted(changed)
+        ],
+    }
+
+def compose(diffs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Composes consecutive deployment diffs, oldest first, into the net change across all of them.
+
+    Args:
+        diffs: The diffs of consecutive deployments against their predecessors, as returned by
+            describe_deployment_diff_content.
+
+    Returns:
+        The net package changes (added, removed and version changes), the net vulnerability
+        changes and the git compare links of each step.
+    """
+    packages = _NetChange()
+    vulnerabilities = _NetChange()
+    git_diff_uris = []
+    for diff in diffs:
+        step = StepDiff(diff)
+        packages.apply(step.added_packages, step.removed_packages)
+        vulnerabilities.apply(step.added_vulnerabilities, step.removed_vulnerabilities)
+        if step.git_diff_uri:
+            git_diff_uris.append(step.git_diff_uri)
+    return {
+        "packages": _package_changes(packages.added, packages.removed),
+        "vulnerabilities": {
+            "added": sorted(vulnerabilities.added),
+            "removed": sorted(vulnerabilities.removed),
+        },
+        "gitDiffUris": git_diff_uris,
+    }
+
+def artifact_changes(before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Compares the artifacts and source commits of two deployment events.
+
+    Args:
+        before: The earlier deployment event, or None if there is none.
+        after: The later deployment event.
+
+    Returns:
+        The artifacts and source commits added and removed between the two.
+    """
+    def collect(event: Optional[Dict[str, Any]], field: str) -> Set[str]:
+        values: Set[str] = set()
+        for deployment in (event or {}).get("artifactDeployments", []):
+            value = deployment.get(field)
+            values.update(value if isinstance(value, list) else [value] if value else [])
+        return values
+
+    artifacts_before, artifacts_after = collect(before, "artifactReference"), collect(after, "artifactReference")
+    commits_before, commits_after = collect(before, "sourceCommitUris"), collect(after, "sourceCommitUris")
+    return {
+        "addedArtifacts": sorted(artifacts_after - artifacts_before),
+        "removedArtifacts": sorted(artifacts_before - artifacts_after),
+        "addedCommits": sorted(commits_after - commits_before),
+        "removedCommits": sorted(commits_before - commits_after),
+    }
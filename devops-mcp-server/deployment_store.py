@@ -0,0 +1,486 @@
+import datetime
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when the schema changes; the store only holds data that can be fetched
+# again, so an outdated store is dropped and rebuilt.
+SCHEMA_VERSION = 4
+
+DEPLOYMENT_STORE_PATH = os.environ.get(
+    "DEVOPS_MCP_DEPLOYMENT_STORE",
+    os.path.join(os.path.expanduser("~"), ".cache", "devops-mcp-server", "deployments.sqlite3"),
+)
+# Upper bound on the cached deployment event details; the least recently read are evicted first.
+MAX_DETAIL_BYTES = int(os.environ.get("DEVOPS_MCP_DEPLOYMENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (name, kind)
+);
+CREATE INDEX IF NOT EXISTS details_last_access ON details (last_access);
+
+CREATE TABLE IF NOT EXISTS events (
+    name TEXT PRIMARY KEY,
+    insights_config TEXT NOT NULL,
+    deploy_time REAL,
+    undeploy_time REAL,
+    state TEXT,
+    runtime_uri TEXT,
+    runtime_name TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_deploy_time ON events (insights_config, deploy_time);
+CREATE INDEX IF NOT EXISTS events_runtime_uri ON events (runtime_uri, deploy_time);
+CREATE INDEX IF NOT EXISTS events_runtime_name ON events (runtime_name, deploy_time);
+
+CREATE TABLE IF NOT EXISTS event_artifacts (
+    event TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    artifact TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS event_artifacts_digest ON event_artifacts (digest);
+CREATE INDEX IF NOT EXISTS event_artifacts_event ON event_artifacts (event);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    insights_config TEXT PRIMARY KEY,
+    last_deploy_time REAL,
+    synced_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS builds (
+    id TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    create_time REAL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS builds_parent ON builds (parent, create_time);
+
+CREATE TABLE IF NOT EXISTS build_images (
+    build TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS build_images_digest ON build_images (digest);
+CREATE INDEX IF NOT EXISTS build_images_build ON build_images (build);
+
+CREATE TABLE IF NOT EXISTS indexed_images (
+    digest TEXT PRIMARY KEY,
+    image TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS image_packages (
+    digest TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS image_packages_name ON image_packages (name);
+CREATE INDEX IF NOT EXISTS image_packages_digest ON image_packages (digest);
+
+CREATE TABLE IF NOT EXISTS image_vulnerabilities (
+    digest TEXT NOT NULL,
+    cve TEXT NOT NULL,
+    severity TEXT,
+    package TEXT,
+    fix_available INTEGER
+);
+CREATE INDEX IF NOT EXISTS image_vulnerabilities_cve ON image_vulnerabilities (cve);
+CREATE INDEX IF NOT EXISTS image_vulnerabilities_digest ON image_vulnerabilities (digest);
+"""
+
+_TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:\d{2})?$")
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parses an RFC 3339 timestamp as returned by Google APIs into epoch seconds.
+
+    Args:
+        value: The timestamp, e.g. '2025-06-01T12:00:00.123456789Z', or None.
+
+    Returns:
+        The epoch seconds, or None if the value is empty or malformed.
+    """
+    match = _TIMESTAMP.match(value or "")
+    if match is None:
+        return None
+    base, fraction, offset = match.groups()
+    parsed = datetime.datetime.fromisoformat(base + (offset if offset not in (None, "Z") else "+00:00"))
+    return parsed.timestamp() + (float(f"0.{fraction}") if fraction else 0.0)
+
+def artifact_digest(reference: str) -> Optional[str]:
+    """Returns the 'sha256:...' digest of an image reference, or None if it is not pinned by digest."""
+    _, _, digest = reference.partition("@")
+    return digest or None
+
+def runtime_uri(event: Dict[str, Any]) -> Optional[str]:
+    """Returns the URI of the runtime (e.g. Cloud Run service or GKE workload) a deployment event deployed to."""
+    return event.get("runtimeConfig", {}).get("uri") or event.get("runtimeDeploymentUri")
+
+class DeploymentStore:
+    """A local SQLite store for Developer Connect deployment event data.
+
+    Methods block on disk I/O; call them through concurrency.run_blocking.
+    """
+
+    def __init__(self, path: str, max_detail_bytes: int):
+        self.path = path
+        self.max_detail_bytes = max_detail_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+            except (OSError, sqlite3.Error) as e:
+                # A read-only filesystem must not stop the server; the store then only lives in memory.
+                logger.warning(f"Could not open deployment store {self.path}, keeping it in memory: {e}")
+                conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                    conn.execute(f"DROP TABLE {table}")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_detail(self, name: str, kind: str) -> Optional[Any]:
+        """Returns a cached result for a deployment event, or None.
+
+        Args:
+            name: The full resource name of the deployment event.
+            kind: What was cached for it, e.g. 'event' or 'diff'.
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT body FROM details WHERE name = ? AND kind = ?", (name, kind)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE details SET last_access = ? WHERE name = ? AND kind = ?", (time.time(), name, kind))
+            return json.loads(row[0])
+
+    def put_detail(self, name: str, kind: str, value: Any):
+        """Caches a result for a deployment event, evicting the least recently read ones past the size bound."""
+        body = json.dumps(value)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO details (name, kind, body, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (name, kind, body, len(body), time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM details").fetchone()[0] - self.max_detail_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for name, kind, size in conn.execute("SELECT name, kind, size FROM details ORDER BY last_access"):
+            victims.append((name, kind))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM details WHERE name = ? AND kind = ?", victims)
+        logger.debug(f"Evicted {len(victims)} cached deployment event details.")
+
+    def sync_state(self, insights_config: str) -> Optional[Dict[str, Any]]:
+        """Returns when an insights config was last synced and the newest deploy time seen, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT last_deploy_time, synced_at FROM sync_state WHERE insights_config = ?", (insights_config,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"last_deploy_time": row[0], "synced_at": row[1]}
+
+    def active_event_names(self, insights_config: str) -> List[str]:
+        """Returns the names of the stored events that had not ended when they were last synced."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT name FROM events WHERE insights_config = ? AND undeploy_time IS NULL AND state IS NOT 'STATE_INACTIVE'",
+                (insights_config,),
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def upsert_events(self, insights_config: str, events: Iterable[Dict[str, Any]]) -> int:
+        """Stores deployment events with their index entries and returns how many were new."""
+        new = 0
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                for event in events:
+                    name = event["name"]
+                    if conn.execute("SELECT 1 FROM events WHERE name = ?", (name,)).fetchone() is None:
+                        new += 1
+                    uri = runtime_uri(event)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO events (name, insights_config, deploy_time, undeploy_time, state, runtime_uri, runtime_name, body) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            name,
+                            insights_config,
+                            parse_timestamp(event.get("deployTime")),
+                            parse_timestamp(event.get("undeployTime")),
+                            event.get("state"),
+                            uri,
+                            uri.rstrip("/").rsplit("/", 1)[-1] if uri else None,
+                            json.dumps(event),
+                        ),
+                    )
+                    conn.execute("DELETE FROM event_artifacts WHERE event = ?", (name,))
+                    for deployment in event.get("artifactDeployments", []):
+                        reference = deployment.get("artifactReference", "")
+                        digest = artifact_digest(reference)
+                        if digest:
+                            conn.execute(
+                                "INSERT INTO event_artifacts (event, digest, artifact) VALUES (?, ?, ?)",
+                                (name, digest, reference),
+                            )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return new
+
+    def get_event(self, name: str) -> Optional[Dict[str, Any]]:
+        """Returns a stored deployment event by its full resource name, or None."""
+        with self._lock:
+            row = self._connect().execute("SELECT body FROM events WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def mark_synced(self, insights_config: str, last_deploy_time: Optional[float]):
+        """Records a completed sync of an insights config."""
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO sync_state (insights_config, last_deploy_time, synced_at) VALUES (?, ?, ?)",
+                (insights_config, last_deploy_time, time.time()),
+            )
+
+    def query_events(
+        self,
+        insights_config: str,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        runtime_target: Optional[str] = None,
+        digest: Optional[str] = None,
+        state: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """Queries the stored deployment events of an insights config, newest first.
+
+        Args:
+            insights_config: The full resource name of the insights config.
+            start_time: Only events deployed at or after this epoch time.
+            end_time: Only events deployed before this epoch time.
+            runtime_target: Only events deployed to this runtime, given as its full URI or its last path segment.
+            digest: Only events deploying an artifact with this 'sha256:...' digest.
+            state: Only events in this state, e.g. 'STATE_ACTIVE'.
+            limit: The maximum number of events to return.
+
+        Returns:
+            The matching deployment events.
+        """
+        clauses = ["insights_config = ?"]
+        params: List[Any] = [insights_config]
+        if start_time is not None:
+            clauses.append("deploy_time >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            clauses.append("deploy_time < ?")
+            params.append(end_time)
+        if runtime_target:
+            clauses.append("(runtime_uri = ? OR runtime_name = ?)")
+            params.extend([runtime_target, runtime_target])
+        if digest:
+            clauses.append("name IN (SELECT event FROM event_artifacts WHERE digest = ?)")
+            params.append(digest)
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT body FROM events WHERE {' AND '.join(clauses)} ORDER BY deploy_time DESC LIMIT ?", params
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def deployment_history(
+        self,
+        insights_configs: List[str],
+        end_time: float,
+        runtime_target: Optional[str] = None,
+    ) -> Dict[str, List[Any]]:
+        """Returns the deployment history of some insights configs as columns, for vectorized aggregation.
+
+        Rows are sorted by runtime and then by deploy time.
+
+        Args:
+            insights_configs: The full resource names of the insights configs.
+            end_time: Only deployments before this epoch time are returned.
+            runtime_target: Only deployments to this runtime, given as its full URI or its last path segment.
+
+        Returns:
+            A dictionary of equally long lists: deploy_time, runtime, artifacts (the sorted,
+            comma-joined digests of the deployment, or None) and build_time (the creation
+            time of the earliest stored build producing one of those digests, or None).
+        """
+        clauses = [f"e.insights_config IN ({', '.join('?' * len(insights_configs))})", "e.deploy_time < ?", "e.runtime_uri IS NOT NULL"]
+        params: List[Any] = list(insights_configs) + [end_time]
+        if runtime_target:
+            clauses.append("(e.runtime_uri = ? OR e.runtime_name = ?)")
+            params.extend([runtime_target, runtime_target])
+        query = (
+            "SELECT e.deploy_time, e.runtime_uri, "
+            "(SELECT group_concat(digest, ',') FROM (SELECT digest FROM event_artifacts WHERE event = e.name ORDER BY digest)), "
+            "(SELECT MIN(b.create_time) FROM event_artifacts a JOIN build_images i ON i.digest = a.digest "
+            "JOIN builds b ON b.id = i.build WHERE a.event = e.name) "
+            f"FROM events e WHERE {' AND '.join(clauses)} ORDER BY e.runtime_uri, e.deploy_time"
+        )
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        columns = list(zip(*rows)) or [(), (), (), ()]
+        return {key: list(column) for key, column in zip(("deploy_time", "runtime", "artifacts", "build_time"), columns)}
+
+    def pending_build_time(self, parent: str) -> Optional[float]:
+        """Returns the creation time of the oldest stored build of a parent that had not finished, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT MIN(create_time) FROM builds WHERE parent = ? AND status IN ('STATUS_UNKNOWN', 'PENDING', 'QUEUED', 'WORKING')",
+                (parent,),
+            ).fetchone()
+        return row[0]
+
+    def upsert_builds(self, parent: str, builds: Iterable[Dict[str, Any]]) -> int:
+        """Stores Cloud Build builds with the digests of the images they pushed and returns how many were new."""
+        new = 0
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                for build in builds:
+                    if conn.execute("SELECT 1 FROM builds WHERE id = ?", (build["id"],)).fetchone() is None:
+                        new += 1
+                    conn.execute(
+                        "INSERT OR REPLACE INTO builds (id, parent, create_time, status) VALUES (?, ?, ?, ?)",
+                        (build["id"], parent, parse_timestamp(build.get("createTime")), build.get("status")),
+                    )
+                    conn.execute("DELETE FROM build_images WHERE build = ?", (build["id"],))
+                    conn.executemany(
+                        "INSERT INTO build_images (build, digest) VALUES (?, ?)",
+                        [(build["id"], image["digest"]) for image in build.get("results", {}).get("images", []) if image.get("digest")],
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return new
+
+    def deployed_artifacts(self, insights_config: str, active_only: bool = True) -> Dict[str, str]:
+        """Returns the digest-pinned images deployed by an insights config's events, keyed by digest.
+
+        Args:
+            insights_config: The full resource name of the insights config.
+            active_only: Whether to only include images of deployments that are still running.
+        """
+        query = "SELECT a.digest, a.artifact FROM event_artifacts a JOIN events e ON e.name = a.event WHERE e.insights_config = ?"
+        if active_only:
+            query += " AND e.undeploy_time IS NULL AND e.state IS NOT 'STATE_INACTIVE'"
+        with self._lock:
+            rows = self._connect().execute(query, (insights_config,)).fetchall()
+        return dict(rows)
+
+    def image_indexed_at(self, digest: str) -> Optional[float]:
+        """Returns when an image's packages and vulnerabilities were last indexed, or None."""
+        with self._lock:
+            row = self._connect().execute("SELECT indexed_at FROM indexed_images WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row is not None else None
+
+    def replace_image_index(self, digest: str, image: str, packages: Iterable[tuple], vulnerabilities: Iterable[tuple]):
+        """Replaces the indexed packages and vulnerabilities of an image.
+
+        Args:
+            digest: The image digest, e.g. 'sha256:...'.
+            image: The digest-pinned image reference.
+            packages: (name, version) pairs installed in the image.
+            vulnerabilities: (cve, severity, package, fix_available) tuples affecting the image.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.execute("DELETE FROM image_packages WHERE digest = ?", (digest,))
+                conn.execute("DELETE FROM image_vulnerabilities WHERE digest = ?", (digest,))
+                conn.executemany(
+                    "INSERT INTO image_packages (digest, name, version) VALUES (?, ?, ?)",
+                    [(digest, name, version) for name, version in packages],
+                )
+                conn.executemany(
+                    "INSERT INTO image_vulnerabilities (digest, cve, severity, package, fix_available) VALUES (?, ?, ?, ?, ?)",
+                    [(digest, cve, severity, package, int(bool(fix))) for cve, severity, package, fix in vulnerabilities],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO indexed_images (digest, image, indexed_at) VALUES (?, ?, ?)",
+                    (digest, image, time.time()),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def images_with_vulnerability(self, cve: str) -> List[Dict[str, Any]]:
+        """Returns the indexed images affected by a vulnerability, with the affected packages."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT v.digest, i.image, v.severity, v.package, v.fix_available FROM image_vulnerabilities v "
+                "JOIN indexed_images i ON i.digest = v.digest WHERE v.cve = ?",
+                (cve,),
+            ).fetchall()
+        return [
+            {"digest": digest, "image": image, "severity": severity, "package": package, "fix_available": bool(fix)}
+            for digest, image, severity, package, fix in rows
+        ]
+
+    def images_with_package(self, name: str) -> List[Dict[str, Any]]:
+        """Returns the indexed images containing a package, with the installed versions."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT p.digest, i.image, p.version FROM image_packages p "
+                "JOIN indexed_images i ON i.digest = p.digest WHERE p.name = ?",
+                (name,),
+            ).fetchall()
+        return [{"digest": digest, "image": image, "version": version} for digest, image, version in rows]
+
+    def events_for_digests(self, insights_config: str, digests: Iterable[str], active_only: bool = True) -> List[Dict[str, Any]]:
+        """Returns the deployment events of an insights config that deployed any of the given image digests, newest first."""
+        digests = list(set(digests))
+        if not digests:
+            return []
+        query = (
+            "SELECT DISTINCT e.name, e.deploy_time, e.state, e.runtime_uri, a.digest FROM events e "
+            "JOIN event_artifacts a ON a.event = e.name "
+            f"WHERE e.insights_config = ? AND a.digest IN ({', '.join('?' * len(digests))})"
+        )
+        if active_only:
+            query += " AND e.undeploy_time IS NULL AND e.state IS NOT 'STATE_INACTIVE'"
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY e.deploy_time DESC", [insights_config] + digests).fetchall()
+        return [
+            {"name": name, "deploy_time": deploy_time, "state": state, "runtime_uri": uri, "digest": digest}
+            for name, deploy_time, state, uri, digest in rows
+        ]
+
+store = DeploymentStore(DEPLOYMENT_STORE_PATH, MAX_DETAIL_BYTES)
@@ -1,32 +1,43 @@
 from app import mcp
-import google.auth
-from googleapiclient import discovery
-import time
-from typing import Dict, Any
+import cache
+import clients
+import concurrency
+import operations
+import pagination
+import projection
+from fastmcp import Context
+from typing import Dict, Any, Optional
+
+# Fields returned for each connection and git repository link unless the caller asks for others.
+CONNECTION_SUMMARY_FIELDS = [
+    "name",
+    "createTime",
+    "disabled",
+    "reconciling",
+    "githubConfig.githubApp",
+    "installationState.stage",
+    "installationState.actionUri",
+]
+GIT_REPOSITORY_LINK_SUMMARY_FIELDS = ["name", "cloneUri", "createTime", "reconciling"]
 
 def _get_developer_connect_service():
     """Gets the Developer Connect service client."""
-    credentials, _ = google.auth.default(
-        scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    return discovery.build('developerconnect', 'v1', credentials=credentials)
+    return clients.get_discovery_service('developerconnect', 'v1')
 
-def _wait_for_operation(service, operation: Dict[str, Any]):
-    """Waits for a long-running operation to complete."""
-    operation_name = operation['name']
-    while 'done' not in operation or not operation['done']:
-        time.sleep(1)
-        operation = service.projects().locations().operations().get(name=operation_name).execute()
-    return operation
+def _get_operation_request(name: str):
+    """Builds a request for the latest state of a Developer Connect long-running operation."""
+    return _get_developer_connect_service().projects().locations().operations().get(name=name)
 
 @mcp.tool
-def create_developer_connect_connection(project_id: str, location: str, connection_id: str) -> Dict[str, Any]:
+async def create_developer_connect_connection(project_id: str, location: str, connection_id: str, wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Developer Connect connection.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the connection.
         connection_id: The ID of the connection to create.
+        wait_for_completion: Whether to wait for the connection to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated connection fields to return, e.g. 'name,etag'. Defaults to a compact summary; pass '*' for the full connection.
     
     Returns:
         A dictionary containing a success message or an error message.
@@ -46,25 +57,32 @@ def create_developer_connect_connection(project_id: str, location: str, connecti
             connectionId=connection_id,
             body=body
         )
-        operation = create_request.execute()
-        operation = _wait_for_operation(service, operation)
-
-        if 'error' in operation:
-            return {'error': operation['error']}
+        operation = await concurrency.execute('developerconnect', create_request)
 
         name = f"projects/{project_id}/locations/{location}/connections/{connection_id}"
-        get_request = service.projects().locations().connections().get(
-            name=name,
-        )
-        response = get_request.execute()
 
-        return {"message": f"Please authorize the connection using the following URI to finish connection setup: {response['installation_state']['uri']}", "connection": response}
+        async def on_done(_):
+            cache.invalidate("list_developer_connect_connections", project_id, location)
+            get_request = service.projects().locations().connections().get(
+                name=name,
+            )
+            response = await concurrency.execute('developerconnect', get_request)
+            action_uri = response.get("installationState", {}).get("actionUri")
+            return {
+                "message": f"Please authorize the connection using the following URI to finish connection setup: {action_uri}",
+                "connection": projection.summarize(response, fields, CONNECTION_SUMMARY_FIELDS),
+            }
+
+        tracked = operations.track_discovery_operation(
+            'developerconnect', operation, _get_operation_request, f"Create Developer Connect connection {name}", on_done
+        )
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def create_developer_connect_git_repository_link(project_id: str, location: str, connection_id: str, repository_link_id: str, repo_uri: str) -> Dict[str, Any]:
+async def create_developer_connect_git_repository_link(project_id: str, location: str, connection_id: str, repository_link_id: str, repo_uri: str, wait_for_completion: bool = True, fields: Optional[str] = None, ctx: Context = None) -> Dict[str, Any]:
     """Creates a new Developer Connect Git Repository Link.
 
     Args:
@@ -73,6 +91,8 @@ def create_developer_connect_git_repository_link(project_id: str, location: str,
         connection_id: The ID of the connection.
         repository_link_id: The ID of the repository link to create.
         repo_uri: The git URI of the repository to link. E.g. https://github.com/user/repo.git
+        wait_for_completion: Whether to wait for the link to be created. If False, an operation_id is returned that can be followed with await_operation or get_operation_status.
+        fields: Comma-separated link fields to return, e.g. 'name,webhookId'. Defaults to a compact summary; pass '*' for the full link.
     
     Returns:
         A dictionary containing the created repository link or an error message.
@@ -90,52 +110,88 @@ def create_developer_connect_git_repository_link(project_id: str, location: str,
             gitRepositoryLinkId=repository_link_id,
             body=body
         )
-        operation = create_request.execute()
-        operation = _wait_for_operation(service, operation)
+        operation = await concurrency.execute('developerconnect', create_request)
 
-        if 'error' in operation:
-            return {'error': operation['error']}
+        async def on_done(_):
+            get_request = service.projects().locations().connections().gitRepositoryLinks().get(
+                name=link_name,
+            )
+            response = await concurrency.execute('developerconnect', get_request)
+            return {"repository_link": projection.summarize(response, fields, GIT_REPOSITORY_LINK_SUMMARY_FIELDS)}
 
-        get_request = service.projects().locations().connections().gitRepositoryLinks().get(
-            name=link_name,
+        tracked = operations.track_discovery_operation(
+            'developerconnect', operation, _get_operation_request, f"Create Developer Connect Git Repository Link {link_name}", on_done
         )
-        response = get_request.execute()
-        return {"repository_link": response}
+        return await operations.finish_or_track(tracked, wait_for_completion, ctx)
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def list_developer_connect_connections(project_id: str, location: str) -> Dict[str, Any]:
-    """Lists Developer Connect connections.
+async def list_developer_connect_connections(
+    project_id: str,
+    location: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    filter: Optional[str] = None,
+    order_by: Optional[str] = None,
+    fields: Optional[str] = None,
+    bypass_cache: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Lists Developer Connect connections, one or more pages at a time.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the connections.
+        page_size: The maximum number of connections to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        filter: An optional server-side filter expression (AIP-160), e.g. 'disabled=false'.
+        order_by: An optional server-side ordering, e.g. 'create_time desc'.
+        fields: Comma-separated connection fields to return, e.g. 'name,etag'. Defaults to a compact summary; pass '*' for the full connections.
+        bypass_cache: Whether to ignore recently cached results and fetch the connections again.
     
     Returns:
-        A dictionary containing a list of connections or an error message.
+        A dictionary containing a list of connections and the next_page_token (None when there are no more), or an error message.
     """
+    return await cache.read_through(
+        "list_developer_connect_connections", project_id, location,
+        lambda: _list_developer_connect_connections(project_id, location, page_size, page_token, max_pages, filter, order_by, fields, ctx),
+        key_extra=(page_size, page_token, max_pages, filter, order_by, fields),
+        bypass_cache=bypass_cache,
+    )
+
+async def _list_developer_connect_connections(project_id: str, location: str, page_size: int, page_token: Optional[str], max_pages: int, filter: Optional[str], order_by: Optional[str], fields: Optional[str], ctx: Optional[Context]) -> Dict[str, Any]:
     try:
         service = _get_developer_connect_service()
 
         parent = f"projects/{project_id}/locations/{location}"
-        request = service.projects().locations().connections().list(parent=parent)
-        response = request.execute()
+        mask = projection.api_fields(projection.parse_fields(fields, CONNECTION_SUMMARY_FIELDS), "connections")
+
+        async def fetch_page(token):
+            request = service.projects().locations().connections().list(
+                parent=parent, pageSize=page_size, pageToken=token, filter=filter or None, orderBy=order_by or None, fields=mask
+            )
+            response = await concurrency.execute('developerconnect', request)
+            return response.get("connections", []), response.get("nextPageToken")
 
-        return {"connections": response.get("connections", [])}
+        connections, next_page_token = await pagination.collect_pages(fetch_page, page_token, max_pages, ctx)
+        return {"connections": connections, "next_page_token": next_page_token}
 
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def get_developer_connect_connection(project_id: str, location: str, connection_id: str) -> Dict[str, Any]:
+async def get_developer_connect_connection(project_id: str, location: str, connection_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
     """Gets a Developer Connect connection.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the connection.
         connection_id: The ID of the connection.
+        fields: Comma-separated connection fields to return, e.g. 'name,etag'. Defaults to a compact summary; pass '*' for the full connection.
     
     Returns:
         A dictionary containing the connection or an error message.
@@ -144,8 +200,9 @@ def get_developer_connect_connection(project_id: str, location: str, connection_
         service = _get_developer_connect_service()
 
         name = f"projects/{project_id}/locations/{location}/connections/{connection_id}"
-        request = service.projects().locations().connections().get(name=name)
-        response = request.execute()
+        mask = projection.api_fields(projection.parse_fields(fields, CONNECTION_SUMMARY_FIELDS))
+        request = service.projects().locations().connections().get(name=name, fields=mask)
+        response = await concurrency.execute('developerconnect', request)
 
         return {"connection": response}
 
@@ -153,26 +210,47 @@ def get_developer_connect_connection(project_id: str, location: str, connection_
         return {"error": str(e)}
 
 @mcp.tool
-def find_git_repository_links_for_git_repo(project_id: str, location: str, repo_uri: str) -> Dict[str, Any]:
+async def find_git_repository_links_for_git_repo(
+    project_id: str,
+    location: str,
+    repo_uri: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    order_by: Optional[str] = None,
+    fields: Optional[str] = None,
+    ctx: Context = None,
+) -> Dict[str, Any]:
     """Finds already configured Developer Connect Git Repository Links for a particular git repository.
 
     Args:
         project_id: The ID of the Google Cloud project.
         location: The location of the connections.
         repo_uri: The git URI of the repository to link. E.g. https://github.com/user/repo.git
+        page_size: The maximum number of links to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        order_by: An optional server-side ordering, e.g. 'create_time desc'.
+        fields: Comma-separated link fields to return, e.g. 'name,webhookId'. Defaults to a compact summary; pass '*' for the full links.
 
     Returns:
-        A dictionary containing a list of git repository links or an error message.
+        A dictionary containing a list of git repository links and the next_page_token (None when there are no more), or an error message.
     """
     try:
         service = _get_developer_connect_service()
 
         parent = f"projects/{project_id}/locations/{location}/connections/-"
-        request = service.projects().locations().connections().gitRepositoryLinks().list(parent=parent, filter=f'clone_uri="{repo_uri}"')
-        response = request.execute()
+        mask = projection.api_fields(projection.parse_fields(fields, GIT_REPOSITORY_LINK_SUMMARY_FIELDS), "gitRepositoryLinks")
 
-        links = response.get("gitRepositoryLinks", [])
-        return {"gitRepositoryLinks": links}
+        async def fetch_page(token):
+            request = service.projects().locations().connections().gitRepositoryLinks().list(
+                parent=parent, filter=f'clone_uri="{repo_uri}"', pageSize=page_size, pageToken=token, orderBy=order_by or None, fields=mask
+            )
+            response = await concurrency.execute('developerconnect', request)
+            return response.get("gitRepositoryLinks", []), response.get("nextPageToken")
+
+        links, next_page_token = await pagination.collect_pages(fetch_page, page_token, max_pages, ctx)
+        return {"gitRepositoryLinks": links, "next_page_token": next_page_token}
 
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
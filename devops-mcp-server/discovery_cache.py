@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from googleapiclient.discovery_cache import get_static_doc
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes so stale caches are ignored rather than misread.
+CACHE_FORMAT_VERSION = 1
+
+DISCOVERY_CACHE_DIR = os.environ.get(
+    "DISCOVERY_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "devops-mcp-server", "discovery"),
+)
+DISCOVERY_URL = "https://{api}.googleapis.com/$discovery/rest?version={version}"
+
+# The discovery-based APIs used by the server's tools.
+SERVER_APIS = (
+    ("cloudbuild", "v1"),
+    ("iam", "v1"),
+    ("cloudresourcemanager", "v1"),
+    ("developerconnect", "v1"),
+    ("containeranalysis", "v1"),
+)
+
+_lock = threading.Lock()
+_documents: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+def _document_path(api: str, version: str) -> str:
+    return os.path.join(DISCOVERY_CACHE_DIR, f"{api}.{version}.json")
+
+def _manifest_path() -> str:
+    return os.path.join(DISCOVERY_CACHE_DIR, "manifest.json")
+
+def _read_manifest() -> Dict[str, Any]:
+    try:
+        with open(_manifest_path(), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"format_version": CACHE_FORMAT_VERSION, "documents": {}}
+    if manifest.get("format_version") != CACHE_FORMAT_VERSION:
+        logger.warning(f"Ignoring discovery cache with format version {manifest.get('format_version')}.")
+        return {"format_version": CACHE_FORMAT_VERSION, "documents": {}}
+    return manifest
+
+def _write_atomically(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def _store(api: str, version: str, content: str, source: str) -> Dict[str, Any]:
+    document = json.loads(content)
+    try:
+        _write_atomically(_document_path(api, version), content)
+        manifest = _read_manifest()
+        manifest["documents"][f"{api}.{version}"] = {
+            "revision": document.get("revision"),
+            "source": source,
+            "stored_at": int(time.time()),
+        }
+        _write_atomically(_manifest_path(), json.dumps(manifest, indent=2, sort_keys=True))
+    except OSError as e:
+        # A read-only filesystem must not stop the server; the document is still used from memory.
+        logger.warning(f"Could not write discovery document {api}.{version} to {DISCOVERY_CACHE_DIR}: {e}")
+    return document
+
+def _read_cached(api: str, version: str) -> Optional[Dict[str, Any]]:
+    if f"{api}.{version}" not in _read_manifest()["documents"]:
+        return None
+    try:
+        with open(_document_path(api, version), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _fetch(api: str, version: str) -> str:
+    url = DISCOVERY_URL.format(api=api, version=version)
+    logger.info(f"Fetching discovery document from {url}")
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read().decode("utf-8")
+
+def load_document(api: str, version: str) -> Dict[str, Any]:
+    """Loads a discovery document without a network round-trip when possible.
+
+    Documents are looked up in memory, then in the on-disk cache, then in the
+    documents bundled with google-api-python-client, and only fetched from the
+    network as a last resort. Whatever is found is written to the cache.
+
+    Args:
+        api: The name of the API (e.g. 'cloudbuild').
+        version: The version of the API (e.g. 'v1').
+
+    Returns:
+        The parsed discovery document.
+    """
+    key = (api, version)
+    with _lock:
+        document = _documents.get(key)
+        if document is not None:
+            return document
+
+        document = _read_cached(api, version)
+        if document is None:
+            static_content = get_static_doc(api, version)
+            if static_content is not None:
+                document = _store(api, version, static_content, "bundled")
+            else:
+                document = _store(api, version, _fetch(api, version), "network")
+        _documents[key] = document
+        return document
+
+def warm(apis: Iterable[Tuple[str, str]] = SERVER_APIS):
+    """Pre-loads the discovery documents for the given APIs into memory and onto disk."""
+    for api, version in apis:
+        try:
+            load_document(api, version)
+        except Exception as e:
+            logger.warning(f"Could not pre-load discovery document {api}.{version}: {e}")
+
+def refresh(apis: Iterable[Tuple[str, str]] = SERVER_APIS) -> Dict[str, Optional[str]]:
+    """Re-fetches the discovery documents for the given APIs from the network.
+
+    Args:
+        apis: The (api, version) pairs to refresh.
+
+    Returns:
+        A dictionary mapping 'api.version' to the refreshed document revision.
+    """
+    revisions = {}
+    for api, version in apis:
+        document = _store(api, version, _fetch(api, version), "network")
+        with _lock:
+            _documents[(api, version)] = document
+        revisions[f"{api}.{version}"] = document.get("revision")
+        logger.info(f"Refreshed discovery document {api}.{version} (revision {document.get('revision')}).")
+    return revisions
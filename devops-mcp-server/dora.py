@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+SECONDS_PER_DAY = 86400.0
+
+def _hours(seconds: np.ndarray) -> Dict[str, Any]:
+    seconds = seconds[~np.isnan(seconds)]
+    if not seconds.size:
+        return {"median": None, "p90": None, "samples": 0}
+    median, p90 = np.percentile(seconds, [50, 90]) / 3600.0
+    return {"median": round(float(median), 2), "p90": round(float(p90), 2), "samples": int(seconds.size)}
+
+def _summary(runtime: Optional[str], deployments: int, failed: int, days: float, lead: np.ndarray, restore: np.ndarray) -> Dict[str, Any]:
+    summary = {"runtime": runtime} if runtime is not None else {}
+    summary.update({
+        "deployments": deployments,
+        "deployments_per_day": round(deployments / days, 3) if days > 0 else None,
+        "lead_time_hours": _hours(lead),
+        "change_failure_rate": round(failed / deployments, 3) if deployments else None,
+        "failed_deployments": failed,
+        "time_to_restore_hours": _hours(restore),
+    })
+    return summary
+
+def compute(
+    deploy_times: Sequence[float],
+    runtimes: Sequence[str],
+    artifacts: Sequence[Optional[str]],
+    build_times: Sequence[Optional[float]],
+    start_time: float,
+    end_time: float,
+) -> Dict[str, Any]:
+    """Computes the four DORA metrics per runtime from a deployment history.
+
+    The history must be sorted by runtime and then by deploy time, and reach back
+    before start_time so rollbacks to older artifacts are recognized. A deployment
+    counts as failed when the next deployment to its runtime rolls back to an
+    artifact that runtime ran before; the time to restore is the time until that
+    rollback. Lead time runs from the creation of the build that produced a
+    deployment's artifact to the deployment.
+
+    Args:
+        deploy_times: The deploy time of each deployment, in epoch seconds.
+        runtimes: The runtime each deployment deployed to.
+        artifacts: A key identifying the set of artifacts each deployment deployed, or None if unknown.
+        build_times: The creation time of the earliest build of each deployment's artifacts, or None if unknown.
+        start_time: The start of the window, in epoch seconds.
+        end_time: The end of the window, in epoch seconds.
+
+    Returns:
+        A dictionary with the metrics of each runtime and across all runtimes.
+    """
+    times = np.asarray(deploy_times, dtype=float)
+    count = times.size
+    days = (end_time - start_time) / SECONDS_PER_DAY
+    if not count:
+        return {"runtimes": [], "overall": _summary(None, 0, 0, days, np.empty(0), np.empty(0))}
+
+    runtime_names, runtime_codes = np.unique(np.asarray(runtimes, dtype=object).astype(str), return_inverse=True)
+    artifact_keys = np.asarray(artifacts, dtype=object)
+    known = np.array([a is not None for a in artifacts], dtype=bool)
+    artifact_codes = np.full(count, -1, dtype=np.int64)
+    if known.any():
+        _, artifact_codes[known] = np.unique(artifact_keys[known].astype(str), return_inverse=True)
+
+    # One code per (runtime, artifact set); deployments of unknown artifacts never match another.
+    positions = np.arange(count)
+    pairs = np.where(known, runtime_codes * (artifact_codes.max() + 2) + artifact_codes, -1 - positions)
+    _, first_index, pair_codes = np.unique(pairs, return_index=True, return_inverse=True)
+    first_seen = first_index[pair_codes]
+
+    same_runtime = np.zeros(count, dtype=bool)
+    same_runtime[1:] = runtime_codes[1:] == runtime_codes[:-1]
+    changed = np.ones(count, dtype=bool)
+    changed[1:] = pairs[1:] != pairs[:-1]
+    rollback = same_runtime & changed & (first_seen < positions)
+
+    failed = np.zeros(count, dtype=bool)
+    failed[positions[rollback] - 1] = True
+    restore = np.full(count, np.nan)
+    restore[rollback] = times[rollback] - times[positions[rollback] - 1]
+
+    # None build times become NaN, which the lead time statistics skip.
+    lead = times - np.array(build_times, dtype=float)
+    lead[lead < 0] = np.nan
+
+    in_window = (times >= start_time) & (times < end_time)
+    deployments = np.bincount(runtime_codes[in_window], minlength=runtime_names.size)
+    failures = np.bincount(runtime_codes[in_window & failed], minlength=runtime_names.size)
+    # Rows are grouped by runtime, so each runtime's rows form one contiguous slice.
+    boundaries = np.flatnonzero(~same_runtime).tolist() + [count]
+
+    per_runtime: List[Dict[str, Any]] = []
+    for begin, end in zip(boundaries[:-1], boundaries[1:]):
+        code = runtime_codes[begin]
+        if not deployments[code]:
+            continue
+        window = in_window[begin:end]
+        per_runtime.append(_summary(
+            str(runtime_names[code]), int(deployments[code]), int(failures[code]), days,
+            lead[begin:end][window], restore[begin:end][window],
+        ))
+    overall = _summary(None, int(in_window.sum()), int((in_window & failed).sum()), days, lead[in_window], restore[in_window])
+    return {"runtimes": per_runtime, "overall": overall}
@@ -0,0 +1,81 @@
+import os
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+# The embedder used for local retrieval: 'hashing' (deterministic, offline) or 'vertex'.
+RAG_EMBEDDER = os.environ.get("RAG_EMBEDDER", "hashing")
+# The Vertex AI text embedding model used by the 'vertex' embedder.
+RAG_EMBEDDING_MODEL = os.environ.get("RAG_EMBEDDING_MODEL", "text-embedding-005")
+
+class HashingEmbedder:
+    """Embeds text as L2-normalized counts of hashed character n-grams.
+
+    Deterministic and local: it needs no model or network, and the same text always
+    gets the same vector, which makes it suitable for near-duplicate detection and tests.
+    """
+
+    def __init__(self, dimensions: int = 512, ngram: int = 3):
+        self.dimensions = dimensions
+        self.ngram = ngram
+        self.name = f"hashing-{dimensions}-{ngram}"
+
+    def embed(self, texts: List[str], task: str = "query") -> np.ndarray:
+        """Embeds texts into a (len(texts), dimensions) float32 matrix with unit-length rows.
+
+        Args:
+            texts: The texts to embed.
+            task: 'query' or 'document'; both are embedded the same way.
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f" {re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()} "
+            for start in range(max(len(padded) - self.ngram + 1, 1)):
+                vectors[row, zlib.crc32(padded[start:start + self.ngram].encode()) % self.dimensions] += 1.0
+        return _normalized(vectors)
+
+class VertexEmbedder:
+    """Embeds text with a Vertex AI text embedding model.
+
+    Calls block on the network; Vertex AI must already be initialized.
+    """
+
+    # Texts sent per embedding request.
+    BATCH_SIZE = 32
+
+    def __init__(self, model: str = RAG_EMBEDDING_MODEL):
+        self.model = model
+        self.name = f"vertex-{model}"
+        self._model = None
+
+    def embed(self, texts: List[str], task: str = "query") -> np.ndarray:
+        """Embeds texts into a float32 matrix with unit-length rows.
+
+        Args:
+            texts: The texts to embed.
+            task: 'query' for search queries or 'document' for the chunks being searched.
+        """
+        from vertexai.language_models import TextEmbeddingInput, TextEmbeddingModel
+
+        if self._model is None:
+            self._model = TextEmbeddingModel.from_pretrained(self.model)
+        task_type = "RETRIEVAL_QUERY" if task == "query" else "RETRIEVAL_DOCUMENT"
+        vectors = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            batch = [TextEmbeddingInput(text, task_type) for text in texts[start:start + self.BATCH_SIZE]]
+            vectors.extend(embedding.values for embedding in self._model.get_embeddings(batch))
+        return _normalized(np.asarray(vectors, dtype=np.float32))
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def get_embedder(name: str = RAG_EMBEDDER):
+    """Returns the embedder configured by name: 'hashing' or 'vertex'."""
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "vertex":
+        return VertexEmbedder()
+    raise ValueError(f"Unknown RAG_EMBEDDER: {name!r}. Use 'hashing' or 'vertex'.")
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+import clients
+import concurrency
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Constant dampening the weight of top ranks in reciprocal rank fusion; 60 is the customary value.
+RRF_K = 60
+# Reranks fused results when set: 'vertex' uses the Vertex AI ranking API; empty disables reranking.
+RAG_RERANKER = os.environ.get("RAG_RERANKER", "")
+# The Vertex AI ranking model used by the 'vertex' reranker.
+RAG_RERANK_MODEL = os.environ.get("RAG_RERANK_MODEL", "semantic-ranker-default@latest")
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """Fuses rankings of the same kind of items into one, by the sum of 1 / (k + rank) across rankings.
+
+    Items are identified by their text, ignoring differences in whitespace. Ties keep
+    the order in which the items first appeared.
+
+    Args:
+        rankings: Lists of items, best first.
+        k: The RRF constant.
+
+    Returns:
+        The distinct items, best first.
+    """
+    scores: Dict[str, float] = {}
+    items: Dict[str, str] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            key = " ".join(item.split())
+            items.setdefault(key, item)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return [items[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+async def _vertex_rerank(project_id: str, query: str, texts: List[str], top_k: int) -> List[str]:
+    service = await concurrency.run_blocking('discoveryengine', clients.get_discovery_service, 'discoveryengine', 'v1')
+    request = service.projects().locations().rankingConfigs().rank(
+        rankingConfig=f"projects/{project_id}/locations/global/rankingConfigs/default_ranking_config",
+        body={
+            "model": RAG_RERANK_MODEL,
+            "query": query,
+            "records": [{"id": str(i), "content": text} for i, text in enumerate(texts)],
+            "topN": top_k,
+        },
+    )
+    response = await concurrency.execute('discoveryengine', request)
+    return [texts[int(record["id"])] for record in response.get("records", [])]
+
+async def rerank(project_id: str, query: str, texts: List[str], top_k: int, deadline: float) -> Optional[List[str]]:
+    """Reranks retrieved texts with the configured reranker, if it answers before the deadline.
+
+    Args:
+        project_id: The project the reranker is billed to.
+        query: The query the texts were retrieved for.
+        texts: The candidate texts, best first.
+        top_k: The number of texts to return.
+        deadline: The time.monotonic() by which the reranker must answer.
+
+    Returns:
+        The top_k texts in their new order, or None if reranking is disabled, failed or ran out of time.
+    """
+    if not RAG_RERANKER or len(texts) < 2:
+        return None
+    if RAG_RERANKER != "vertex":
+        raise ValueError(f"Unknown RAG_RERANKER: {RAG_RERANKER!r}. Use 'vertex' or leave it empty.")
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        metrics.increment("rag.rerank_skipped")
+        return None
+    try:
+        return await asyncio.wait_for(_vertex_rerank(project_id, query, texts, top_k), remaining)
+    except asyncio.TimeoutError:
+        metrics.increment("rag.rerank_timeout")
+    except Exception as e:
+        logger.warning(f"Reranking failed, keeping the fused order: {e}")
+    return None
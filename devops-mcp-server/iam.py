@@ -1,24 +1,38 @@
-import google.auth
-from googleapiclient import discovery
+import asyncio
+import os
+import random
+import time
+
 from app import mcp
-from typing import Dict, Any, List
+import cache
+import clients
+import concurrency
+import metrics
+import pagination
+import projection
+from fastmcp import Context
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# Fields returned for each service account unless the caller asks for others.
+SERVICE_ACCOUNT_SUMMARY_FIELDS = ["email", "displayName", "uniqueId", "disabled"]
+# IAM policies are read and written as version 3 so conditional bindings survive a write.
+POLICY_VERSION = 3
+# A policy write that loses an etag race is retried up to this many times in total.
+ETAG_MAX_ATTEMPTS = 5
+ETAG_RETRY_BASE_DELAY = 0.5
+# How long an indexed policy snapshot answers lookups before it is refetched.
+POLICY_SNAPSHOT_TTL = float(os.environ.get("DEVOPS_MCP_IAM_SNAPSHOT_TTL", "60"))
 
 def _get_iam_service():
     """Gets the IAM service client."""
-    credentials, _ = google.auth.default(
-        scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    return discovery.build("iam", "v1", credentials=credentials)
+    return clients.get_discovery_service("iam", "v1")
 
 def _get_cloud_resource_manager_service():
     """Gets the Cloud Resource Manager service client."""
-    credentials, _ = google.auth.default(
-        scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    return discovery.build("cloudresourcemanager", "v1", credentials=credentials)
+    return clients.get_discovery_service("cloudresourcemanager", "v1")
 
 @mcp.tool
-def create_service_account(project_id: str, display_name: str, account_id: str) -> Dict[str, str]:
+async def create_service_account(project_id: str, display_name: str, account_id: str) -> Dict[str, str]:
     """Creates a new Google Cloud Platform service account.
 
     Args:
@@ -44,16 +58,196 @@ def create_service_account(project_id: str, display_name: str, account_id: str)
                 "serviceAccount": service_account_body,
             },
         )
-        response = request.execute()
+        response = await concurrency.execute("iam", request)
 
+        cache.invalidate("list_service_accounts", project_id)
         return {"message": f"Successfully created service account: {response['email']}"}
 
     except Exception as e:
         return {"error": str(e)}
 
 
+async def _fetch_policy(project_id: str) -> Dict[str, Any]:
+    """Fetches the current IAM policy of a project, including conditional bindings."""
+    service = _get_cloud_resource_manager_service()
+    policy_request = service.projects().getIamPolicy(
+        resource=project_id, body={"options": {"requestedPolicyVersion": POLICY_VERSION}}
+    )
+    return await concurrency.execute("cloudresourcemanager", policy_request)
+
+class PolicySnapshot:
+    """An IAM policy indexed by member and by role for in-memory lookups."""
+
+    def __init__(self, policy: Dict[str, Any]):
+        self.etag = policy.get("etag")
+        self.fetched_at = time.monotonic()
+        self.member_roles: Dict[str, List[Dict[str, Any]]] = {}
+        self.role_members: Dict[str, List[Dict[str, Any]]] = {}
+        for binding in policy.get("bindings", []):
+            role = binding["role"]
+            condition = binding.get("condition")
+            for member in binding.get("members", []):
+                grant = {"role": role}
+                holder = {"member": member}
+                if condition is not None:
+                    grant["condition"] = condition
+                    holder["condition"] = condition
+                self.member_roles.setdefault(member, []).append(grant)
+                self.role_members.setdefault(role, []).append(holder)
+
+    def roles_of(self, member: str) -> List[Dict[str, Any]]:
+        """Returns the roles granted to a member, each with its condition if the grant is conditional."""
+        return self.member_roles.get(member, [])
+
+    def members_of(self, role: str) -> List[Dict[str, Any]]:
+        """Returns the members holding a role, each with its condition if the grant is conditional."""
+        return self.role_members.get(role, [])
+
+class _PolicyIndex:
+    """Keeps one indexed policy snapshot per project.
+
+    Snapshots are refetched once they are older than POLICY_SNAPSHOT_TTL and are
+    only re-indexed when the policy etag changed. Policies read and written by
+    the role binding tools refresh the snapshot for free.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, PolicySnapshot] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, project_id: str, refresh: bool = False) -> PolicySnapshot:
+        """Returns the indexed policy of a project, fetching it if missing, stale or refresh is set."""
+        requested_at = time.monotonic()
+        snapshot = self._snapshots.get(project_id)
+        if snapshot is not None and not refresh and requested_at - snapshot.fetched_at < POLICY_SNAPSHOT_TTL:
+            metrics.increment("iam.policy_snapshot.hit")
+            return snapshot
+        async with self._locks.setdefault(project_id, asyncio.Lock()):
+            # Another caller may have refreshed the snapshot while this one waited for the lock.
+            snapshot = self._snapshots.get(project_id)
+            if snapshot is not None and snapshot.fetched_at >= requested_at:
+                metrics.increment("iam.policy_snapshot.hit")
+                return snapshot
+            metrics.increment("iam.policy_snapshot.miss")
+            return self.update(project_id, await _fetch_policy(project_id))
+
+    def update(self, project_id: str, policy: Dict[str, Any]) -> PolicySnapshot:
+        """Records a freshly read or written policy, re-indexing it only if its etag changed."""
+        snapshot = self._snapshots.get(project_id)
+        if snapshot is not None and snapshot.etag is not None and snapshot.etag == policy.get("etag"):
+            snapshot.fetched_at = time.monotonic()
+            return snapshot
+        snapshot = self._snapshots[project_id] = PolicySnapshot(policy)
+        metrics.increment("iam.policy_snapshot.indexed")
+        return snapshot
+
+_policy_index = _PolicyIndex()
+
+def merge_bindings(policy: Dict[str, Any], pairs: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+    """Merges (role, member) pairs into the unconditional bindings of an IAM policy in place.
+
+    Members are added to the existing binding for their role instead of
+    appending a new binding entry per grant.
+
+    Args:
+        policy: The IAM policy returned by getIamPolicy.
+        pairs: The (role, member) pairs to grant.
+
+    Returns:
+        The pairs that were not already granted.
+    """
+    bindings = policy.setdefault("bindings", [])
+    by_role = {binding["role"]: binding for binding in bindings if "condition" not in binding}
+    added = set()
+    for role, member in pairs:
+        binding = by_role.get(role)
+        if binding is None:
+            binding = by_role[role] = {"role": role, "members": []}
+            bindings.append(binding)
+        members = binding.setdefault("members", [])
+        if member not in members:
+            members.append(member)
+            added.add((role, member))
+    return added
+
+class _PolicyWriter:
+    """Coalesces concurrent role grants on the same resource into one read-modify-write of its IAM policy.
+
+    Grants that arrive while a resource's policy is being written are batched
+    into the next write. A write that loses an etag race re-reads the policy
+    and retries with exponential backoff.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, List[Tuple[List[Tuple[str, str]], asyncio.Future]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def grant(self, resource_id: str, pairs: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """Grants (role, member) pairs on a project and returns the ones that were newly added."""
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(resource_id, [])
+        batch.append((pairs, future))
+        if len(batch) == 1:
+            flush = asyncio.create_task(self._flush(resource_id))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+        else:
+            metrics.increment("iam.policy_writes.coalesced")
+        return await future
+
+    async def _flush(self, resource_id: str):
+        lock = self._locks.setdefault(resource_id, asyncio.Lock())
+        async with lock:
+            batch = self._pending.pop(resource_id)
+            try:
+                added = await self._write(resource_id, [pair for pairs, _ in batch for pair in pairs])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            # A pair several callers asked for is reported as added only to the first of them;
+            # callers that were cancelled meanwhile are skipped.
+            claimed: Set[Tuple[str, str]] = set()
+            for pairs, future in batch:
+                if future.done():
+                    continue
+                granted = added.intersection(pairs) - claimed
+                claimed |= granted
+                future.set_result(granted)
+
+    async def _write(self, resource_id: str, pairs: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        from googleapiclient.errors import HttpError
+
+        service = _get_cloud_resource_manager_service()
+        for attempt in range(1, ETAG_MAX_ATTEMPTS + 1):
+            policy = await _fetch_policy(resource_id)
+            _policy_index.update(resource_id, policy)
+            added = merge_bindings(policy, pairs)
+            if not added:
+                return added
+            # Conditional bindings are only preserved when the policy is written back as version 3.
+            policy["version"] = POLICY_VERSION
+            set_policy_request = service.projects().setIamPolicy(
+                resource=resource_id, body={"policy": policy}
+            )
+            try:
+                updated_policy = await concurrency.execute("cloudresourcemanager", set_policy_request)
+            except HttpError as e:
+                if e.resp.status != 409 or attempt == ETAG_MAX_ATTEMPTS:
+                    raise
+                metrics.increment("iam.policy_writes.etag_conflicts")
+                await asyncio.sleep(ETAG_RETRY_BASE_DELAY * 2 ** (attempt - 1) * (1 + random.random()))
+                continue
+            metrics.increment("iam.policy_writes")
+            _policy_index.update(resource_id, updated_policy)
+            return added
+
+_policy_writer = _PolicyWriter()
+
 @mcp.tool
-def add_iam_role_binding(resource_type: str, resource_id: str, role: str, member: str) -> Dict[str, str]:
+async def add_iam_role_binding(resource_type: str, resource_id: str, role: str, member: str) -> Dict[str, str]:
     """Adds an IAM role binding to a Google Cloud Platform resource.
 
     Args:
@@ -66,79 +260,152 @@ def add_iam_role_binding(resource_type: str, resource_id: str, role: str, member
         A dictionary containing a success message or an error message.
     """
     try:
-        service = _get_cloud_resource_manager_service()
+        added = await _policy_writer.grant(resource_id, [(role, member)])
+        if not added:
+            return {"message": f"{member} already has role {role} on {resource_type}/{resource_id}"}
+        return {"message": f"Successfully added role binding for {member} with role {role} to {resource_type}/{resource_id}"}
 
-        # Get the current IAM policy
-        policy_request = service.projects().getIamPolicy(
-            resource=resource_id, body={}
-        )
-        policy = policy_request.execute()
+    except Exception as e:
+        return {"error": str(e)}
 
-        # Add the new binding
-        new_binding = {"role": role, "members": [member]}
-        policy["bindings"].append(new_binding)
+@mcp.tool
+async def add_iam_role_bindings(resource_type: str, resource_id: str, bindings: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Adds several IAM role bindings to a Google Cloud Platform resource in a single policy update.
 
-        # Set the updated IAM policy
-        set_policy_request = service.projects().setIamPolicy(
-            resource=resource_id, body={"policy": policy}
-        )
-        set_policy_request.execute()
+    Args:
+        resource_type: The type of resource (e.g., 'projects', 'folders', 'organizations').
+        resource_id: The ID of the resource. my-project, 1234320592234
+        bindings: The bindings to add, each a dictionary with a 'role' and a 'member',
+            e.g. [{"role": "roles/run.admin", "member": "serviceAccount:deployer@my-project.iam.gserviceaccount.com"}].
 
-        return {"message": f"Successfully added role binding for {member} with role {role} to {resource_type}/{resource_id}"}
+    Returns:
+        A dictionary listing the bindings that were added and the ones already present, or an error message.
+    """
+    try:
+        pairs = [(binding["role"], binding["member"]) for binding in bindings]
+        added = await _policy_writer.grant(resource_id, pairs)
+        return {
+            "message": f"Added {len(added)} of {len(set(pairs))} role bindings to {resource_type}/{resource_id}",
+            "added": [{"role": role, "member": member} for role, member in pairs if (role, member) in added],
+            "already_present": [{"role": role, "member": member} for role, member in pairs if (role, member) not in added],
+        }
 
     except Exception as e:
         return {"error": str(e)}
 
 
 @mcp.tool
-def list_service_accounts(project_id: str) -> List[Dict[str, Any]]:
-    """Lists all service accounts in a project.
+async def list_service_accounts(
+    project_id: str,
+    page_size: int = pagination.DEFAULT_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    max_pages: int = 1,
+    fields: Optional[str] = None,
+    bypass_cache: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Lists service accounts in a project, one or more pages at a time.
 
     Args:
         project_id: The ID of the Google Cloud project.
+        page_size: The maximum number of service accounts to return per page.
+        page_token: The next_page_token returned by a previous call, to continue listing from there.
+        max_pages: The maximum number of pages to fetch in this call.
+        fields: Comma-separated service account fields to return, e.g. 'email,description'. Defaults to a compact summary; pass '*' for the full accounts.
+        bypass_cache: Whether to ignore recently cached results and fetch the service accounts again.
 
     Returns:
-        A list of service accounts or a dictionary with an error message.
+        A dictionary containing the accounts and the next_page_token (None when there are no more), or an error message.
     """
+    return await cache.read_through(
+        "list_service_accounts", project_id, None,
+        lambda: _list_service_accounts(project_id, page_size, page_token, max_pages, fields, ctx),
+        key_extra=(page_size, page_token, max_pages, fields),
+        bypass_cache=bypass_cache,
+    )
+
+async def _list_service_accounts(project_id: str, page_size: int, page_token: Optional[str], max_pages: int, fields: Optional[str], ctx: Optional[Context]) -> Dict[str, Any]:
     try:
         service = _get_iam_service()
 
         parent = f"projects/{project_id}"
-        request = service.projects().serviceAccounts().list(name=parent)
-        response = request.execute()
+        mask = projection.api_fields(projection.parse_fields(fields, SERVICE_ACCOUNT_SUMMARY_FIELDS), "accounts")
 
-        return response.get("accounts", [])
+        async def fetch_page(token):
+            request = service.projects().serviceAccounts().list(name=parent, pageSize=page_size, pageToken=token, fields=mask)
+            response = await concurrency.execute("iam", request)
+            return response.get("accounts", []), response.get("nextPageToken")
+
+        accounts, next_page_token = await pagination.collect_pages(fetch_page, page_token, max_pages, ctx)
+        return {"accounts": accounts, "next_page_token": next_page_token}
 
     except Exception as e:
         return {"error": str(e)}
 
 
 @mcp.tool
-def get_iam_role_binding(project_id: str, service_account_email: str) -> Dict[str, Any]:
+async def get_iam_role_binding(project_id: str, service_account_email: str, bypass_cache: bool = False) -> Dict[str, Any]:
     """Gets the IAM role bindings for a service account.
 
     Args:
         project_id: The ID of the GCP project.
         service_account_email: The email of the service account.
+        bypass_cache: Whether to ignore the indexed policy snapshot and fetch the IAM policy again.
 
     Returns:
         A dictionary containing the roles of the service account or an error message.
+        Roles granted under a condition are also listed with their condition in conditional_roles.
     """
     try:
-        service = _get_cloud_resource_manager_service()
+        snapshot = await _policy_index.get(project_id, refresh=bypass_cache)
 
-        # Get the current IAM policy
-        policy_request = service.projects().getIamPolicy(
-            resource=project_id, body={}
-        )
-        policy = policy_request.execute()
+        grants = snapshot.roles_of(f"serviceAccount:{service_account_email}")
+        roles = list(dict.fromkeys(grant["role"] for grant in grants))
+        result = {"roles": roles}
+        conditional = [grant for grant in grants if "condition" in grant]
+        if conditional:
+            result["conditional_roles"] = conditional
+        return result
 
-        bindings = []
-        for binding in policy.get("bindings", []):
-            if f"serviceAccount:{service_account_email}" in binding.get("members", []):
-                bindings.append(binding.get("role"))
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool
+async def get_member_roles(project_id: str, member: str, bypass_cache: bool = False) -> Dict[str, Any]:
+    """Gets the roles any member holds on a project.
+
+    Args:
+        project_id: The ID of the GCP project.
+        member: The member to look up, e.g. 'user:example@example.com' or 'group:devs@example.com'.
+        bypass_cache: Whether to ignore the indexed policy snapshot and fetch the IAM policy again.
 
-        return {"roles": bindings}
+    Returns:
+        A dictionary containing the member's role grants (with their condition, if any) or an error message.
+    """
+    try:
+        snapshot = await _policy_index.get(project_id, refresh=bypass_cache)
+        return {"member": member, "roles": snapshot.roles_of(member)}
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool
+async def get_role_members(project_id: str, role: str, bypass_cache: bool = False) -> Dict[str, Any]:
+    """Gets the members holding a role on a project.
+
+    Args:
+        project_id: The ID of the GCP project.
+        role: The role to look up, e.g. 'roles/run.admin'.
+        bypass_cache: Whether to ignore the indexed policy snapshot and fetch the IAM policy again.
+
+    Returns:
+        A dictionary containing the role's members (with their condition, if any) or an error message.
+    """
+    try:
+        snapshot = await _policy_index.get(project_id, refresh=bypass_cache)
+        return {"role": role, "members": snapshot.members_of(role)}
 
     except Exception as e:
         return {"error": str(e)}
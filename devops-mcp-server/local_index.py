@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Where local indexes are persisted, one subdirectory per corpus.
+RAG_INDEX_DIR = os.environ.get("RAG_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "devops-mcp-server", "rag-index"))
+# Maximum characters per chunk. Chunks are cut at blank lines where possible.
+RAG_CHUNK_CHARS = int(os.environ.get("RAG_CHUNK_CHARS", "4000"))
+# Chunks embedded per embedder call while building an index.
+EMBED_BATCH_SIZE = 64
+# Bumped whenever the on-disk layout changes, so older indexes are rebuilt.
+INDEX_FORMAT = 1
+# File types read from corpus directories.
+CORPUS_SUFFIXES = (".txt", ".md", ".markdown", ".rst", ".yaml", ".yml", ".html")
+
+def corpus_files(sources: List[str]) -> List[str]:
+    """Returns the corpus files found under the source directories (or files), sorted."""
+    files = []
+    for source in sources:
+        if os.path.isfile(source):
+            files.append(source)
+            continue
+        for root, _, names in os.walk(source):
+            files.extend(os.path.join(root, name) for name in names if name.lower().endswith(CORPUS_SUFFIXES))
+    return sorted(set(files))
+
+def chunk_text(text: str, max_chars: int = RAG_CHUNK_CHARS) -> List[str]:
+    """Splits text into chunks of at most max_chars, cutting at blank lines where possible."""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip("\n")
+        if not paragraph.strip():
+            continue
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + 2 + len(paragraph) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+def fingerprint(files: List[str], salt: str = "") -> str:
+    """Returns a short hash of the paths and contents of files, which changes whenever any of them does."""
+    digest = hashlib.sha1(salt.encode())
+    for path in files:
+        with open(path, "rb") as f:
+            digest.update(f"\0{os.path.abspath(path)}\0".encode())
+            digest.update(hashlib.sha1(f.read()).digest())
+    return digest.hexdigest()[:12]
+
+def read_chunks(files: List[str], chunk_chars: int = RAG_CHUNK_CHARS) -> List[Dict[str, str]]:
+    """Reads and chunks files into {'source': file name, 'text': chunk text} records."""
+    chunks = []
+    for path in files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        chunks.extend({"source": os.path.basename(path), "text": chunk} for chunk in chunk_text(text, chunk_chars))
+    return chunks
+
+class LocalIndex:
+    """An in-process vector index over the files of a corpus.
+
+    Chunks are embedded once and their vectors stored as a NumPy matrix under
+    index_dir, together with the chunk texts and a manifest fingerprinting the
+    corpus files, the embedder and the chunking. Later loads memory-map the matrix
+    instead of re-embedding, as long as the manifest still matches; otherwise the
+    index is rebuilt.
+    """
+
+    def __init__(self, name: str, sources: List[str], embedder, index_dir: str = RAG_INDEX_DIR, chunk_chars: int = RAG_CHUNK_CHARS):
+        self.name = name
+        self.sources = sources
+        self.embedder = embedder
+        self.path = os.path.join(index_dir, name)
+        self.chunk_chars = chunk_chars
+        self.version: Optional[str] = None
+        # (chunks, vectors), swapped as one so searches during a reload never mix two builds.
+        self._loaded: Optional[Tuple[List[Dict[str, str]], np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def chunks(self) -> List[Dict[str, str]]:
+        """The loaded chunks, as {'source': file name, 'text': chunk text} records."""
+        return self._loaded[0] if self._loaded is not None else []
+
+    def load(self) -> "LocalIndex":
+        """Loads the persisted index, building it first if it is missing or stale.
+
+        Blocking: building embeds every chunk, which may call a remote model.
+
+        Returns:
+            The index itself.
+        """
+        with self._lock:
+            files = corpus_files(self.sources)
+            if not files:
+                raise FileNotFoundError(f"No corpus files found for local index '{self.name}' in {self.sources}.")
+            version = fingerprint(files, f"{INDEX_FORMAT}:{self.embedder.name}:{self.chunk_chars}")
+            if self.version == version:
+                return self
+            manifest = self._read_manifest()
+            if manifest.get("fingerprint") != version:
+                self._build(files, version)
+            with open(os.path.join(self.path, "chunks.json"), encoding="utf-8") as f:
+                chunks = json.load(f)
+            self._loaded = (chunks, np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r"))
+            self.version = version
+            return self
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.path, "manifest.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _build(self, files: List[str], version: str):
+        started = time.monotonic()
+        chunks = read_chunks(files, self.chunk_chars)
+        batches = [
+            self.embedder.embed([chunk["text"] for chunk in chunks[start:start + EMBED_BATCH_SIZE]], task="document")
+            for start in range(0, len(chunks), EMBED_BATCH_SIZE)
+        ]
+        vectors = np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, 0), dtype=np.float32)
+        os.makedirs(self.path, exist_ok=True)
+        # The manifest is written last, so an interrupted build is redone on the next load.
+        self._write(os.path.join(self.path, "vectors.npy"), lambda f: np.save(f, vectors), binary=True)
+        self._write(os.path.join(self.path, "chunks.json"), lambda f: json.dump(chunks, f))
+        self._write(os.path.join(self.path, "manifest.json"), lambda f: json.dump({
+            "format": INDEX_FORMAT,
+            "fingerprint": version,
+            "embedder": self.embedder.name,
+            "dimensions": int(vectors.shape[1]),
+            "chunk_chars": self.chunk_chars,
+            "files": [os.path.basename(path) for path in files],
+            "chunks": len(chunks),
+        }, f, indent=2))
+        logger.info(f"Built local index '{self.name}': {len(chunks)} chunks from {len(files)} files in {time.monotonic() - started:.1f}s.")
+
+    @staticmethod
+    def _write(path: str, write, binary: bool = False):
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb" if binary else "w", encoding=None if binary else "utf-8") as f:
+            write(f)
+        os.replace(temporary, path)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, Dict[str, str]]]:
+        """Returns the top_k chunks most similar to the query as (cosine similarity, chunk), best first."""
+        if self._loaded is None:
+            self.load()
+        chunks, vectors = self._loaded
+        if not chunks:
+            return []
+        scores = vectors @ self.embedder.embed([query], task="query")[0]
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), chunks[i]) for i in top]
@@ -1,40 +1,89 @@
-# Import the app instance. This also brings in the config resource.
-from app import mcp
-
-# IMPORTANT: Import the modules containing your tools.
-import artifact_registry
-import cloud_run
-import dev_connect
-import cloud_build
-import iam
-import cicd
-import rag
-import vertexai
-import dci_view_api
-
-
 import argparse
+import importlib
 import os
 import logging
 import sys
+import time
 
 logging.basicConfig(stream=sys.stderr, level=logging.INFO)
 
+# IMPORTANT: The modules containing your tools. Importing them registers their
+# tools with the app; heavy SDKs are only imported when a tool first needs them.
+TOOL_MODULES = [
+    "artifact_registry",
+    "cloud_run",
+    "cloud_deploy",
+    "dev_connect",
+    "cloud_build",
+    "iam",
+    "cicd",
+    "rag",
+    "dci_view_api",
+    "container_analysis",
+    "operations",
+]
+
+def load_tool_modules():
+    """Imports the app and every tool module.
+
+    Returns:
+        A list of (module name, import seconds, number of modules it pulled in) tuples.
+    """
+    timings = []
+    for name in ["app"] + TOOL_MODULES:
+        modules_before = len(sys.modules)
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings.append((name, time.perf_counter() - start, len(sys.modules) - modules_before))
+    return timings
+
+def print_startup_profile(timings):
+    """Prints an import-time breakdown of server startup to stderr."""
+    print(f"{'module':<20} {'seconds':>8} {'new modules':>12}", file=sys.stderr)
+    for name, seconds, new_modules in timings:
+        print(f"{name:<20} {seconds:>8.3f} {new_modules:>12}", file=sys.stderr)
+    print(f"{'total':<20} {sum(t[1] for t in timings):>8.3f} {sum(t[2] for t in timings):>12}", file=sys.stderr)
+
 def initialize_services():
-    """Initializes all external services like Vertex AI."""
-    logging.info("Initializing Vertex AI...")
-    vertexai.init(project="haroonc-exp", location="us-east4")
-    logging.info("Vertex AI Initialized.")
+    """Initializes external services needed before serving.
 
-if __name__ == "__main__":
+    Vertex AI is initialized lazily by the RAG tools on first use; the pattern
+    catalog is parsed up front, as it is small and searched locally.
+    """
+    import discovery_cache
+    import rag
+
+    logging.info("Loading discovery documents...")
+    discovery_cache.warm()
+    rag.load_pattern_catalog()
+
+def main():
+    """Parses the command line and serves the tools until the server stops."""
     parser = argparse.ArgumentParser(description="GCP DevOps MCP Server.")
     parser.add_argument("--transport", type=str, default="http", help="MCP Transport ('http' or 'stdio')")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="MCP Server Host")
     parser.add_argument("--port", type=int, default=9000, help="MCP Server Port")
     parser.add_argument("--path", type=str, default="/mcp", help="MCP Path")
+    parser.add_argument("--refresh-discovery-cache", action="store_true", help="Re-fetch the cached Google API discovery documents and exit")
+    parser.add_argument("--profile-startup", action="store_true", help="Print an import-time breakdown of server startup")
+
+    args = parser.parse_args()
+    if args.refresh_discovery_cache:
+        import discovery_cache
+
+        revisions = discovery_cache.refresh()
+        logging.info(f"Refreshed discovery documents in {discovery_cache.DISCOVERY_CACHE_DIR}: {revisions}")
+        sys.exit(0)
 
-    args = parser.parse_args()    
+    startup_begin = time.perf_counter()
+    timings = load_tool_modules()
     initialize_services()
+    if args.profile_startup:
+        print_startup_profile(timings)
+        print(f"Server ready to serve after {time.perf_counter() - startup_begin:.3f}s", file=sys.stderr)
+
+    from app import mcp
+
     logging.info(f"Starting server as {args.transport} transport")
     if args.transport == "stdio":
         mcp.run(transport=args.transport)
@@ -42,4 +91,6 @@ if __name__ == "__main__":
         mcp.run(transport=args.transport, host=args.host, port=args.port, path=args.path)
     else:
         os.error(f"Transport {args.transport } is not supported!")
-    
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
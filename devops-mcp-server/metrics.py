@@ -0,0 +1,21 @@
+import collections
+import threading
+from typing import Dict
+
+_lock = threading.Lock()
+_counters = collections.Counter()
+
+def increment(name: str, amount: int = 1):
+    """Increments a process-wide counter.
+
+    Args:
+        name: The dotted name of the counter (e.g. 'client_pool.cloudbuild.hit').
+        amount: The amount to add to the counter.
+    """
+    with _lock:
+        _counters[name] += amount
+
+def snapshot() -> Dict[str, int]:
+    """Returns a copy of all counters, sorted by name."""
+    with _lock:
+        return dict(sorted(_counters.items()))
@@ -0,0 +1,54 @@
+import clients
+import concurrency
+import pagination
+import projection
+from fastmcp import Context
+from typing import Optional, Dict, Any, List
+
+# Page size used when listing occurrences; 1000 is the API maximum.
+OCCURRENCE_PAGE_SIZE = 1000
+
+def _get_container_analysis_service():
+    """Gets the Container Analysis service client."""
+    return clients.get_discovery_service('containeranalysis', 'v1')
+
+def image_reference(resource_url: str) -> str:
+    """Returns an image reference without the 'https://' prefix Container Analysis resource URLs carry."""
+    return resource_url.strip().removeprefix("https://")
+
+def image_project(image: str, default: str) -> str:
+    """Returns the project hosting an Artifact Registry or Container Registry image, whose occurrences describe it."""
+    host, _, path = image.partition("/")
+    if host.endswith("-docker.pkg.dev") or host.endswith("gcr.io"):
+        return path.split("/", 1)[0] or default
+    return default
+
+async def list_occurrences(project_id: str, image: str, kind: str, fields: Optional[List[str]] = None, ctx: Optional[Context] = None) -> List[Dict[str, Any]]:
+    """Lists all Container Analysis occurrences of one kind for an image, following every page.
+
+    Args:
+        project_id: The ID of the project holding the occurrences.
+        image: The digest-pinned image reference, with or without 'https://'.
+        kind: The occurrence kind, e.g. 'VULNERABILITY' or 'PACKAGE'.
+        fields: The dotted occurrence fields to request, or None for full occurrences.
+        ctx: The MCP context of the calling tool, used to send progress notifications.
+
+    Returns:
+        The occurrences.
+    """
+    service = _get_container_analysis_service()
+    mask = projection.api_fields(fields, "occurrences")
+
+    async def fetch_page(token):
+        request = service.projects().occurrences().list(
+            parent=f"projects/{project_id}",
+            filter=f'resourceUrl="https://{image_reference(image)}" AND kind="{kind}"',
+            pageSize=OCCURRENCE_PAGE_SIZE,
+            pageToken=token,
+            fields=mask,
+        )
+        response = await concurrency.execute('containeranalysis', request)
+        return response.get("occurrences", []), response.get("nextPageToken")
+
+    occurrences, _ = await pagination.collect_pages(fetch_page, max_pages=None, ctx=ctx)
+    return occurrences
@@ -0,0 +1,269 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastmcp import Context
+
+from app import mcp
+import concurrency
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Polling starts quickly for operations that finish in seconds and backs off
+# towards MAX_POLL_INTERVAL for the ones that take minutes.
+MIN_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 30.0
+POLL_BACKOFF = 1.5
+# Finished operations are forgotten after this long so the registry stays bounded.
+RETENTION_SECONDS = 3600
+# How often callers waiting on an operation are sent a progress notification.
+PROGRESS_INTERVAL = 1.0
+
+class TrackedOperation:
+    """A long-running operation registered with the tracker."""
+
+    def __init__(self, operation_id: str, description: str, poll: Callable[[], Awaitable[Tuple[bool, Any]]], on_done: Optional[Callable[[Any], Any]]):
+        self.operation_id = operation_id
+        self.description = description
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.polls = 0
+        self.interval = MIN_POLL_INTERVAL
+        self.next_poll = self.created_at
+        self.finished = asyncio.Event()
+        self.poll = poll
+        self.on_done = on_done
+
+    def status(self) -> Dict[str, Any]:
+        """Returns what the operation is, how long it has run and, once done, its result or error."""
+        end = self.finished_at if self.done else time.monotonic()
+        status = {
+            "operation_id": self.operation_id,
+            "description": self.description,
+            "done": self.done,
+            "elapsed_seconds": round(end - self.created_at, 1),
+            "polls": self.polls,
+        }
+        if self.error is not None:
+            status["error"] = self.error
+        elif self.done:
+            status["result"] = self.result
+        return status
+
+class OperationTracker:
+    """Polls all registered long-running operations from a single background task."""
+
+    def __init__(self):
+        self._operations: Dict[str, TrackedOperation] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, operation_id: str, description: str, poll: Callable[[], Awaitable[Tuple[bool, Any]]], on_done: Optional[Callable[[Any], Any]] = None) -> TrackedOperation:
+        """Starts tracking an operation. Must be called from the server's event loop.
+
+        Args:
+            operation_id: A unique ID for the operation, usually the LRO name.
+            description: A human readable description of what the operation does.
+            poll: A coroutine function returning (done, result). It raises if the operation failed.
+            on_done: An optional (coroutine) function turning the raw result into the reported result.
+
+        Returns:
+            The tracked operation.
+        """
+        operation = TrackedOperation(operation_id, description, poll, on_done)
+        self._operations[operation_id] = operation
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        self._wakeup.set()
+        metrics.increment("operations.registered")
+        logger.info(f"Tracking operation {operation_id}: {description}")
+        return operation
+
+    def get(self, operation_id: str) -> Optional[TrackedOperation]:
+        """Returns a tracked operation by ID, or None if it is unknown or was forgotten after finishing."""
+        return self._operations.get(operation_id)
+
+    async def wait(self, operation: TrackedOperation, timeout: Optional[float] = None, ctx: Optional[Context] = None) -> Dict[str, Any]:
+        """Waits until the operation finishes or the timeout expires and returns its status.
+
+        Args:
+            operation: The tracked operation.
+            timeout: The maximum number of seconds to wait, or None to wait indefinitely.
+            ctx: The MCP context of the calling tool, used to send progress notifications.
+
+        Returns:
+            The operation status.
+        """
+        started = time.monotonic()
+        while not operation.done:
+            waited = time.monotonic() - started
+            if timeout is not None and waited >= timeout:
+                break
+            if ctx is not None:
+                await ctx.report_progress(progress=waited, total=timeout)
+            step = PROGRESS_INTERVAL if timeout is None else min(PROGRESS_INTERVAL, timeout - waited)
+            try:
+                await asyncio.wait_for(operation.finished.wait(), step)
+            except asyncio.TimeoutError:
+                pass
+        return operation.status()
+
+    def _finish(self, operation: TrackedOperation, result: Any = None, error: Optional[str] = None):
+        operation.result = result
+        operation.error = error
+        operation.done = True
+        operation.finished_at = time.monotonic()
+        operation.finished.set()
+        metrics.increment("operations.failed" if error is not None else "operations.succeeded")
+
+    async def _poll(self, operation: TrackedOperation):
+        operation.polls += 1
+        metrics.increment("operations.polls")
+        try:
+            done, result = await operation.poll()
+            if not done:
+                operation.next_poll = time.monotonic() + operation.interval
+                operation.interval = min(operation.interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+                return
+            if operation.on_done is not None:
+                result = operation.on_done(result)
+                if inspect.isawaitable(result):
+                    result = await result
+            self._finish(operation, result=result)
+            logger.info(f"Operation {operation.operation_id} finished after {operation.polls} polls.")
+        except Exception as e:
+            logger.error(f"Operation {operation.operation_id} failed: {e}", exc_info=True)
+            self._finish(operation, error=str(e))
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            for operation_id, operation in list(self._operations.items()):
+                if operation.done and now - operation.finished_at > RETENTION_SECONDS:
+                    del self._operations[operation_id]
+            pending = [op for op in self._operations.values() if not op.done]
+            due = [op for op in pending if op.next_poll <= now]
+            if due:
+                await asyncio.gather(*(self._poll(op) for op in due))
+                continue
+            self._wakeup.clear()
+            timeout = min((op.next_poll for op in pending), default=now + MAX_POLL_INTERVAL) - now
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+tracker = OperationTracker()
+
+def track_api_core_operation(operation, description: str, on_done: Optional[Callable[[Any], Any]] = None) -> TrackedOperation:
+    """Tracks a google.api_core AsyncOperation returned by a native async gRPC client.
+
+    Args:
+        operation: The google.api_core.operation_async.AsyncOperation to track.
+        description: A human readable description of what the operation does.
+        on_done: An optional (coroutine) function turning the operation response into the reported result.
+
+    Returns:
+        The tracked operation.
+    """
+    async def poll():
+        if not await operation.done():
+            return False, None
+        exception = await operation.exception()
+        if exception is not None:
+            raise exception
+        return True, await operation.result()
+
+    return tracker.register(operation.operation.name, description, poll, on_done)
+
+def track_discovery_operation(api: str, operation: Dict[str, Any], get_operation_request: Callable[[str], Any], description: str, on_done: Optional[Callable[[Any], Any]] = None) -> TrackedOperation:
+    """Tracks a google.longrunning.Operation returned by a discovery-based client.
+
+    Args:
+        api: The name of the API the operation belongs to (e.g. 'developerconnect').
+        operation: The operation resource returned by the create call.
+        get_operation_request: A callable building the HttpRequest that fetches an operation by name.
+        description: A human readable description of what the operation does.
+        on_done: An optional (coroutine) function turning the finished operation into the reported result.
+
+    Returns:
+        The tracked operation.
+    """
+    name = operation["name"]
+    state = {"operation": operation}
+
+    async def poll():
+        # The create response already tells us whether the operation finished.
+        if not state["operation"].get("done"):
+            state["operation"] = await concurrency.execute(api, get_operation_request(name))
+        current = state["operation"]
+        if not current.get("done"):
+            return False, None
+        if "error" in current:
+            raise RuntimeError(current["error"])
+        return True, current
+
+    return tracker.register(name, description, poll, on_done)
+
+async def finish_or_track(operation: TrackedOperation, wait_for_completion: bool, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """Builds a tool response for a tracked operation.
+
+    Args:
+        operation: The tracked operation.
+        wait_for_completion: Whether to wait for the operation to finish.
+        ctx: The MCP context of the calling tool, used to send progress notifications while waiting.
+
+    Returns:
+        The operation result (or error) when waiting, otherwise a handle for the caller to follow up on.
+    """
+    if not wait_for_completion:
+        return {
+            "message": f"Started: {operation.description}. Use await_operation or get_operation_status to follow its progress.",
+            "operation_id": operation.operation_id,
+        }
+    status = await tracker.wait(operation, ctx=ctx)
+    if "error" in status:
+        return {"error": status["error"]}
+    return status["result"]
+
+@mcp.tool
+async def get_operation_status(operation_id: str) -> Dict[str, Any]:
+    """Gets the status of a long-running operation started by another tool.
+
+    Args:
+        operation_id: The operation ID returned by the tool that started the operation.
+
+    Returns:
+        A dictionary containing the operation status and, once done, its result or error.
+    """
+    operation = tracker.get(operation_id)
+    if operation is None:
+        return {"error": f"Unknown operation: {operation_id}"}
+    return operation.status()
+
+@mcp.tool
+async def await_operation(operation_id: str, timeout_seconds: float = 600, ctx: Context = None) -> Dict[str, Any]:
+    """Waits for a long-running operation started by another tool to finish.
+
+    Progress notifications are sent while waiting. If the timeout expires first,
+    the current status is returned and the operation keeps running.
+
+    Args:
+        operation_id: The operation ID returned by the tool that started the operation.
+        timeout_seconds: The maximum number of seconds to wait.
+
+    Returns:
+        A dictionary containing the operation status and, once done, its result or error.
+    """
+    operation = tracker.get(operation_id)
+    if operation is None:
+        return {"error": f"Unknown operation: {operation_id}"}
+    return await tracker.wait(operation, timeout=timeout_seconds, ctx=ctx)
@@ -0,0 +1,38 @@
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from fastmcp import Context
+
+DEFAULT_PAGE_SIZE = 50
+
+async def collect_pages(
+    fetch_page: Callable[[Optional[str]], Awaitable[Tuple[List[Any], Optional[str]]]],
+    page_token: Optional[str] = None,
+    max_pages: Optional[int] = 1,
+    ctx: Optional[Context] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """Fetches up to max_pages pages of a list call, starting at page_token.
+
+    A progress notification is sent after every page so clients can follow
+    long listings as they stream in.
+
+    Args:
+        fetch_page: A coroutine function taking a page token (None for the first
+            page) and returning (items, next_page_token).
+        page_token: The cursor to resume from, as returned by a previous call.
+        max_pages: The maximum number of pages to fetch, or None to fetch until the listing is exhausted.
+        ctx: The MCP context of the calling tool, used to send progress notifications.
+
+    Returns:
+        (items, next_page_token). next_page_token is None once the listing is exhausted.
+    """
+    items: List[Any] = []
+    token = page_token or None
+    pages = 0
+    while True:
+        page_items, token = await fetch_page(token)
+        items.extend(page_items)
+        pages += 1
+        if ctx is not None:
+            await ctx.report_progress(progress=pages, total=max_pages, message=f"Fetched page {pages} ({len(items)} items so far)")
+        if not token or (max_pages is not None and pages >= max_pages):
+            return items, token or None
@@ -0,0 +1,185 @@
+import collections
+import dataclasses
+import logging
+import os
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# Runtimes a pattern deploys to, recognized by how the pattern text names them.
+TARGET_NAMES = {"cloud_run": ("cloud run",), "gke": ("gke", "kubernetes engine")}
+# Score of each kind of match. Without filters, a pattern must match a trigger, style or keyword to be returned.
+TRIGGER_WEIGHT = 3.0
+STYLE_WEIGHT = 3.0
+KEYWORD_WEIGHT = 2.0
+# Score of each target the pattern deploys to, to break ties: most patterns name no runtime at all.
+TARGET_WEIGHT = 0.5
+# Score of each query word found in a pattern's name or description, to break ties.
+WORD_WEIGHT = 0.1
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or please should "
+    "that the this to use using what when where which with you your pipeline pipelines cicd ci cd".split()
+)
+
+def words(text: str) -> List[str]:
+    """Splits text into lowercase words, with '_' and '-' as separators and a plural 's' removed."""
+    return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in re.findall(r"[a-z0-9]+", text.lower())]
+
+def _phrase(value: str) -> FrozenSet[str]:
+    return frozenset(words(value)) - _STOPWORDS
+
+@dataclasses.dataclass(frozen=True)
+class Pattern:
+    """A CI/CD pattern parsed from a pattern file."""
+
+    name: str
+    description: str
+    triggers: FrozenSet[str]
+    deployment_style: str
+    keywords: Tuple[str, ...]
+    targets: FrozenSet[str]
+    component_types: FrozenSet[str]
+    source: str
+    text: str
+
+def _component_types(node) -> Set[str]:
+    types: Set[str] = set()
+    if isinstance(node, dict):
+        if isinstance(node.get("type"), str):
+            types.add(node["type"])
+        for value in node.values():
+            types |= _component_types(value)
+    elif isinstance(node, list):
+        for item in node:
+            types |= _component_types(item)
+    return types
+
+def parse_pattern(text: str, source: str = "") -> Pattern:
+    """Parses the text of a pattern file.
+
+    Raises:
+        ValueError: If the text is not a pattern with a name and an applicability section.
+    """
+    document = yaml.safe_load(text)
+    if not isinstance(document, dict) or "name" not in document or not isinstance(document.get("applicability"), dict):
+        raise ValueError(f"{source or 'Pattern'} has no name or applicability section.")
+    applicability = document["applicability"]
+    lowered = text.lower()
+    return Pattern(
+        name=str(document["name"]),
+        description=str(document.get("description", "")),
+        triggers=frozenset(str(trigger) for trigger in applicability.get("triggers") or []),
+        deployment_style=str(applicability.get("deployment_style", "")),
+        keywords=tuple(str(keyword) for keyword in applicability.get("use_case_keywords") or []),
+        targets=frozenset(target for target, names in TARGET_NAMES.items() if any(name in lowered for name in names)),
+        component_types=frozenset(_component_types(document.get("stages"))),
+        source=source,
+        text=text,
+    )
+
+class PatternCatalog:
+    """Patterns indexed by trigger, deployment style, target and use case keyword.
+
+    Searches combine explicit filters with facets recognized in free text and rank
+    the patterns by what they match, deterministically and without any remote call.
+    """
+
+    def __init__(self, patterns: Iterable[Pattern]):
+        self.patterns = sorted(patterns, key=lambda pattern: pattern.name)
+        self.by_trigger: Dict[str, Set[int]] = collections.defaultdict(set)
+        self.by_style: Dict[str, Set[int]] = collections.defaultdict(set)
+        self.by_target: Dict[str, Set[int]] = collections.defaultdict(set)
+        self.by_keyword: Dict[str, Set[int]] = collections.defaultdict(set)
+        for i, pattern in enumerate(self.patterns):
+            for trigger in pattern.triggers:
+                self.by_trigger[trigger].add(i)
+            self.by_style[pattern.deployment_style].add(i)
+            for target in pattern.targets:
+                self.by_target[target].add(i)
+            for keyword in pattern.keywords:
+                self.by_keyword[keyword.lower()].add(i)
+
+    @classmethod
+    def load(cls, directories: List[str]) -> "PatternCatalog":
+        """Parses the pattern files in directories, skipping (and logging) files that are not patterns."""
+        patterns = []
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if not os.path.isfile(path) or not name.endswith((".txt", ".yaml", ".yml")):
+                    continue
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        patterns.append(parse_pattern(f.read(), name))
+                except (OSError, ValueError, yaml.YAMLError) as e:
+                    logger.warning(f"Skipping pattern file {path}: {e}")
+        return cls(patterns)
+
+    def facets(self, text: str) -> Dict[str, Set[str]]:
+        """Returns the triggers, deployment styles, targets and keywords of the catalog named in free text.
+
+        A value is named when all its words occur in the text: 'git tag' names the
+        trigger 'git_tag', 'nightly builds' the keyword 'nightly builds'.
+        """
+        present = set(words(text))
+        for names in TARGET_NAMES.values():
+            if any(name in text.lower() for name in names):
+                present.update(words(names[0]))
+
+        def named(values: Iterable[str]) -> Set[str]:
+            return {value for value in values if _phrase(value) and _phrase(value) <= present}
+
+        return {
+            "triggers": named(self.by_trigger),
+            "deployment_styles": named(self.by_style),
+            "targets": named(self.by_target),
+            "keywords": named(self.by_keyword),
+        }
+
+    def search(self, text: str = "", triggers: Optional[List[str]] = None, deployment_style: Optional[str] = None,
+               targets: Optional[List[str]] = None, limit: int = 2) -> List[Tuple[float, Pattern]]:
+        """Ranks the patterns matching the filters by the facets they share with the query.
+
+        Args:
+            text: Free text describing the pipeline wanted.
+            triggers: Triggers every returned pattern must support, e.g. ['git_tag'].
+            deployment_style: The deployment style returned patterns must have, e.g. 'progressive_delivery'.
+            targets: Runtimes returned patterns must deploy to, e.g. ['gke']. Patterns naming no runtime match any.
+            limit: The maximum number of patterns to return.
+
+        Returns:
+            Up to limit (score, pattern) pairs, best first. Empty if no pattern matches
+            the filters or, without filters, if the text names no trigger, style or keyword
+            in the catalog; a named target alone does not select a pattern.
+        """
+        candidates = set(range(len(self.patterns)))
+        for trigger in triggers or []:
+            candidates &= self.by_trigger.get(trigger, set())
+        if deployment_style:
+            candidates &= self.by_style.get(deployment_style, set())
+        for target in targets or []:
+            candidates &= self.by_target.get(target, set()) | {i for i, pattern in enumerate(self.patterns) if not pattern.targets}
+        facets = self.facets(text)
+        query_words = set(words(text)) - _STOPWORDS
+        filtered = bool(triggers or deployment_style or targets)
+        results = []
+        for i in candidates:
+            pattern = self.patterns[i]
+            score = (
+                TRIGGER_WEIGHT * len(facets["triggers"] & pattern.triggers)
+                + STYLE_WEIGHT * (pattern.deployment_style in facets["deployment_styles"])
+                + KEYWORD_WEIGHT * len(facets["keywords"] & {keyword.lower() for keyword in pattern.keywords})
+            )
+            if score == 0 and not filtered:
+                continue
+            score += TARGET_WEIGHT * len((facets["targets"] | set(targets or [])) & pattern.targets)
+            score += WORD_WEIGHT * len(query_words & set(words(f"{pattern.name} {pattern.description}")))
+            results.append((score, pattern))
+        results.sort(key=lambda result: (-result[0], result[1].name))
+        return results[:limit]
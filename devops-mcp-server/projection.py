@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional
+
+# Pass as `fields` to get the full resource instead of its compact summary.
+FULL = "*"
+
+def parse_fields(fields: Optional[str], default: List[str]) -> Optional[List[str]]:
+    """Parses a comma-separated field mask.
+
+    Args:
+        fields: The mask requested by the caller, e.g. 'name,installationState.stage'.
+            None selects the default summary and '*' the full resource.
+        default: The fields of the resource's compact summary.
+
+    Returns:
+        The list of dotted field paths to keep, or None to keep everything.
+    """
+    if fields is None:
+        return default
+    if fields.strip() == FULL:
+        return None
+    return [path.strip() for path in fields.split(",") if path.strip()]
+
+def api_fields(paths: Optional[List[str]], collection: Optional[str] = None) -> Optional[str]:
+    """Builds the `fields` partial-response parameter for a discovery-based API call.
+
+    Args:
+        paths: The dotted field paths to request, or None for the full response.
+        collection: For list calls, the response field holding the resources (e.g. 'triggers').
+
+    Returns:
+        The partial-response mask, or None to request the full response.
+    """
+    if paths is None:
+        return None
+    selector = ",".join(path.replace(".", "/") for path in paths)
+    if collection is None:
+        return selector
+    return f"nextPageToken,{collection}({selector})"
+
+def project(resource: Any, paths: Optional[List[str]]) -> Any:
+    """Keeps only the given dotted field paths of a resource.
+
+    Lists along a path are projected element-wise, and missing fields are skipped.
+
+    Args:
+        resource: A JSON-like dictionary.
+        paths: The dotted field paths to keep, or None to keep everything.
+
+    Returns:
+        The projected resource.
+    """
+    if paths is None:
+        return resource
+    projected: Dict[str, Any] = {}
+    for path in paths:
+        _copy_path(resource, projected, path.split("."))
+    return projected
+
+def _copy_path(source: Any, target: Dict[str, Any], parts: List[str]):
+    if not isinstance(source, dict) or parts[0] not in source:
+        return
+    head, rest = parts[0], parts[1:]
+    value = source[head]
+    if not rest:
+        target[head] = value
+    elif isinstance(value, list):
+        existing = target.setdefault(head, [{} for _ in value])
+        for item, item_target in zip(value, existing):
+            _copy_path(item, item_target, rest)
+    else:
+        _copy_path(value, target.setdefault(head, {}), rest)
+
+def message_to_dict(message: Any) -> Dict[str, Any]:
+    """Converts a proto-plus message returned by a gRPC client to a JSON-like dictionary.
+
+    Fields left at their default value are omitted, and field names keep their snake_case spelling.
+    """
+    from google.protobuf import json_format
+
+    return json_format.MessageToDict(type(message).pb(message), preserving_proto_field_name=True)
+
+def summarize(resource: Any, fields: Optional[str], default: List[str]) -> Any:
+    """Projects a resource (a dictionary or a proto-plus message) onto the requested field mask.
+
+    Args:
+        resource: The resource to project.
+        fields: The mask requested by the caller; None selects the default summary and '*' the full resource.
+        default: The fields of the resource's compact summary.
+
+    Returns:
+        The projected resource as a JSON-like dictionary.
+    """
+    if not isinstance(resource, dict):
+        resource = message_to_dict(resource)
+    return project(resource, parse_fields(fields, default))
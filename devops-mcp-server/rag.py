@@ -1,13 +1,276 @@
 from app import mcp
-from vertexai import rag
+import asyncio
+import concurrency
+import hashlib
+import logging
+import metrics
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VERTEX_PROJECT = os.environ.get("VERTEX_PROJECT", "haroonc-exp")
+VERTEX_LOCATION = os.environ.get("VERTEX_LOCATION", "us-east4")
 
 RAG_PATTERNS_CORPUS_ID = os.environ.get("RAG_PATTERNS_CORPUS_ID", "projects/haroonc-exp/locations/us-east4/ragCorpora/5476377146882523136")
 RAG_KNOWLEDGE_CORPUS_ID = os.environ.get("RAG_KNOWLEDGE_CORPUS_ID", "projects/haroonc-exp/locations/us-east4/ragCorpora/2017612633061982208")
 
+# Where retrievals are served from: 'vertex' (the RAG Engine corpora) or 'local' (an in-process index).
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "vertex")
+_VERTEX_RAG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "vertex-rag")
+# Directories (separated by os.pathsep) with the source files of each corpus, for the local backend
+# and the lexical index of hybrid retrieval.
+RAG_PATTERNS_DIRS = os.environ.get("RAG_PATTERNS_DIRS", os.path.join(_VERTEX_RAG_DIR, "patterns")).split(os.pathsep)
+RAG_KNOWLEDGE_DIRS = os.environ.get("RAG_KNOWLEDGE_DIRS", os.path.join(_VERTEX_RAG_DIR, "knowledge")).split(os.pathsep)
+
+_CORPORA = {
+    "knowledge": (RAG_KNOWLEDGE_CORPUS_ID, RAG_KNOWLEDGE_DIRS),
+    "patterns": (RAG_PATTERNS_CORPUS_ID, RAG_PATTERNS_DIRS),
+}
+
+# Retrieved chunks must be at most this vector distance from the query.
+VECTOR_DISTANCE_THRESHOLD = 0.5
+# Corpora (comma-separated) whose retrievals fuse vector search with BM25 keyword search.
+RAG_HYBRID_CORPORA = [name for name in os.environ.get("RAG_HYBRID_CORPORA", "knowledge").split(",") if name]
+# Chunks each retriever contributes to fusion and reranking.
+RAG_HYBRID_CANDIDATES = int(os.environ.get("RAG_HYBRID_CANDIDATES", "10"))
+# Milliseconds a hybrid retrieval may take. Vector results arriving later are left out in favour of
+# keyword results, and reranking only happens if there is time left.
+RAG_RETRIEVAL_BUDGET_MS = float(os.environ.get("RAG_RETRIEVAL_BUDGET_MS", "3000"))
+# How often the file list of a corpus is checked for changes that invalidate cached retrievals.
+CORPUS_VERSION_CHECK_SECONDS = float(os.environ.get("RAG_CORPUS_VERSION_CHECK", "300"))
+
+# Chunks returned per query and corpus by query_knowledge_batch, as by the single-query tools.
+_BATCH_TOP_K = {"knowledge": 3, "patterns": 2}
+
+_corpus_versions: Dict[str, Tuple[float, str]] = {}
+_pattern_catalog = None
+_local_indexes: Dict[str, Any] = {}
+_lexical_indexes: Dict[str, Tuple[float, Optional[Tuple[str, Any, List[str]]]]] = {}
+_vertexai_lock = threading.Lock()
+_vertexai_initialized = False
+
+def _get_rag():
+    """Imports the Vertex AI SDK and initializes it on first use.
+
+    The SDK takes seconds to import, so it is kept off the server's startup path.
+
+    Returns:
+        The vertexai.rag module.
+    """
+    global _vertexai_initialized
+    with _vertexai_lock:
+        import vertexai
+        from vertexai import rag
+
+        if not _vertexai_initialized:
+            logger.info("Initializing Vertex AI...")
+            vertexai.init(project=VERTEX_PROJECT, location=VERTEX_LOCATION)
+            _vertexai_initialized = True
+            logger.info("Vertex AI Initialized.")
+    return rag
+
+def load_pattern_catalog():
+    """Gets the catalog of the pattern files in RAG_PATTERNS_DIRS, parsing them on first use.
+
+    Returns:
+        The pattern_catalog.PatternCatalog; empty if no pattern files are present.
+    """
+    global _pattern_catalog
+    if _pattern_catalog is None:
+        import pattern_catalog
+
+        _pattern_catalog = pattern_catalog.PatternCatalog.load(RAG_PATTERNS_DIRS)
+        if _pattern_catalog.patterns:
+            logger.info(f"Loaded {len(_pattern_catalog.patterns)} patterns into the pattern catalog.")
+        else:
+            logger.warning(f"No pattern files found in {RAG_PATTERNS_DIRS}; every pattern lookup will be retrieved from the '{RAG_BACKEND}' backend.")
+    return _pattern_catalog
+
+async def _corpus_version(rag, corpus_id: str) -> str:
+    """Returns a fingerprint of a corpus's files, re-checked every CORPUS_VERSION_CHECK_SECONDS.
+
+    Uploading or deleting files changes the fingerprint, which retires cached retrievals of the corpus.
+    """
+    checked = _corpus_versions.get(corpus_id)
+    if checked is not None and time.monotonic() - checked[0] < CORPUS_VERSION_CHECK_SECONDS:
+        return checked[1]
+    try:
+        names = await concurrency.call_blocking(
+            'vertexai', lambda: sorted(rag_file.name for rag_file in rag.list_files(corpus_name=corpus_id)), idempotent=True
+        )
+        version = hashlib.sha1("\n".join(names).encode()).hexdigest()[:12]
+    except Exception as e:
+        logger.warning(f"Could not check the version of RAG corpus {corpus_id}: {e}")
+        version = checked[1] if checked is not None else "unknown"
+    _corpus_versions[corpus_id] = (time.monotonic(), version)
+    return version
+
+async def _retrieve(corpus: str, text: str, top_k: int) -> List[str]:
+    """Retrieves the texts of the chunks of a corpus most relevant to a query.
+
+    Args:
+        corpus: The corpus to search: 'knowledge' or 'patterns'.
+        text: The query.
+        top_k: The maximum number of chunks to return.
+
+    Returns:
+        The chunk texts, most relevant first.
+    """
+    if corpus in RAG_HYBRID_CORPORA:
+        return await _retrieve_hybrid(corpus, text, top_k)
+    return await _retrieve_vector(corpus, text, top_k)
+
+async def _retrieve_hybrid(corpus: str, text: str, top_k: int) -> List[str]:
+    """Fuses vector and BM25 retrievals by reciprocal rank and reranks the result, within the latency budget.
+
+    Exact terms such as 'kaniko' or API field names are often missed by vector
+    search alone. Without local source files to index, this is plain vector retrieval.
+    """
+    import hybrid
+
+    deadline = time.monotonic() + RAG_RETRIEVAL_BUDGET_MS / 1000
+    candidates = max(top_k, RAG_HYBRID_CANDIDATES)
+    vector = asyncio.ensure_future(_retrieve_vector(corpus, text, candidates))
+    # A vector retrieval left behind still completes, e.g. to cache its result.
+    vector.add_done_callback(lambda done: done.cancelled() or done.exception())
+    try:
+        lexical = await _lexical_search(corpus, text, candidates)
+    except Exception as e:
+        logger.warning(f"Keyword search of the {corpus} corpus failed: {e}")
+        lexical = []
+    if not lexical:
+        return (await vector)[:top_k]
+    try:
+        rankings = [await asyncio.wait_for(asyncio.shield(vector), max(deadline - time.monotonic(), 0)), lexical]
+    except asyncio.TimeoutError:
+        metrics.increment("rag.vector_timeout")
+        rankings = [lexical]
+    except Exception as e:
+        logger.warning(f"Vector search of the {corpus} corpus failed, using keyword results only: {e}")
+        rankings = [lexical]
+    fused = hybrid.reciprocal_rank_fusion(rankings)[:candidates]
+    reranked = await hybrid.rerank(VERTEX_PROJECT, text, fused, top_k, deadline)
+    return (reranked or fused)[:top_k]
+
+def _load_lexical_index(corpus: str, previous: Optional[Tuple[str, Any, List[str]]]) -> Optional[Tuple[str, Any, List[str]]]:
+    """Builds a BM25 index over the chunks of a corpus's source files, unless they are unchanged since the previous one.
+
+    Returns:
+        (files fingerprint, BM25 index, chunk texts), or None if there are no source files.
+    """
+    import bm25
+    import local_index
+
+    files = local_index.corpus_files(_CORPORA[corpus][1])
+    if not files:
+        logger.warning(f"No source files of the {corpus} corpus found in {_CORPORA[corpus][1]}; its hybrid retrievals only use vector search.")
+        return None
+    version = local_index.fingerprint(files, str(local_index.RAG_CHUNK_CHARS))
+    if previous is not None and previous[0] == version:
+        return previous
+    texts = [chunk["text"] for chunk in local_index.read_chunks(files)]
+    return version, bm25.BM25(texts), texts
+
+async def _lexical_search(corpus: str, text: str, top_k: int) -> List[str]:
+    """Returns the texts of the chunks best matching the query's terms, or nothing if the corpus has no local files."""
+    checked = _lexical_indexes.get(corpus)
+    lexical = checked[1] if checked is not None else None
+    if checked is None or time.monotonic() - checked[0] >= CORPUS_VERSION_CHECK_SECONDS:
+        lexical = await concurrency.run_blocking('rag_index', _load_lexical_index, corpus, lexical)
+        _lexical_indexes[corpus] = (time.monotonic(), lexical)
+    if lexical is None:
+        return []
+    _, index, texts = lexical
+    return [texts[i] for _, i in index.search(text, top_k)]
+
+async def _search_patterns(text: str, top_k: int, triggers: Optional[List[str]] = None,
+                           deployment_style: Optional[str] = None, targets: Optional[List[str]] = None) -> List[str]:
+    """Returns the texts of the catalog patterns best matching a query, or retrieves them if the catalog matches none."""
+    matches = load_pattern_catalog().search(text, triggers, deployment_style, targets, limit=top_k)
+    if matches:
+        return [pattern.text for _, pattern in matches]
+    return await _retrieve("patterns", text, top_k)
+
+async def _retrieve_vector(corpus: str, text: str, top_k: int) -> List[str]:
+    """Retrieves the texts of the chunks of a corpus most relevant to a query from the configured vector backend.
+
+    Args:
+        corpus: The corpus to search: 'knowledge' or 'patterns'.
+        text: The query.
+        top_k: The maximum number of chunks to return.
+
+    Returns:
+        The chunk texts, most relevant first.
+    """
+    if RAG_BACKEND == "local":
+        return await _retrieve_local(corpus, text, top_k)
+    if RAG_BACKEND == "vertex":
+        return await _retrieve_vertex(_CORPORA[corpus][0], text, top_k)
+    raise ValueError(f"Unknown RAG_BACKEND: {RAG_BACKEND!r}. Use 'vertex' or 'local'.")
+
+async def _local_index(corpus: str):
+    """Gets the local index of a corpus, loading or rebuilding it when its files may have changed."""
+    import embeddings
+    import local_index
+
+    index = _local_indexes.get(corpus)
+    if index is None:
+        if embeddings.RAG_EMBEDDER == "vertex":
+            await concurrency.run_blocking('vertexai', _get_rag)
+        index = _local_indexes[corpus] = local_index.LocalIndex(corpus, _CORPORA[corpus][1], embeddings.get_embedder())
+    checked = _corpus_versions.get(corpus)
+    if checked is None or time.monotonic() - checked[0] >= CORPUS_VERSION_CHECK_SECONDS:
+        # Loading reads the corpus files and embeds them if the index is stale, which can take a while.
+        await concurrency.run_blocking('vertexai', index.load)
+        _corpus_versions[corpus] = (time.monotonic(), index.version)
+    return index
+
+async def _retrieve_local(corpus: str, text: str, top_k: int) -> List[str]:
+    import embeddings
+
+    index = await _local_index(corpus)
+    # Searching is one matrix-vector product; only embedding the query with a remote model blocks.
+    if isinstance(index.embedder, embeddings.HashingEmbedder):
+        results = index.search(text, top_k)
+    else:
+        results = await concurrency.run_blocking('vertexai', index.search, text, top_k)
+    return [chunk["text"] for _, chunk in results]
+
+async def _retrieve_vertex(corpus_id: str, text: str, top_k: int) -> List[str]:
+    """Retrieves chunks from a RAG Engine corpus, serving repeats from the cache."""
+    import rag_cache
+
+    rag = await concurrency.run_blocking('vertexai', _get_rag)
+    version = await _corpus_version(rag, corpus_id)
+    cache_key = f"{corpus_id}?top_k={top_k}"
+    hit, contexts = rag_cache.cache.get(cache_key, version, text)
+    if hit:
+        return contexts
+    rag_retrieval_config = rag.RagRetrievalConfig(
+        top_k=top_k,
+        filter=rag.Filter(vector_distance_threshold=VECTOR_DISTANCE_THRESHOLD),
+    )
+    response = await concurrency.call_blocking(
+        'vertexai',
+        rag.retrieval_query,
+        rag_resources=[
+            rag.RagResource(
+                rag_corpus=corpus_id,
+            )
+        ],
+        text=text,
+        rag_retrieval_config=rag_retrieval_config,
+        idempotent=True,
+    )
+    contexts = [context.text for context in response.contexts.contexts]
+    rag_cache.cache.put(cache_key, version, text, contexts)
+    return contexts
+
 @mcp.tool
-def query_knowledge(query: str) -> str:
+async def query_knowledge(query: str) -> str:
     """Queries the knowledge base for information on how to build and manage CI/CD pipelines.
 
     Args:
@@ -17,58 +280,84 @@ def query_knowledge(query: str) -> str:
         The response from the retrieval query.
     """
     try:
-        rag_retrieval_config = rag.RagRetrievalConfig(
-            top_k=3,  # Optional
-            filter=rag.Filter(vector_distance_threshold=0.5),  # Optional
-        )
-        response = rag.retrieval_query(
-            rag_resources=[
-                rag.RagResource(
-                    rag_corpus=RAG_KNOWLEDGE_CORPUS_ID,
-                )
-            ],
-            text=query,
-            rag_retrieval_config=rag_retrieval_config,
-        )
+        contexts = await _retrieve("knowledge", query, top_k=3)
         knowledge = ""
 
-        for i, context in enumerate(response.contexts.contexts):
-            knowledge += f'knowledge {i}: {context.text} \n\n'
+        for i, text in enumerate(contexts):
+            knowledge += f'knowledge {i}: {text} \n\n'
 
         return knowledge
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool
-def search_common_cicd_patterns(keywords: str) -> str:
+async def search_common_cicd_patterns(keywords: str, triggers: Optional[List[str]] = None,
+                                      deployment_style: Optional[str] = None, targets: Optional[List[str]] = None) -> str:
     """Searches for common CI/CD patterns and best practices.
 
+    Patterns are selected from the pattern catalog by the triggers, deployment
+    styles, targets and use case keywords they declare. Keywords naming none of
+    them are searched for in the patterns corpus instead.
+
     Args:
         keywords: The keywords to search for in the CI/CD patterns.
+        triggers: Triggers the pattern must support, e.g. ['git_tag'] or ['schedule'].
+        deployment_style: The deployment style the pattern must have, e.g. 'progressive_delivery'.
+        targets: Runtimes the pattern must deploy to: 'cloud_run' and/or 'gke'.
 
     Returns:
         The response from the retrieval query.
     """
     try:
-        rag_retrieval_config = rag.RagRetrievalConfig(
-            top_k=2,  # Optional
-            filter=rag.Filter(vector_distance_threshold=0.5),  # Optional
-        )
-        response = rag.retrieval_query(
-            rag_resources=[
-                rag.RagResource(
-                    rag_corpus=RAG_PATTERNS_CORPUS_ID,
-                )
-            ],
-            text=keywords,
-            rag_retrieval_config=rag_retrieval_config,
-        )
+        contexts = await _search_patterns(keywords, top_k=2, triggers=triggers, deployment_style=deployment_style, targets=targets)
         patterns = ""
 
-        for i, context in enumerate(response.contexts.contexts):
-            patterns += f'Pattern {i}: {context.text} \n\n'
+        for i, text in enumerate(contexts):
+            patterns += f'Pattern {i}: {text} \n\n'
 
         return patterns
     except Exception as e:
         return {"error": str(e)}
 
+@mcp.tool
+async def query_knowledge_batch(queries: List[str], corpora: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Queries the knowledge base and the CI/CD patterns for several queries at once.
+
+    Use this instead of calling query_knowledge once per component of a plan. Queries
+    differing only in case, punctuation or spacing are retrieved once, and all
+    retrievals run concurrently.
+
+    Args:
+        queries: The queries, e.g. one per component of a plan.
+        corpora: The corpora to search: 'knowledge' and/or 'patterns'. Defaults to both.
+
+    Returns:
+        A dictionary mapping each query to its results per corpus, e.g.
+        {"How do I implement a component of type 'cloud-build'?": {"knowledge": [...], "patterns": [...]}}.
+        A query whose retrieval failed maps to {"error": ...}.
+    """
+    try:
+        import rag_cache
+
+        corpora = corpora or list(_BATCH_TOP_K)
+        unknown = [corpus for corpus in corpora if corpus not in _BATCH_TOP_K]
+        if unknown:
+            return {"error": f"Unknown corpora: {unknown}. Use 'knowledge' and/or 'patterns'."}
+        distinct: Dict[str, str] = {}
+        for query in queries:
+            distinct.setdefault(rag_cache.normalize(query), query)
+
+        async def retrieve(query: str) -> Dict[str, Any]:
+            try:
+                results = await asyncio.gather(*(
+                    _search_patterns(query, _BATCH_TOP_K[corpus]) if corpus == "patterns" else _retrieve(corpus, query, _BATCH_TOP_K[corpus])
+                    for corpus in corpora
+                ))
+                return dict(zip(corpora, results))
+            except Exception as e:
+                return {"error": str(e)}
+
+        results = dict(zip(distinct, await asyncio.gather(*(retrieve(query) for query in distinct.values()))))
+        return {query: results[rag_cache.normalize(query)] for query in queries}
+    except Exception as e:
+        return {"error": str(e)}
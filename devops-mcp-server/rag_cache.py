@@ -0,0 +1,98 @@
+import collections
+import os
+import re
+import threading
+import time
+from typing import Any, Tuple
+
+import numpy as np
+
+import metrics
+from embeddings import HashingEmbedder
+
+# Seconds a cached retrieval stays valid even if the corpus does not change.
+RAG_CACHE_TTL = float(os.environ.get("RAG_CACHE_TTL", "3600"))
+# Maximum number of cached retrievals across corpora; the least recently used are evicted first.
+RAG_CACHE_MAX_ENTRIES = int(os.environ.get("RAG_CACHE_MAX_ENTRIES", "512"))
+# Minimum cosine similarity for a cached retrieval to answer a differently worded query.
+RAG_CACHE_SIMILARITY = float(os.environ.get("RAG_CACHE_SIMILARITY", "0.8"))
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or please should "
+    "that the this to use using what when where which with you your".split()
+)
+
+def normalize(query: str) -> str:
+    """Normalizes query text so that differences in case, punctuation and spacing do not matter."""
+    return " ".join(re.sub(r"[^\w\s.-]", " ", query.lower()).split()).strip(" .")
+
+def _content_words(text: str) -> frozenset:
+    return frozenset(word.rstrip("s") for word in text.split() if word not in _STOPWORDS)
+
+class RetrievalCache:
+    """An LRU cache of retrieval results per corpus and corpus version.
+
+    Lookups first match the normalized query text exactly, then fall back to the most
+    similar cached query of the same corpus if its embedding is close enough. Queries
+    that differ in a single term ('cloud-build' and 'cloud-deploy') can embed very
+    closely, so a similar query must also share the same content words; rewording,
+    reordering and stopwords may differ.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, similarity: float, embedder=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embedder = embedder or HashingEmbedder()
+        # (corpus, version, normalized query) -> (expires_at, embedding, result)
+        self._entries: "collections.OrderedDict[Tuple[str, str, str], Tuple[float, np.ndarray, Any]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, corpus: str, version: str, query: str) -> Tuple[bool, Any]:
+        """Returns (True, result) for a cached retrieval of the query or a near-duplicate, otherwise (False, None)."""
+        key = (corpus, version, normalize(query))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                metrics.increment("rag_cache.hit")
+                return True, entry[2]
+            words = _content_words(key[2])
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if k[:2] == key[:2] and e[0] > now and _content_words(k[2]) == words
+            ]
+        if candidates:
+            query_vector = self.embedder.embed([key[2]])[0]
+            scores = np.stack([entry[1] for _, entry in candidates]) @ query_vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity:
+                with self._lock:
+                    if candidates[best][0] in self._entries:
+                        self._entries.move_to_end(candidates[best][0])
+                metrics.increment("rag_cache.similar_hit")
+                return True, candidates[best][1][2]
+        metrics.increment("rag_cache.miss")
+        return False, None
+
+    def put(self, corpus: str, version: str, query: str, result: Any):
+        """Caches the result of retrieving a query from a version of a corpus."""
+        text = normalize(query)
+        vector = self.embedder.embed([text])[0]
+        with self._lock:
+            # Results of earlier corpus versions can no longer be served.
+            for stale in [k for k in self._entries if k[0] == corpus and k[1] != version]:
+                del self._entries[stale]
+            key = (corpus, version, text)
+            self._entries[key] = (time.monotonic() + self.ttl, vector, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every cached retrieval."""
+        with self._lock:
+            self._entries.clear()
+
+cache = RetrievalCache(RAG_CACHE_MAX_ENTRIES, RAG_CACHE_TTL, RAG_CACHE_SIMILARITY)
@@ -0,0 +1,159 @@
+import asyncio
+import email.utils
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Sustained requests per second sent to each API. Override for a single API with
+# DEVOPS_MCP_RATE_LIMIT_<API>, e.g. DEVOPS_MCP_RATE_LIMIT_CLOUDRESOURCEMANAGER=5; 0 disables the limit.
+DEFAULT_RATE_LIMIT = float(os.environ.get("DEVOPS_MCP_RATE_LIMIT", "10"))
+# Requests that may be sent at once before the rate limit applies.
+RATE_BURST = float(os.environ.get("DEVOPS_MCP_RATE_BURST", "20"))
+# Attempts made for a call that keeps failing with retryable errors.
+RETRY_ATTEMPTS = int(os.environ.get("DEVOPS_MCP_RETRY_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = 0.5
+# Longest wait between attempts; a Retry-After beyond this fails the call instead of stalling it.
+RETRY_MAX_DELAY = float(os.environ.get("DEVOPS_MCP_RETRY_MAX_DELAY", "30"))
+
+# Status codes worth retrying when repeating the call is safe.
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+# Error reasons Google APIs use for per-minute rate limits, which they may report as 403.
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "RATE_LIMIT_EXCEEDED"}
+
+def rate_limit(api: str) -> float:
+    """Returns the configured sustained requests per second for an API, or 0 for no limit."""
+    return float(os.environ.get(f"DEVOPS_MCP_RATE_LIMIT_{api.upper()}", DEFAULT_RATE_LIMIT))
+
+class TokenBucket:
+    """A token bucket spacing out requests on the event loop."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> bool:
+        """Waits until a request may be sent and returns whether it had to wait."""
+        if self.rate <= 0:
+            return False
+        waited = False
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return waited
+            waited = True
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+_buckets: Dict[str, TokenBucket] = {}
+
+def bucket(api: str) -> TokenBucket:
+    """Gets the token bucket rate limiting calls to an API."""
+    api_bucket = _buckets.get(api)
+    if api_bucket is None:
+        api_bucket = _buckets[api] = TokenBucket(rate_limit(api), RATE_BURST)
+    return api_bucket
+
+def _status(error: Exception) -> Optional[int]:
+    """Returns the HTTP status of an API error raised by googleapiclient or google-api-core, if any."""
+    resp = getattr(error, "resp", None)
+    if resp is not None and getattr(resp, "status", None) is not None:
+        return int(resp.status)
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+def _is_rate_limited(error: Exception, status: Optional[int]) -> bool:
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    content = getattr(error, "content", None)
+    try:
+        details = json.loads(content).get("error", {}) if content else {}
+    except (ValueError, AttributeError):
+        return False
+    reasons = {item.get("reason") for item in details.get("errors", [])}
+    reasons.update(item.get("reason") for item in details.get("details", []) if isinstance(item, dict))
+    return bool(reasons & RATE_LIMIT_REASONS)
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Returns how many seconds the server asked the client to wait before retrying, if it said so.
+
+    Reads the Retry-After header of HTTP errors and the RetryInfo detail of gRPC errors.
+    """
+    resp = getattr(error, "resp", None)
+    value = resp.get("retry-after") if hasattr(resp, "get") else None
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                return None
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    return None
+
+def is_retryable(error: Exception, idempotent: bool) -> bool:
+    """Returns whether a failed call may be retried.
+
+    Rate limit errors mean the request was rejected before it was processed, so any
+    call may be retried. Server errors and dropped connections are only retried for
+    idempotent calls, as the request may already have taken effect.
+    """
+    status = _status(error)
+    if _is_rate_limited(error, status):
+        return True
+    if not idempotent:
+        return False
+    return status in TRANSIENT_STATUSES or (status is None and isinstance(error, (ConnectionError, TimeoutError)))
+
+def backoff(attempt: int) -> float:
+    """Returns a jittered exponential delay before retry number `attempt` (starting at 1)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+async def submit(api: str, attempt: Callable[[], Awaitable[Any]], idempotent: bool = False) -> Any:
+    """Runs an API call under the API's rate limit, retrying retryable errors.
+
+    Args:
+        api: The name of the API the call is made against (e.g. 'cloudbuild').
+        attempt: A coroutine function making one attempt of the call.
+        idempotent: Whether repeating the call is safe if an attempt failed part-way.
+
+    Returns:
+        The result of the first successful attempt.
+
+    Raises:
+        Exception: The error of the last attempt, once it is not retryable or attempts are exhausted.
+    """
+    for number in range(1, RETRY_ATTEMPTS + 1):
+        if await bucket(api).acquire():
+            metrics.increment(f"scheduler.{api}.throttled")
+        try:
+            return await attempt()
+        except Exception as e:
+            if _is_rate_limited(e, _status(e)):
+                metrics.increment(f"scheduler.{api}.rate_limited")
+            if not is_retryable(e, idempotent):
+                raise
+            requested = retry_after(e)
+            if number == RETRY_ATTEMPTS or (requested is not None and requested > RETRY_MAX_DELAY):
+                metrics.increment(f"scheduler.{api}.retries_exhausted")
+                raise
+            delay = requested if requested is not None else backoff(number)
+            metrics.increment(f"scheduler.{api}.retried")
+            logger.warning(f"{api} call failed ({e}); retrying in {delay:.1f}s (attempt {number + 1} of {RETRY_ATTEMPTS}).")
+            await asyncio.sleep(delay)
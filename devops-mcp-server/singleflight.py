@@ -0,0 +1,47 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+import metrics
+
+class Group:
+    """Coalesces concurrent identical calls so they share one execution and its result.
+
+    Only use it for reads: every caller gets the result of whichever call was
+    already in flight for the same key.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs fn, or waits for the identical call already in flight.
+
+        The call runs as its own task, so a caller that is cancelled does not
+        cancel it for the others. Every caller, including the one that started
+        the call, gets its own deep copy of the result, so none of them can see
+        another's changes to it. Results must therefore be plain data.
+
+        Args:
+            key: What identifies identical calls, e.g. the API method and its normalized arguments.
+            fn: A coroutine function making the call.
+
+        Returns:
+            The result of the call.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            metrics.increment(f"singleflight.{self.name}.coalesced")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the outcome as retrieved even if every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
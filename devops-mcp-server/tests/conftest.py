@@ -0,0 +1,49 @@
+import datetime
+import json
+
+import google.auth
+import httplib2
+import pytest
+from google.oauth2.credentials import Credentials
+
+import clients
+import deployment_store
+import discovery_cache
+
+
+class FakeHttp:
+    """Answers googleapiclient requests with handler(method, uri, body) -> (status, JSON response)."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.requests.append((method, uri))
+        status, payload = self.handler(method, uri, json.loads(body) if body else None)
+        return httplib2.Response({"status": status}), json.dumps(payload).encode()
+
+
+@pytest.fixture
+def google_api(monkeypatch, tmp_path):
+    """Routes discovery-based API requests to a handler instead of Google; returns a function installing it."""
+    credentials = Credentials(token="token", expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=1))
+    monkeypatch.setattr(google.auth, "default", lambda **kwargs: (credentials, "test-project"))
+    monkeypatch.setattr(clients, "_credentials", {})
+    monkeypatch.setattr(clients, "_credential_locks", {})
+    monkeypatch.setattr(discovery_cache, "DISCOVERY_CACHE_DIR", str(tmp_path / "discovery"))
+
+    def install(handler):
+        http = FakeHttp(handler)
+        monkeypatch.setattr(clients, "get_authorized_http", lambda *args, **kwargs: http)
+        return http
+
+    return install
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    """Replaces the deployment store with an empty one for the test."""
+    fresh = deployment_store.DeploymentStore(str(tmp_path / "deployments.sqlite3"), max_detail_bytes=1 << 20)
+    monkeypatch.setattr(deployment_store, "store", fresh)
+    return fresh
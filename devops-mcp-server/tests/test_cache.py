@@ -0,0 +1,46 @@
+import asyncio
+
+import cache
+
+
+def test_read_through_caches_until_invalidated():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"triggers": len(calls)}
+
+    async def run():
+        first = await cache.read_through("test_tool", "p", "l", loader)
+        second = await cache.read_through("test_tool", "p", "l", loader)
+        cache.invalidate("test_tool", "p")
+        third = await cache.read_through("test_tool", "p", "l", loader)
+        return first, second, third
+
+    assert asyncio.run(run()) == ({"triggers": 1}, {"triggers": 1}, {"triggers": 2})
+
+
+def test_errors_are_not_cached_and_bypass_reloads():
+    results = iter([{"error": "boom"}, {"ok": 1}, {"ok": 2}])
+
+    async def loader():
+        return next(results)
+
+    async def run():
+        error = await cache.read_through("error_tool", "p", None, loader)
+        ok = await cache.read_through("error_tool", "p", None, loader)
+        fresh = await cache.read_through("error_tool", "p", None, loader, bypass_cache=True)
+        cached = await cache.read_through("error_tool", "p", None, loader)
+        return error, ok, fresh, cached
+
+    assert asyncio.run(run()) == ({"error": "boom"}, {"ok": 1}, {"ok": 2}, {"ok": 2})
+
+
+def test_lru_eviction():
+    lru = cache.TTLCache(max_entries=2)
+    lru.set(("a",), 1, ttl=60)
+    lru.set(("b",), 2, ttl=60)
+    lru.get(("a",))
+    lru.set(("c",), 3, ttl=60)
+    assert lru.get(("b",)) == (False, None)
+    assert lru.get(("a",)) == (True, 1)
@@ -0,0 +1,27 @@
+import asyncio
+
+from google.cloud import deploy_v1
+from google.cloud.deploy_v1.services.cloud_deploy import pagers
+
+import cloud_deploy
+
+
+def test_identical_concurrent_list_calls_share_the_first_page():
+    requests = []
+
+    async def list_targets(request):
+        requests.append(request)
+        await asyncio.sleep(0.01)
+        response = deploy_v1.ListTargetsResponse(targets=[deploy_v1.Target(name="targets/dev")], next_page_token="more")
+        return pagers.ListTargetsAsyncPager(method=list_targets, request=deploy_v1.ListTargetsRequest(request), response=response)
+
+    async def run():
+        return await asyncio.gather(*(
+            cloud_deploy._list_names(list_targets, "projects/p/locations/l", "targets", "targets", 10, None, 1, None, None, None)
+            for _ in range(2)
+        ))
+
+    first, second = asyncio.run(run())
+
+    assert first == second == {"targets": ["targets/dev"], "next_page_token": "more"}
+    assert len(requests) == 1
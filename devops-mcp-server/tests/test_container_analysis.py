@@ -0,0 +1,54 @@
+import container_analysis
+
+
+def _record(cve, severity, fix_available=False):
+    return {"cve": cve, "severity": severity, "cvss_score": None, "fix_available": fix_available, "packages": []}
+
+
+def test_occurrences_flatten_to_compact_records_preferring_the_effective_severity():
+    occurrence = {
+        "noteName": "projects/goog-vulnz/notes/CVE-2024-1",
+        "vulnerability": {
+            "severity": "MEDIUM",
+            "effectiveSeverity": "HIGH",
+            "cvssScore": 7.5,
+            "fixAvailable": True,
+            "packageIssue": [{"affectedPackage": "openssl", "affectedVersion": {"fullName": "3.0.1"}, "fixedVersion": {"fullName": "3.0.2"}}],
+        },
+    }
+
+    assert container_analysis._vulnerability(occurrence) == {
+        "cve": "CVE-2024-1",
+        "severity": "HIGH",
+        "cvss_score": 7.5,
+        "fix_available": True,
+        "description": None,
+        "packages": [{"name": "openssl", "version": "3.0.1", "fixed_version": "3.0.2"}],
+    }
+    assert container_analysis._vulnerability({"noteName": "notes/CVE-2"})["severity"] == "SEVERITY_UNSPECIFIED"
+
+
+def test_compare_diffs_by_cve_and_reports_escalations_past_the_threshold_as_severity_changes():
+    base = [_record("CVE-1", "LOW"), _record("CVE-2", "HIGH"), _record("CVE-3", "CRITICAL"), _record("CVE-5", "MEDIUM")]
+    target = [
+        _record("CVE-1", "CRITICAL"),
+        _record("CVE-2", "HIGH"),
+        _record("CVE-2", "LOW"),  # the most severe record of a repeated CVE is kept
+        _record("CVE-4", "HIGH", fix_available=True),
+        _record("CVE-6", "LOW"),
+    ]
+
+    assert container_analysis._by_cve(target)["CVE-2"]["severity"] == "HIGH"
+
+    diff = container_analysis._compare(base, target, min_severity="HIGH")
+
+    assert diff["added"] == [{"cve": "CVE-4", "severity": "HIGH", "fix_available": True}]
+    assert diff["removed"] == [{"cve": "CVE-3", "severity": "CRITICAL", "fix_available": False}]
+    assert diff["unchanged"] == ["CVE-1", "CVE-2"]
+    assert diff["severity_changed"] == [{"cve": "CVE-1", "from": "LOW", "to": "CRITICAL"}]
+    assert diff["severity_delta"] == {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 0, "LOW": 0, "MINIMAL": 0, "SEVERITY_UNSPECIFIED": 0}
+
+    unfiltered = container_analysis._compare(base, target)
+    assert [v["cve"] for v in unfiltered["added"]] == ["CVE-4", "CVE-6"]
+    assert [v["cve"] for v in unfiltered["removed"]] == ["CVE-3", "CVE-5"]
+    assert unfiltered["severity_delta"]["MEDIUM"] == -1 and unfiltered["severity_delta"]["LOW"] == 0
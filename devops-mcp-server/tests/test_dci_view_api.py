@@ -0,0 +1,76 @@
+import asyncio
+
+import dci_view_api
+
+PARENT = "projects/p/locations/us-central1/insightsConfigs/ic"
+RUNTIME = "//run.googleapis.com/projects/p/locations/us-central1/services/web"
+
+
+def _event(number, state="STATE_INACTIVE", runtime=RUNTIME):
+    return {
+        "name": f"{PARENT}/deploymentEvents/e{number}",
+        "deployTime": f"2025-06-01T{number // 60:02d}:{number % 60:02d}:00Z",
+        "state": state,
+        "runtimeConfig": {"uri": runtime},
+        "artifactDeployments": [{"artifactReference": f"img@sha256:{number:064x}"}],
+    }
+
+
+def test_compare_deployments_covers_a_range_followed_by_many_later_deployments(store):
+    events = [_event(number) for number in range(1, 131)]
+    store.upsert_events(PARENT, events)
+    store.mark_synced(PARENT, None)
+    for event in events:
+        store.put_detail(event["name"], "diff", {"artifactDiffs": {}})
+
+    result = asyncio.run(dci_view_api.compare_deployments("ic", "us-central1", "p", to_deployment_id="e8", from_deployment_id="e5"))
+
+    assert [step["name"].rsplit("/", 1)[-1] for step in result["deployments"]] == ["e6", "e7", "e8"]
+    assert result["from"].endswith("/e5") and result["to"].endswith("/e8")
+
+    too_wide = asyncio.run(dci_view_api.compare_deployments("ic", "us-central1", "p", to_deployment_id="e125", from_deployment_id="e2"))
+    assert "narrower range" in too_wide["error"]
+
+
+def test_deployment_event_tools_fall_back_to_gcloud_when_the_api_fails(google_api, store, monkeypatch):
+    http = google_api(lambda method, uri, body: (400, {"error": {"code": 400, "message": "API not enabled"}}))
+    commands = []
+
+    def run_gcloud(command_args):
+        commands.append(command_args)
+        return [_event(2), _event(1)] if "list" in command_args else _event(1)
+
+    monkeypatch.setattr(dci_view_api, "_run_gcloud_command", run_gcloud)
+
+    listed = asyncio.run(dci_view_api.list_deployment_events("ic", "us-central1", "p", page_size=10))
+    resumed = asyncio.run(dci_view_api.list_deployment_events("ic", "us-central1", "p", page_token="next"))
+    described = asyncio.run(dci_view_api.describe_deployment_event("e1", "ic", "us-central1", "p", bypass_cache=True))
+
+    assert listed == {"deploymentEvents": [_event(2), _event(1)], "next_page_token": None}
+    assert "--limit=10" in commands[0] and "--sort-by=~deployTime" in commands[0]
+    assert "API not enabled" in resumed["error"]  # gcloud cannot resume from an API page token
+    assert described == _event(1) and commands[1][4:6] == ["describe", "e1"]
+    assert len(commands) == 2 and len(http.requests) == 3
+    assert store.get_detail(f"{PARENT}/deploymentEvents/e1", "event") == _event(1)
+
+
+def test_incremental_sync_lists_only_new_events_and_refreshes_active_ones(google_api, store):
+    events = {number: _event(number, state="STATE_ACTIVE" if number >= 2 else "STATE_INACTIVE") for number in (1, 2, 3)}
+    http = google_api(lambda method, uri, body: (
+        200,
+        {"deploymentEvents": [events[n] for n in sorted(events, reverse=True)]}
+        if uri.split("?")[0].endswith("/deploymentEvents")
+        else events[int(uri.split("?")[0].rsplit("/e", 1)[-1])],
+    ))
+
+    first = asyncio.run(dci_view_api._sync_deployment_events(PARENT))
+    events[2] = _event(2)
+    events[3] = _event(3)
+    events[4] = _event(4, state="STATE_ACTIVE")
+    second = asyncio.run(dci_view_api._sync_deployment_events(PARENT))
+
+    assert first == {"new_events": 3, "updated_events": 0, "last_deploy_time": "2025-06-01T00:03:00Z"}
+    # e3 is listed again (it shares the last seen deploy time), e2 is fetched on its own.
+    assert second == {"new_events": 1, "updated_events": 2, "last_deploy_time": "2025-06-01T00:04:00Z"}
+    assert [uri.split("?")[0].rsplit("/", 1)[-1] for _, uri in http.requests] == ["deploymentEvents", "deploymentEvents", "e2"]
+    assert store.active_event_names(PARENT) == [f"{PARENT}/deploymentEvents/e4"]
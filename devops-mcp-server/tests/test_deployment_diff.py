@@ -0,0 +1,45 @@
+import deployment_diff
+
+
+def _diff(added_packages="", removed_packages="", added_vulnerabilities="", removed_vulnerabilities=""):
+    return {
+        "artifactDiffs": {
+            "packageDiff": {"addedPackages": added_packages, "removedPackages": removed_packages},
+            "vulnerabilityDiff": {"addedVulnerabilities": added_vulnerabilities, "removedVulnerabilities": removed_vulnerabilities},
+        },
+    }
+
+
+def test_compose_nets_out_reverted_changes_and_reports_upgrades():
+    result = deployment_diff.compose([
+        _diff(added_packages="jinja2==3.1.6, click==8.1.8", added_vulnerabilities="CVE-2023-30861"),
+        _diff(added_packages="requests==2.31.0", removed_packages="click==8.1.8"),
+        _diff(added_packages="flask==2.2.5", removed_packages="flask==2.0.0", removed_vulnerabilities="CVE-2023-30861, CVE-2020-0001"),
+    ])
+
+    assert result["packages"] == {
+        "added": [{"name": "jinja2", "version": "3.1.6"}, {"name": "requests", "version": "2.31.0"}],
+        "removed": [],
+        "changed": [{"name": "flask", "from": "2.0.0", "to": "2.2.5"}],
+    }
+    assert result["vulnerabilities"] == {"added": [], "removed": ["CVE-2020-0001"]}
+
+
+def test_artifact_changes_compare_endpoint_events():
+    before = {"artifactDeployments": [{"artifactReference": "img@sha256:a", "sourceCommitUris": ["c1"]}]}
+    after = {"artifactDeployments": [{"artifactReference": "img@sha256:b", "sourceCommitUris": ["c2"]}]}
+
+    assert deployment_diff.artifact_changes(before, after) == {
+        "addedArtifacts": ["img@sha256:b"],
+        "removedArtifacts": ["img@sha256:a"],
+        "addedCommits": ["c2"],
+        "removedCommits": ["c1"],
+    }
+
+
+def test_package_requirements_compare_versions_component_wise():
+    assert deployment_diff.parse_requirement("Flask < 2.2") == ("flask", "<", "2.2")
+    assert deployment_diff.parse_requirement("openssl") == ("openssl", None, None)
+    assert deployment_diff.version_matches("2.1.3", "<", "2.2")
+    assert not deployment_diff.version_matches("2.10.0", "<", "2.9.1")
+    assert deployment_diff.version_matches("1.1.1n-0+deb11u4", ">=", "1.1.1n")
@@ -0,0 +1,63 @@
+import itertools
+import json
+import sqlite3
+import time
+
+import deployment_store
+
+
+def test_details_past_the_size_bound_evict_the_least_recently_read(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(time, "time", lambda: float(next(clock)))
+    body = {"data": "x" * 80}
+    size = len(json.dumps(body))
+    store = deployment_store.DeploymentStore(str(tmp_path / "deployments.sqlite3"), max_detail_bytes=3 * size)
+
+    for name in ("a", "b", "c"):
+        store.put_detail(name, "diff", body)
+    assert store.get_detail("a", "diff") == body  # now read more recently than b
+    store.put_detail("d", "diff", body)
+
+    assert store.get_detail("b", "diff") is None
+    assert all(store.get_detail(name, "diff") == body for name in ("a", "c", "d"))
+
+
+def test_a_store_with_an_outdated_schema_is_rebuilt(tmp_path):
+    path = str(tmp_path / "deployments.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (name TEXT)")
+    conn.execute(f"PRAGMA user_version = {deployment_store.SCHEMA_VERSION - 1}")
+    conn.commit()
+    conn.close()
+
+    store = deployment_store.DeploymentStore(path, max_detail_bytes=1 << 20)
+    store.upsert_events("ic", [{"name": "ic/deploymentEvents/e1", "deployTime": "2025-06-01T00:00:00Z"}])
+
+    assert store.get_event("ic/deploymentEvents/e1")["deployTime"] == "2025-06-01T00:00:00Z"
+
+
+def test_queries_filter_by_time_runtime_digest_and_state_newest_first(store):
+    def event(number, runtime, state="STATE_INACTIVE"):
+        return {
+            "name": f"ic/deploymentEvents/e{number}",
+            "deployTime": f"2025-06-01T00:0{number}:00Z",
+            "state": state,
+            "runtimeConfig": {"uri": f"//run.googleapis.com/projects/p/locations/us-central1/services/{runtime}"},
+            "artifactDeployments": [{"artifactReference": f"img@sha256:{number % 2}"}],
+        }
+
+    assert store.upsert_events("ic", [event(1, "web"), event(2, "api"), event(3, "web"), event(4, "web", "STATE_ACTIVE")]) == 4
+    assert store.upsert_events("ic", [event(4, "web", "STATE_ACTIVE")]) == 0
+
+    def names(**filters):
+        return [e["name"].rsplit("/", 1)[-1] for e in store.query_events("ic", **filters)]
+
+    assert names() == ["e4", "e3", "e2", "e1"]
+    start = deployment_store.parse_timestamp("2025-06-01T00:02:00Z")
+    assert names(start_time=start, end_time=start + 120) == ["e3", "e2"]
+    assert names(runtime_target="web") == ["e4", "e3", "e1"]
+    assert names(runtime_target="//run.googleapis.com/projects/p/locations/us-central1/services/api") == ["e2"]
+    assert names(digest="sha256:1") == ["e3", "e1"]
+    assert names(state="STATE_ACTIVE") == ["e4"]
+    assert names(runtime_target="web", limit=2) == ["e4", "e3"]
+    assert store.query_events("other") == []
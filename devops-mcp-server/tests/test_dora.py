@@ -0,0 +1,23 @@
+import dora
+
+
+def test_rollbacks_mark_failures_and_restore_times():
+    hour = 3600.0
+    result = dora.compute(
+        deploy_times=[0, 1 * hour, 3 * hour, 10 * hour, 0, 5 * hour],
+        runtimes=["api", "api", "api", "api", "web", "web"],
+        artifacts=["a", "b", "a", "c", "x", None],
+        build_times=[None, 0.5 * hour, None, 8 * hour, None, None],
+        start_time=0,
+        end_time=2 * 86400,
+    )
+
+    api, web = result["runtimes"]
+    assert api["runtime"] == "api" and api["deployments"] == 4
+    assert api["deployments_per_day"] == 2.0
+    # "b" was rolled back to "a" two hours after it was deployed.
+    assert api["failed_deployments"] == 1 and api["change_failure_rate"] == 0.25
+    assert api["time_to_restore_hours"] == {"median": 2.0, "p90": 2.0, "samples": 1}
+    assert api["lead_time_hours"]["samples"] == 2 and api["lead_time_hours"]["median"] == 1.25
+    assert web["failed_deployments"] == 0
+    assert result["overall"]["deployments"] == 6
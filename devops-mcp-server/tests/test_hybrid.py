@@ -0,0 +1,17 @@
+import bm25
+import hybrid
+
+
+def test_bm25_matches_exact_identifiers_and_fusion_favours_agreement():
+    index = bm25.BM25([
+        "Push the image to Artifact Registry.",
+        "Build with gcr.io/kaniko-project/executor and --cache=true in cloudbuild.yaml.",
+        "Set substitutionOptions to ALLOW_LOOSE for optional substitutions.",
+    ])
+
+    assert [doc for _, doc in index.search("cloudbuild.yaml kaniko cache", top_k=3)] == [1]
+    assert [doc for _, doc in index.search("substitutionOptions", top_k=3)] == [2]
+    assert index.search("terraform", top_k=3) == []
+
+    fused = hybrid.reciprocal_rank_fusion([["a", "b", "c"], ["b  ", "c", "d"]])
+    assert fused == ["b", "c", "a", "d"]
@@ -0,0 +1,94 @@
+import asyncio
+import copy
+
+import iam
+
+
+class FakePolicies:
+    """Serves getIamPolicy and setIamPolicy for one project, failing the first `conflicts` writes with 409."""
+
+    def __init__(self, bindings, conflicts=0):
+        self.policy = {"etag": "e0", "bindings": bindings}
+        self.conflicts = conflicts
+        self.writes = []
+
+    def __call__(self, method, uri, body):
+        if uri.split("?")[0].endswith(":getIamPolicy"):
+            return 200, copy.deepcopy(self.policy)
+        self.writes.append(body["policy"])
+        if self.conflicts:
+            self.conflicts -= 1
+            return 409, {"error": {"code": 409, "message": "etag mismatch"}}
+        self.policy = dict(body["policy"], etag=f"e{len(self.writes)}")
+        return 200, copy.deepcopy(self.policy)
+
+
+def test_grants_merge_into_existing_bindings_and_retry_etag_conflicts(google_api, monkeypatch):
+    monkeypatch.setattr(iam, "ETAG_RETRY_BASE_DELAY", 0)
+    policies = FakePolicies([{"role": "roles/viewer", "members": ["user:a"]}], conflicts=1)
+    google_api(policies)
+
+    result = asyncio.run(iam.add_iam_role_bindings("projects", "p1", [
+        {"role": "roles/viewer", "member": "user:b"},
+        {"role": "roles/viewer", "member": "user:a"},
+        {"role": "roles/editor", "member": "user:b"},
+    ]))
+
+    assert len(result["added"]) == 2 and result["already_present"] == [{"role": "roles/viewer", "member": "user:a"}]
+    assert len(policies.writes) == 2
+    assert policies.policy["bindings"] == [
+        {"role": "roles/viewer", "members": ["user:a", "user:b"]},
+        {"role": "roles/editor", "members": ["user:b"]},
+    ]
+
+
+def test_concurrent_grants_share_one_write_and_survive_a_cancelled_caller(google_api):
+    policies = FakePolicies([])
+    google_api(policies)
+
+    async def run():
+        cancelled = asyncio.create_task(iam._policy_writer.grant("p2", [("roles/viewer", "user:x")]))
+        first = asyncio.create_task(iam._policy_writer.grant("p2", [("roles/viewer", "user:c")]))
+        second = asyncio.create_task(iam._policy_writer.grant("p2", [("roles/viewer", "user:c"), ("roles/editor", "user:c")]))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await asyncio.wait_for(asyncio.gather(first, second), timeout=5)
+
+    first, second = asyncio.run(run())
+
+    assert first == {("roles/viewer", "user:c")}
+    assert second == {("roles/editor", "user:c")}
+    assert len(policies.writes) == 1
+
+
+def test_policy_snapshot_indexes_members_and_roles_and_refreshes_by_etag(google_api):
+    condition = {"title": "weekdays", "expression": "request.time.getDayOfWeek() < 5"}
+    policies = FakePolicies([
+        {"role": "roles/run.admin", "members": ["serviceAccount:deployer@p.iam.gserviceaccount.com", "user:a"]},
+        {"role": "roles/viewer", "members": ["serviceAccount:deployer@p.iam.gserviceaccount.com"], "condition": condition},
+    ])
+    http = google_api(policies)
+    index = iam._PolicyIndex()
+
+    async def run():
+        first = await index.get("p3")
+        cached = await index.get("p3")
+        unchanged = await index.get("p3", refresh=True)
+        policies.policy = dict(policies.policy, etag="e-new", bindings=[{"role": "roles/viewer", "members": ["user:b"]}])
+        changed = await index.get("p3", refresh=True)
+        return first, cached, unchanged, changed
+
+    first, cached, unchanged, changed = asyncio.run(run())
+
+    assert first.roles_of("serviceAccount:deployer@p.iam.gserviceaccount.com") == [
+        {"role": "roles/run.admin"},
+        {"role": "roles/viewer", "condition": condition},
+    ]
+    assert first.members_of("roles/run.admin") == [
+        {"member": "serviceAccount:deployer@p.iam.gserviceaccount.com"},
+        {"member": "user:a"},
+    ]
+    assert first.roles_of("user:nobody") == []
+    assert cached is first and unchanged is first
+    assert len(http.requests) == 3  # the cached lookup fetched nothing
+    assert changed is not first and changed.members_of("roles/viewer") == [{"member": "user:b"}]
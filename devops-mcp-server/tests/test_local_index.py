@@ -0,0 +1,23 @@
+from unittest import mock
+
+from embeddings import HashingEmbedder
+import local_index
+
+
+def test_index_is_built_once_searched_and_rebuilt_when_the_corpus_changes(tmp_path):
+    corpus = tmp_path / "patterns"
+    corpus.mkdir()
+    (corpus / "canary.txt").write_text('name: "Canary Release"\ndescription: "Shift traffic to a new revision gradually."')
+    (corpus / "nightly.txt").write_text('name: "Scheduled Nightly Release"\ndescription: "Deploy on a cron schedule every night."')
+
+    index = local_index.LocalIndex("patterns", [str(corpus)], HashingEmbedder(), index_dir=str(tmp_path / "index")).load()
+    assert [chunk["source"] for _, chunk in index.search("nightly scheduled release", top_k=1)] == ["nightly.txt"]
+
+    reloaded = local_index.LocalIndex("patterns", [str(corpus)], HashingEmbedder(), index_dir=str(tmp_path / "index"))
+    with mock.patch.object(reloaded, "_build") as build:
+        assert reloaded.load().version == index.version
+    build.assert_not_called()  # An up-to-date manifest must not rebuild the index.
+
+    (corpus / "trunk.txt").write_text('name: "Trunk-Based Push-to-Deploy"')
+    assert index.load().version != reloaded.version
+    assert len(index.chunks) == 3
@@ -0,0 +1,50 @@
+import pattern_catalog
+
+CANARY = """name: "Canary Release"
+description: "Deploys a tagged release to GKE, shifting traffic gradually."
+applicability:
+  triggers: ["git_commit", "git_tag"]
+  deployment_style: "progressive_delivery"
+  use_case_keywords: ["canary release", "reduced blast radius"]
+stages:
+  cd:
+    steps:
+      - type: "cloud-deploy"
+"""
+
+NIGHTLY = """name: "Nightly Release"
+description: "Builds and deploys on a schedule."
+applicability:
+  triggers: ["schedule"]
+  deployment_style: "automated_scheduled"
+  use_case_keywords: ["nightly builds"]
+"""
+
+TRUNK = """name: "Trunk-Based Push-to-Deploy"
+description: "Deploys every commit to a development environment on Cloud Run."
+applicability:
+  triggers: ["git_commit", "push"]
+  deployment_style: "continuous_deployment"
+  use_case_keywords: ["rapid iteration"]
+"""
+
+
+def test_patterns_are_selected_by_declared_facets_and_unknown_text_matches_nothing(tmp_path):
+    (tmp_path / "canary.txt").write_text(CANARY)
+    (tmp_path / "nightly.txt").write_text(NIGHTLY)
+    (tmp_path / "trunk.txt").write_text(TRUNK)
+    (tmp_path / "notes.txt").write_text("Not a pattern.")
+    catalog = pattern_catalog.PatternCatalog.load([str(tmp_path)])
+
+    assert [p.name for p in catalog.patterns] == ["Canary Release", "Nightly Release", "Trunk-Based Push-to-Deploy"]
+    canary = catalog.patterns[0]
+    assert canary.targets == {"gke"} and canary.component_types == {"cloud-deploy"}
+
+    assert [p.name for _, p in catalog.search("Nightly builds for the integration environment")] == ["Nightly Release"]
+    assert [p.name for _, p in catalog.search("release on a git tag")] == ["Canary Release"]
+    assert [p.name for _, p in catalog.search("", triggers=["schedule"])] == ["Nightly Release"]
+    assert catalog.search("", triggers=["schedule"], targets=["cloud_run"])[0][1].name == "Nightly Release"
+    assert catalog.search("", deployment_style="progressive_delivery", targets=["cloud_run"]) == []
+    assert catalog.search("hello world") == []
+    # Naming a target alone is left to retrieval rather than picking the only pattern that mentions it.
+    assert catalog.search("nightly scheduled release to cloud run") == []
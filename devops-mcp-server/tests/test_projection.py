@@ -0,0 +1,22 @@
+import projection
+
+
+def test_project_keeps_nested_paths_and_maps_over_lists():
+    pipeline = {
+        "name": "n",
+        "etag": "e",
+        "serialPipeline": {"stages": [{"targetId": "dev", "profiles": ["a"]}, {"targetId": "prod"}]},
+    }
+
+    assert projection.project(pipeline, ["name", "serialPipeline.stages.targetId", "missing.field"]) == {
+        "name": "n",
+        "serialPipeline": {"stages": [{"targetId": "dev"}, {"targetId": "prod"}]},
+    }
+
+
+def test_fields_select_summary_mask_or_full_resource():
+    assert projection.parse_fields(None, ["name"]) == ["name"]
+    assert projection.parse_fields("name, uri", ["name"]) == ["name", "uri"]
+    assert projection.parse_fields("*", ["name"]) is None
+    assert projection.api_fields(["name", "installationState.stage"], "connections") == "nextPageToken,connections(name,installationState/stage)"
+    assert projection.api_fields(None, "connections") is None
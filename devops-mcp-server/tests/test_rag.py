@@ -0,0 +1,47 @@
+import asyncio
+
+import rag
+
+
+def test_batch_retrieves_equivalent_queries_once_and_maps_failures_per_query(monkeypatch):
+    calls = []
+
+    async def retrieve(corpus, text, top_k):
+        calls.append((corpus, text, top_k))
+        if "broken" in text:
+            raise RuntimeError("backend unavailable")
+        return [f"{corpus}: {text}"]
+
+    async def search_patterns(text, top_k):
+        calls.append(("patterns", text, top_k))
+        return [f"pattern: {text}"]
+
+    monkeypatch.setattr(rag, "_retrieve", retrieve)
+    monkeypatch.setattr(rag, "_search_patterns", search_patterns)
+
+    result = asyncio.run(rag.query_knowledge_batch(["Cloud Build?", "cloud   build", "broken query"]))
+
+    assert result["Cloud Build?"] == {"knowledge": ["knowledge: Cloud Build?"], "patterns": ["pattern: Cloud Build?"]}
+    assert result["cloud   build"] is result["Cloud Build?"]
+    assert result["broken query"] == {"error": "backend unavailable"}
+    assert sorted(call for call in calls if "Cloud" in call[1]) == [("knowledge", "Cloud Build?", 3), ("patterns", "Cloud Build?", 2)]
+    assert len(calls) == 4
+
+    assert asyncio.run(rag.query_knowledge_batch(["q"], corpora=["patterns"])) == {"q": {"patterns": ["pattern: q"]}}
+    assert "Unknown corpora" in asyncio.run(rag.query_knowledge_batch(["q"], corpora=["docs"]))["error"]
+
+
+def test_an_empty_pattern_catalog_is_reported(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(rag, "RAG_PATTERNS_DIRS", [str(tmp_path / "missing")])
+    monkeypatch.setattr(rag, "_pattern_catalog", None)
+
+    assert rag.load_pattern_catalog().patterns == []
+    assert "No pattern files found" in caplog.text
+
+
+def test_a_hybrid_corpus_without_source_files_is_reported(monkeypatch, tmp_path, caplog):
+    monkeypatch.setitem(rag._CORPORA, "knowledge", ("corpus", [str(tmp_path / "missing")]))
+    monkeypatch.setattr(rag, "_lexical_indexes", {})
+
+    assert asyncio.run(rag._lexical_search("knowledge", "cloudbuild.yaml", 3)) == []
+    assert "only use vector search" in caplog.text
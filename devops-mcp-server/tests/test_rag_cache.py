@@ -0,0 +1,11 @@
+import rag_cache
+
+
+def test_rewordings_hit_but_different_terms_and_corpus_versions_miss():
+    cache = rag_cache.RetrievalCache(max_entries=8, ttl=60, similarity=0.8)
+    cache.put("knowledge", "v1", "How do I implement a component of type 'cloud-build'?", ["chunk"])
+
+    assert cache.get("knowledge", "v1", "how do i implement a component of type cloud-build") == (True, ["chunk"])
+    assert cache.get("knowledge", "v1", "How should I implement components of type cloud-build?") == (True, ["chunk"])
+    assert cache.get("knowledge", "v1", "How do I implement a component of type 'cloud-deploy'?") == (False, None)
+    assert cache.get("knowledge", "v2", "How do I implement a component of type 'cloud-build'?") == (False, None)
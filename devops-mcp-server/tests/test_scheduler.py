@@ -0,0 +1,45 @@
+import asyncio
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import metrics
+import scheduler
+
+
+def _http_error(status, headers=None):
+    return HttpError(httplib2.Response({"status": status, **(headers or {})}), b"{}")
+
+
+def test_rate_limit_errors_are_retried_after_the_requested_delay(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(scheduler.asyncio, "sleep", sleep)
+    errors = [_http_error(429, {"retry-after": "2"}), _http_error(503)]
+
+    async def attempt():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    before = metrics.snapshot().get("scheduler.test_api.retried", 0)
+    assert asyncio.run(scheduler.submit("test_api", attempt, idempotent=True)) == "ok"
+    assert delays[0] == 2.0 and len(delays) == 2
+    assert metrics.snapshot()["scheduler.test_api.retried"] == before + 2
+
+
+def test_server_errors_are_not_retried_for_writes():
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        raise _http_error(503)
+
+    with pytest.raises(HttpError):
+        asyncio.run(scheduler.submit("test_api", attempt, idempotent=False))
+    assert len(calls) == 1
+    assert scheduler.is_retryable(_http_error(429), idempotent=False)
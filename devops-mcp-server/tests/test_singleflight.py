@@ -0,0 +1,42 @@
+import asyncio
+
+import singleflight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    group = singleflight.Group("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"bindings": []}
+
+    async def run():
+        return await asyncio.gather(group.do("policy", fetch), group.do("policy", fetch), group.do("other", fetch))
+
+    first, second, other = asyncio.run(run())
+    assert len(calls) == 2
+    assert first == second == other
+    # Callers that joined get their own copy.
+    second["bindings"].append("x")
+    assert first == {"bindings": []}
+
+
+def test_changes_by_the_caller_that_started_the_call_are_not_seen_by_the_others():
+    group = singleflight.Group("test")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return {"bindings": []}
+
+    async def write():
+        policy = await group.do("policy", fetch)
+        policy["bindings"].append({"role": "roles/editor", "members": ["user:never-written"]})
+        return policy
+
+    async def run():
+        return await asyncio.gather(write(), group.do("policy", fetch))
+
+    written, read = asyncio.run(run())
+    assert written["bindings"] and read == {"bindings": []}